@@ -4,7 +4,7 @@ from django.utils import timezone
 from datetime import timedelta, date
 import random
 from accounts.models import RoleMaster, Department
-from tasks.models import Task, TaskStatusMaster, TaskTypeMaster, Tag
+from tasks.models import Task, TaskStatusMaster, TaskTypeMaster, Tag, detect_difficulty
 from interviews.models import Interview, InterviewStatusMaster, InterviewFeedback
 
 User = get_user_model()
@@ -150,6 +150,9 @@ class Command(BaseCommand):
                 tag, _ = Tag.objects.get_or_create(name=t_name.lstrip('#'))
                 task.tags.add(tag)
 
+            task.difficulty = detect_difficulty(tags_to_add)
+            task.save(update_fields=['difficulty'])
+
         # 4. 面談データの生成
         self.stdout.write("Generating Interviews...")
         try:
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from accounts.user_import import process_jobs, requeue_stale
+
+
+class Command(BaseCommand):
+    help = 'Processes queued CSV user import jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('job_ids', nargs='*', type=int, help='Only process these job ids.')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale user import jobs.")
+
+        processed = process_jobs(options['job_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} user import jobs."))
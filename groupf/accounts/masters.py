@@ -0,0 +1,153 @@
+"""
+マスタテーブル（*StatusMaster / *TypeMaster / RoleMaster）のプロセス内レジストリ
+
+マスタはほとんど変わらないので、テーブルごとに1回だけ全件を読み込み、
+以降は コード -> インスタンス / ID を辞書で返す（DBへの問い合わせなし）。
+
+- 管理画面などでの変更は post_save / post_delete シグナルで該当テーブルを読み直す
+  （accounts.apps で MASTER_MODELS に接続する）
+- 他のプロセスでの変更は MASTER_CACHE_SECONDS 秒ごとの読み直しで反映される
+- トランザクション内で読み込んだ内容はコミット後にだけ保存する
+  （ロールバックされたマスタ行を覚えてしまわないため）
+
+使い方:
+    from accounts import masters
+    completed = masters.get(TaskStatusMaster, 'completed')   # 無ければ TaskStatusMaster.DoesNotExist
+    tentative = masters.get_or_create(InterviewStatusMaster, 'tentative', name='仮予約')
+    masters.attach(task, 'status', 'task_type')  # task.status.code などを問い合わせなしで参照できる
+"""
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+
+# レジストリで扱うマスタ
+MASTER_MODELS = (
+    'accounts.RoleMaster',
+    'tasks.TaskStatusMaster',
+    'tasks.TaskTypeMaster',
+    'manuals.ManualStatusMaster',
+    'manuals.ManualVisibilityMaster',
+    'consultations.ConsultationStatusMaster',
+    'schedule.ScheduleEventTypeMaster',
+    'interviews.InterviewStatusMaster',
+    'notifications.NotificationTypeMaster',
+)
+
+_lock = threading.Lock()
+# モデル -> (読み込んだ時刻, _Table)
+_tables = {}
+# モデル -> 世代（clear のたびに進める。コミット待ちの古い読み込み結果を保存しないため）
+_generations = {}
+_epoch = 0
+
+
+class _Table:
+    def __init__(self, rows):
+        self.by_code = {row.code: row for row in rows}
+        self.by_id = {row.pk: row for row in rows}
+
+
+def master_models():
+    return [apps.get_model(label) for label in MASTER_MODELS]
+
+
+def _ttl():
+    return getattr(settings, 'MASTER_CACHE_SECONDS', 300)
+
+
+def _generation(model):
+    return _epoch, _generations.get(model, 0)
+
+
+def _store(model, table, generation):
+    with _lock:
+        if _generation(model) == generation:
+            _tables[model] = (time.monotonic(), table)
+
+
+def _table(model):
+    entry = _tables.get(model)
+    if entry is not None and time.monotonic() - entry[0] < _ttl():
+        return entry[1]
+
+    generation = _generation(model)
+    table = _Table(list(model._default_manager.all()))
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _store(model, table, generation))
+    else:
+        _store(model, table, generation)
+    return table
+
+
+def clear(model=None, **kwargs):
+    """
+    キャッシュを捨てる（model を省略した場合はすべて）
+    post_save / post_delete のレシーバとしても使う（sender がモデル）
+    """
+    global _epoch
+    model = model or kwargs.get('sender')
+    with _lock:
+        if model is None:
+            _tables.clear()
+            _epoch += 1
+        else:
+            _tables.pop(model, None)
+            _generations[model] = _generations.get(model, 0) + 1
+
+
+def find(model, code):
+    """
+    コードに対応するマスタ（無ければ None）
+    """
+    return _table(model).by_code.get(code)
+
+
+def get(model, code):
+    """
+    コードに対応するマスタ（無ければ model.DoesNotExist）
+    """
+    row = find(model, code)
+    if row is None:
+        raise model.DoesNotExist(f"{model.__name__} matching code={code!r} does not exist.")
+    return row
+
+
+def get_id(model, code):
+    row = find(model, code)
+    return row.pk if row is not None else None
+
+
+def by_id(model, pk):
+    return _table(model).by_id.get(pk)
+
+
+def get_or_create(model, code, **defaults):
+    """
+    コードに対応するマスタ（無ければ defaults で作成する）
+    """
+    row = find(model, code)
+    if row is None:
+        row, _ = model._default_manager.get_or_create(code=code, defaults=defaults)
+        # 作成したので次回は読み直す（post_save でも消える）
+        clear(model)
+    return row
+
+
+
+def attach(instance, *field_names):
+    """
+    instance のマスタへの外部キー（field_names）にレジストリのインスタンスを設定する
+    （instance.status.code などの参照で1件ずつ問い合わせない）
+    """
+    for name in field_names:
+        field = instance._meta.get_field(name)
+        pk = getattr(instance, field.attname)
+        if pk is None or field.is_cached(instance):
+            continue
+        row = by_id(field.related_model, pk)
+        if row is not None:
+            field.set_cached_value(instance, row)
+    return instance
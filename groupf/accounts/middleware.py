@@ -0,0 +1,24 @@
+from django.contrib.auth.middleware import get_user
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from . import masters
+
+
+def _user_with_role(request):
+    user = get_user(request)
+    if user.is_authenticated:
+        masters.attach(user, 'role')
+    return user
+
+
+class MasterRoleMiddleware(MiddlewareMixin):
+    """
+    ログイン中のユーザーの役割（RoleMaster）をマスタレジストリから設定する
+    （画面ごとの request.user.role.code で RoleMaster を問い合わせない）
+    AuthenticationMiddleware の後に置く。認証バックエンドは変えないため、既存のセッションはそのまま使える
+    """
+
+    def process_request(self, request):
+        # AuthenticationMiddleware と同じく、request.user を使うまで読み込まない
+        request.user = SimpleLazyObject(lambda: _user_with_role(request))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='user_imports/', verbose_name='CSVファイル')),
+                ('result_file', models.FileField(blank=True, upload_to='user_imports/results/', verbose_name='結果ファイル')),
+                ('base_url', models.CharField(blank=True, max_length=200, verbose_name='サイトURL')),
+                ('status', models.CharField(choices=[('queued', '待機中'), ('running', '処理中'), ('done', '完了'), ('failed', '失敗')], default='queued', max_length=20, verbose_name='状態')),
+                ('total_rows', models.PositiveIntegerField(default=0, verbose_name='行数')),
+                ('processed_rows', models.PositiveIntegerField(default=0, verbose_name='処理済み行数')),
+                ('created_count', models.PositiveIntegerField(default=0, verbose_name='登録件数')),
+                ('error_count', models.PositiveIntegerField(default=0, verbose_name='エラー件数')),
+                ('error', models.TextField(blank=True, verbose_name='エラー内容')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='登録者')),
+            ],
+            options={
+                'verbose_name': 'ユーザー一括登録',
+                'verbose_name_plural': 'ユーザー一括登録',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.utils import timezone
 
+from . import masters
+
 # ==========================================
 # マスタテーブル定義 (CHOICESの代替)
 # ==========================================
@@ -44,7 +46,7 @@ class CustomUserManager(BaseUserManager):
         # 初期化前はマスタが存在しないため、運用でカバーするか初期データ投入が必要。
         # ここでは一旦、運用で「admin」というcodeのマスタデータが必須とする前提で進める。
         try:
-            admin_role = RoleMaster.objects.get(code='admin')
+            admin_role = masters.get(RoleMaster, 'admin')
             extra_fields.setdefault('role', admin_role)
         except RoleMaster.DoesNotExist:
              raise ValueError("RoleMasterに'admin'が存在しません。初期データを投入してください。")
@@ -114,6 +116,11 @@ class User(AbstractBaseUser, PermissionsMixin):
         # For now, I will comment this out or use a local import to avoid circular dependency at module level.
         from tasks.models import Tag
         return Tag.objects.filter(tasks__completed_users=self).distinct()
+
+    def get_skill_names(self, limit=None):
+        # 完了タスクのタグを集計した UserSkill から、完了件数の多い順に取得
+        from tasks.skills import get_skill_names
+        return get_skill_names(self, limit=limit)
     
     def is_temp_password_active(self):
         if self.is_initial_setup_completed:
@@ -121,3 +128,48 @@ class User(AbstractBaseUser, PermissionsMixin):
         if self.temp_password_expires_at:
             return timezone.now() < self.temp_password_expires_at
         return True
+
+
+class UserImportJob(models.Model):
+    """
+    CSVによるユーザー一括登録の実行単位（accounts/user_import.py で処理する）
+    """
+    STATUS_CHOICES = [
+        ('queued', '待機中'),
+        ('running', '処理中'),
+        ('done', '完了'),
+        ('failed', '失敗'),
+    ]
+
+    file = models.FileField(upload_to='user_imports/', verbose_name="CSVファイル")
+    result_file = models.FileField(upload_to='user_imports/results/', blank=True, verbose_name="結果ファイル")
+    # 招待メールのリンク用（バックグラウンド処理ではリクエストが無いため登録時に保存）
+    base_url = models.CharField(max_length=200, blank=True, verbose_name="サイトURL")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', verbose_name="状態")
+    total_rows = models.PositiveIntegerField(default=0, verbose_name="行数")
+    processed_rows = models.PositiveIntegerField(default=0, verbose_name="処理済み行数")
+    created_count = models.PositiveIntegerField(default=0, verbose_name="登録件数")
+    error_count = models.PositiveIntegerField(default=0, verbose_name="エラー件数")
+    error = models.TextField(blank=True, verbose_name="エラー内容")
+    created_by = models.ForeignKey('User', on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="登録者")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "ユーザー一括登録"
+        verbose_name_plural = "ユーザー一括登録"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"ユーザー一括登録 #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_pending(self):
+        return self.status in ('queued', 'running')
+
+    @property
+    def progress(self):
+        if not self.total_rows:
+            return 100 if self.status == 'done' else 0
+        return int(self.processed_rows * 100 / self.total_rows)
@@ -0,0 +1,18 @@
+"""
+マスタの変更（管理画面・init_master_data など）でレジストリ（masters.py）を読み直させる
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from . import masters
+
+
+def invalidate_master(sender, **kwargs):
+    # コミット前に他の接続が古い内容を読み直すことがあるので、コミット後にも消す
+    masters.clear(sender)
+    transaction.on_commit(lambda: masters.clear(sender))
+
+
+for model in masters.master_models():
+    post_save.connect(invalidate_master, sender=model, dispatch_uid=f'masters:save:{model._meta.label}')
+    post_delete.connect(invalidate_master, sender=model, dispatch_uid=f'masters:delete:{model._meta.label}')
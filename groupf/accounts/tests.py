@@ -1,3 +1,176 @@
-from django.test import TestCase
+import csv
+import io
+import re
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.core import mail
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from notifications.models import EmailOutbox
+from tasks.models import Task, TaskStatusMaster, TaskTypeMaster
+from . import masters
+from notifications.outbox import deliver_batch
+from .models import RoleMaster, User, UserImportJob
+from .user_import import CHUNK_SIZE, process_jobs
+
+
+@override_settings(
+    USER_IMPORT_BACKGROUND=False,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class UserImportTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        RoleMaster.objects.create(code='employee', name='一般社員')
+        self.admin = User.objects.create_user(employee_number='A001', email='admin@example.com', password='password')
+        self.client.login(employee_number='A001', password='password')
+
+    def upload(self, text, encoding='utf-8'):
+        csv_file = SimpleUploadedFile('users.csv', text.encode(encoding), content_type='text/csv')
+        return self.client.post(reverse('admin_csv_import_page'), {'file': csv_file})
+
+    def test_import_reports_each_row(self):
+        User.objects.create_user(employee_number='E003', email='taken@example.com', password='x')
+        rows = [
+            '社員番号,メール,姓,名',
+            'E001,tanaka@example.com,田中,太郎',
+            'E002,suzuki@example.com,鈴木,花子',
+            'E001,other@example.com,重複,行',
+            'E003,new@example.com,既存,社員',
+            'E004,taken@example.com,既存,メール',
+            'E005,not-an-email,形式,エラー',
+            'E006',
+        ]
+        response = self.upload('\n'.join(rows), encoding='cp932')
+        self.assertRedirects(response, reverse('admin_csv_import_page'))
+        job = UserImportJob.objects.get()
+        self.assertEqual(job.status, 'queued')
+        self.assertFalse(User.objects.filter(employee_number='E001').exists())
+
+        self.assertEqual(process_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.total_rows, job.created_count, job.error_count), ('done', 7, 2, 5))
+
+        user = User.objects.get(employee_number='E001')
+        self.assertTrue(user.check_password('E001'))
+        self.assertEqual(user.role.code, 'employee')
+        self.assertFalse(user.is_initial_setup_completed)
+        # 招待メールは送信待ちに登録され、send_outbox で送られる
+        self.assertEqual(mail.outbox, [])
+        deliver_batch()
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['suzuki@example.com', 'tanaka@example.com'])
+        self.assertIn('http://testserver/', mail.outbox[0].body)
+
+        self.assertContains(self.client.get(reverse('admin_csv_import_page')), f'data-import-job="{job.pk}"')
+        status = self.client.get(reverse('api_csv_import_status', args=[job.pk])).json()
+        self.assertEqual((status['progress'], status['is_pending']), (100, False))
+        response = self.client.get(status['result_url'])
+        lines = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig'))))
+        self.assertEqual([line[3] for line in lines[1:]], ['登録', '登録', 'エラー', 'エラー', 'エラー', 'エラー', 'エラー'])
+        self.assertIn('既に登録', lines[4][4])
+
+    def test_existing_email_matches_case_insensitively(self):
+        User.objects.create_user(employee_number='E001', email='Tanaka@example.com', password='x')
+        self.upload('E002,tanaka@example.com,田中,太郎')
+        process_jobs()
+        job = UserImportJob.objects.get()
+        self.assertEqual((job.created_count, job.error_count), (0, 1))
+        self.assertFalse(User.objects.filter(employee_number='E002').exists())
+
+    def test_large_file_uses_bulk_queries(self):
+        count = CHUNK_SIZE + 10
+        self.upload('\n'.join(f'E{i:05},user{i}@example.com,姓{i},名{i}' for i in range(count)))
+        # 行ごとの問い合わせはしない（重複確認1回 + bulk INSERT がチャンクごと）
+        with CaptureQueriesContext(connection) as queries:
+            process_jobs()
+        self.assertEqual(sum('FROM "accounts_user"' in q['sql'] for q in queries.captured_queries), 2)
+        self.assertLess(len(queries.captured_queries), 40)
+        job = UserImportJob.objects.get()
+        self.assertEqual((job.created_count, job.processed_rows), (count, count))
+        self.assertEqual(EmailOutbox.objects.filter(status='queued').count(), count)
+
+
+    def test_stale_running_job_resumes_from_progress(self):
+        count = CHUNK_SIZE + 10
+        self.upload('\n'.join(f'E{i:05},user{i}@example.com,姓{i},名{i}' for i in range(count)))
+        # 最初のチャンクを登録した後にプロセスが落ちた状態
+        with self.settings(USER_IMPORT_TIMEOUT_SECONDS=60):
+            job = UserImportJob.objects.get()
+            job.status = 'running'
+            job.save(update_fields=['status'])
+            process_jobs()  # running のジョブは取得しない
+            User.objects.bulk_create([
+                User(employee_number=f'E{i:05}', email=f'user{i}@example.com') for i in range(CHUNK_SIZE)
+            ])
+            UserImportJob.objects.filter(pk=job.pk).update(
+                processed_rows=CHUNK_SIZE, created_count=CHUNK_SIZE, started_at=timezone.now() - timedelta(minutes=5),
+            )
+            call_command('import_users', stdout=io.StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_rows, job.created_count, job.error_count), ('done', count, count, 0))
+        self.assertEqual(EmailOutbox.objects.count(), 10)
+
+
+class MasterRegistryTest(TestCase):
+    def setUp(self):
+        self.addCleanup(masters.clear)
+        self.role = RoleMaster.objects.create(code='employee', name='一般社員')
+        for order, code in enumerate(['unstarted', 'in_progress', 'pending_review', 'completed']):
+            TaskStatusMaster.objects.create(code=code, name=code, order=order)
+        self.self_type = TaskTypeMaster.objects.create(code='self', name='自作')
+        self.user = User.objects.create_user(employee_number='E001', email='e@example.com', password='password', role=self.role)
+        self.client.login(employee_number='E001', password='password')
+
+    def _task(self):
+        task = Task.objects.create(
+            title='資料作成', due_date=timezone.now(), task_type=self.self_type, requested_by=self.user,
+            status=masters.get(TaskStatusMaster, 'in_progress'),
+        )
+        task.assigned_users.add(self.user)
+        return task
+
+    def test_hot_views_make_no_master_queries_after_warm_up(self):
+        # 1回目で読み込み、コミット後にレジストリへ保存される
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('complete_task_by_user', args=[self._task().pk]))
+
+        task = self._task()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('complete_task_by_user', args=[task.pk]))
+        self.assertFalse([q['sql'] for q in queries.captured_queries if re.search(r'FROM "\w+master"', q['sql'])])
+        task.refresh_from_db()
+        self.assertEqual(task.status.code, 'completed')
+
+    def test_request_user_role_comes_from_registry(self):
+        # 認証バックエンドは標準のまま（既存のセッションを切らない）
+        self.assertEqual(self.client.session['_auth_user_backend'], 'django.contrib.auth.backends.ModelBackend')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('query_stats'))
+        with CaptureQueriesContext(connection) as queries:
+            # 役割が employee なので 403（request.user.role.code を参照する）
+            self.assertEqual(self.client.get(reverse('query_stats')).status_code, 403)
+        self.assertFalse([q['sql'] for q in queries.captured_queries if 'accounts_rolemaster' in q['sql']])
+
+    def test_admin_edits_invalidate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(masters.get(TaskStatusMaster, 'completed').name, 'completed')
+        TaskStatusMaster.objects.filter(code='completed').update(name='完了')
+        # シグナルを通らない変更はキャッシュの有効期間まで反映されない
+        self.assertEqual(masters.get(TaskStatusMaster, 'completed').name, 'completed')
+
+        status = TaskStatusMaster.objects.get(code='completed')
+        status.save()
+        self.assertEqual(masters.get(TaskStatusMaster, 'completed').name, '完了')
+        with self.assertRaises(TaskStatusMaster.DoesNotExist):
+            masters.get(TaskStatusMaster, 'archived')
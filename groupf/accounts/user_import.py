@@ -0,0 +1,310 @@
+"""
+CSVによるユーザー一括登録（admin_csv_import_page から登録されたジョブを処理する）
+
+CSV形式: 社員番号, メール, 姓, 名（1行目が見出しなら読み飛ばす）
+
+処理は CHUNK_SIZE 行ずつ:
+- 既存ユーザーとの重複（社員番号・メールアドレス）は1回の問い合わせでまとめて確認する
+- 初期パスワード（社員番号）のハッシュ化はスレッドで並列に行う
+  （PBKDF2 は計算中に GIL を解放するため、CPU コア数に応じて速くなる）
+- ユーザーは bulk_create でまとめて登録し、招待メールは送信待ち(EmailOutbox)にまとめて登録する
+進捗はジョブに記録し、行ごとの結果は CSV（result_file）として保存する。
+処理中にプロセスが落ちて running のまま残ったジョブは、import_users コマンドが requeue_stale() で
+送信待ちに戻し、記録済みの進捗（processed_rows）の続きから処理する。
+"""
+import csv
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMessage
+from django.core.validators import validate_email
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from notifications.outbox import queue_messages
+from . import masters
+from .models import RoleMaster, User, UserImportJob
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+RESULT_HEADER = ['行', '社員番号', 'メールアドレス', '結果', 'メッセージ']
+
+INVITATION_SUBJECT = "アカウント作成のお知らせ"
+INVITATION_BODY = """
+{last_name} {first_name} 様
+
+アカウントが作成されました。
+以下のリンクからパスワードを設定し、初回ログインを行ってください。
+
+{url}
+
+※このリンクは一度きり有効です。
+"""
+
+
+def decode_csv(data):
+    # Excel で保存した CSV(Shift_JIS) にも対応する
+    for encoding in ('utf-8-sig', 'cp932'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError('CSVファイルの文字コードを判別できません（UTF-8 または Shift_JIS で保存してください）')
+
+
+def read_rows(text):
+    """
+    (行番号, 列のリスト) を返す（空行・見出し行は除く）
+    """
+    rows = []
+    for line_no, row in enumerate(csv.reader(io.StringIO(text)), start=1):
+        if not any(cell.strip() for cell in row):
+            continue
+        if line_no == 1 and row and ("社員番号" in row[0] or "employee" in row[0].lower()):
+            continue
+        rows.append((line_no, row))
+    return rows
+
+
+def hash_passwords(raw_passwords):
+    workers = getattr(settings, 'USER_IMPORT_HASH_WORKERS', None) or os.cpu_count() or 1
+    if workers <= 1 or len(raw_passwords) <= 1:
+        return [make_password(p) for p in raw_passwords]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(make_password, raw_passwords))
+
+
+def invitation_url(user, base_url):
+    token = default_token_generator.make_token(user)
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    path = reverse('password_reset_confirm', kwargs={'uidb64': uid, 'token': token})
+    return base_url.rstrip('/') + path
+
+
+def invitation_message(user, base_url):
+    body = INVITATION_BODY.format(
+        last_name=user.last_name, first_name=user.first_name, url=invitation_url(user, base_url)
+    )
+    return EmailMessage(INVITATION_SUBJECT, body, None, [user.email])
+
+
+def queue_invitations(users, base_url):
+    """
+    招待メールを送信待ち(EmailOutbox)にまとめて登録する（送信は send_outbox ワーカー）
+    """
+    if users:
+        queue_messages([invitation_message(user, base_url) for user in users])
+
+
+class ChunkImporter:
+    """
+    1ジョブ分の状態（ファイル内の重複チェック・結果行）を持ちながら CHUNK_SIZE 行ずつ登録する
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.results = []
+        self.created = 0
+        self.errors = 0
+        self.seen_numbers = set()
+        self.seen_emails = set()
+        self.default_role = masters.find(RoleMaster, 'employee')
+
+    def _error(self, line_no, emp_num, email, message):
+        self.errors += 1
+        self.results.append([line_no, emp_num, email, 'エラー', message])
+
+    def _validate(self, rows):
+        candidates = []
+        for line_no, row in rows:
+            if len(row) < 4:
+                self._error(line_no, row[0].strip() if row else '', '', '列が不足しています（社員番号, メール, 姓, 名）')
+                continue
+            emp_num, email, last_name, first_name = (cell.strip() for cell in row[:4])
+            email = User.objects.normalize_email(email)
+            if not emp_num or not email:
+                self._error(line_no, emp_num, email, '社員番号とメールアドレスは必須です')
+                continue
+            try:
+                validate_email(email)
+            except ValidationError:
+                self._error(line_no, emp_num, email, 'メールアドレスの形式が正しくありません')
+                continue
+            if emp_num in self.seen_numbers or email.lower() in self.seen_emails:
+                self._error(line_no, emp_num, email, 'ファイル内で重複しています')
+                continue
+            self.seen_numbers.add(emp_num)
+            self.seen_emails.add(email.lower())
+            candidates.append((line_no, emp_num, email, last_name, first_name))
+        return candidates
+
+    def _exclude_existing(self, candidates):
+        numbers = [c[1] for c in candidates]
+        # メールアドレスは大文字・小文字を区別せずに照合する（SQLite の一意制約は区別するため）
+        emails = [c[2].lower() for c in candidates]
+        existing_numbers, existing_emails = set(), set()
+        for emp_num, email in User.objects.alias(email_lower=Lower('email')).filter(
+            Q(employee_number__in=numbers) | Q(email_lower__in=emails)
+        ).values_list('employee_number', 'email'):
+            existing_numbers.add(emp_num)
+            existing_emails.add(email.lower())
+
+        fresh = []
+        for candidate in candidates:
+            line_no, emp_num, email = candidate[:3]
+            if emp_num in existing_numbers:
+                self._error(line_no, emp_num, email, 'この社員番号は既に登録されています')
+            elif email.lower() in existing_emails:
+                self._error(line_no, emp_num, email, 'このメールアドレスは既に登録されています')
+            else:
+                fresh.append(candidate)
+        return fresh
+
+    def _build_users(self, candidates):
+        # パスワードは初期値として社員番号を設定
+        hashes = hash_passwords([c[1] for c in candidates])
+        return [
+            User(
+                employee_number=emp_num,
+                email=email,
+                last_name=last_name,
+                first_name=first_name,
+                role=self.default_role,
+                password=password_hash,
+                is_initial_setup_completed=False,  # 初回ログイン誘導のため
+            )
+            for (_, emp_num, email, last_name, first_name), password_hash in zip(candidates, hashes)
+        ]
+
+    def _save(self, candidates, users):
+        try:
+            with transaction.atomic():
+                return User.objects.bulk_create(users)
+        except IntegrityError:
+            # 処理中に別経路で同じユーザーが登録された場合は1件ずつ登録して失敗行を特定する
+            saved = []
+            for candidate, user in zip(candidates, users):
+                try:
+                    with transaction.atomic():
+                        user.save()
+                    saved.append(user)
+                except IntegrityError:
+                    self._error(candidate[0], candidate[1], candidate[2], '既に登録されています')
+            return saved
+
+    def import_chunk(self, rows):
+        candidates = self._exclude_existing(self._validate(rows))
+        if not candidates:
+            return
+        users = self._save(candidates, self._build_users(candidates))
+        saved_numbers = {user.employee_number for user in users}
+        queue_invitations(users, self.base_url)
+
+        for line_no, emp_num, email, _, _ in candidates:
+            if emp_num not in saved_numbers:
+                continue
+            self.created += 1
+            self.results.append([line_no, emp_num, email, '登録', '招待メールを送信します'])
+
+    def result_csv(self):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(RESULT_HEADER)
+        writer.writerows(sorted(self.results, key=lambda r: r[0]))
+        # Excel で開けるよう BOM 付き UTF-8
+        return output.getvalue().encode('utf-8-sig')
+
+
+def run_import(job):
+    """
+    ジョブ1件を処理する（進捗は CHUNK_SIZE 行ごとに保存）
+    戻されたジョブは processed_rows の続きから処理する（結果 CSV には今回処理した行だけが載る）
+    """
+    try:
+        with job.file.open('rb') as f:
+            rows = read_rows(decode_csv(f.read()))
+        job.total_rows = len(rows)
+        job.save(update_fields=['total_rows'])
+
+        importer = ChunkImporter(job.base_url)
+        importer.created = job.created_count
+        importer.errors = job.error_count
+        for start in range(job.processed_rows, len(rows), CHUNK_SIZE):
+            importer.import_chunk(rows[start:start + CHUNK_SIZE])
+            UserImportJob.objects.filter(pk=job.pk).update(
+                processed_rows=min(start + CHUNK_SIZE, len(rows)),
+                created_count=importer.created,
+                error_count=importer.errors,
+            )
+
+        job.result_file.save(f"user-import-{job.pk}.csv", ContentFile(importer.result_csv()), save=False)
+        job.created_count = importer.created
+        job.error_count = importer.errors
+        job.processed_rows = len(rows)
+        job.status = 'done'
+    except Exception as e:
+        logger.exception("ユーザー一括登録 #%s に失敗しました", job.pk)
+        job.status = 'failed'
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=['result_file', 'created_count', 'error_count', 'processed_rows', 'status', 'error', 'finished_at'])
+    return job
+
+
+def requeue_stale(timeout=None):
+    """
+    プロセスの異常終了で running のまま残ったジョブを待機中に戻す
+    """
+    timeout = timeout or getattr(settings, 'USER_IMPORT_TIMEOUT_SECONDS', 1800)
+    threshold = timezone.now() - timedelta(seconds=timeout)
+    return UserImportJob.objects.filter(status='running', started_at__lt=threshold).update(status='queued')
+
+
+def process_jobs(job_ids=None):
+    jobs = UserImportJob.objects.filter(status='queued').order_by('created_at')
+    if job_ids is not None:
+        jobs = jobs.filter(pk__in=job_ids)
+    processed = 0
+    for job in jobs:
+        # 他のプロセスが先に取得した場合は処理しない（started_at は確保と同時に記録する）
+        if UserImportJob.objects.filter(pk=job.pk, status='queued').update(status='running', started_at=timezone.now()):
+            run_import(job)
+            processed += 1
+    return processed
+
+
+def _run_in_background(job_ids):
+    try:
+        process_jobs(job_ids)
+    except Exception:
+        logger.exception("ユーザー一括登録に失敗しました")
+    finally:
+        connection.close()
+
+
+def schedule_import(job):
+    """
+    コミット後にバックグラウンドスレッドで処理する（アップロード画面は待たせない）
+    USER_IMPORT_BACKGROUND = False の場合は import_users コマンドに任せる
+    """
+    if not getattr(settings, 'USER_IMPORT_BACKGROUND', True):
+        return
+    job_ids = [job.pk]
+    transaction.on_commit(
+        lambda: threading.Thread(target=_run_in_background, args=(job_ids,), daemon=True).start()
+    )
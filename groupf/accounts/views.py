@@ -9,9 +9,9 @@ from django.views.generic.edit import CreateView
 from django.utils import timezone
 from .models import User
 from .forms import ProfileEditForm, LoginForm, AccountAdminEditForm, PasswordResetRequestForm
-from tasks.models import Task
-from notifications.models import Notification, NotificationTypeMaster
-from django.core.mail import send_mail
+from tasks.models import Task, UserSkill
+from notifications.services import notify
+from notifications.outbox import queue_email
 
 #********************************************************#
 #ログインの一連の流れを管理するクラス
@@ -122,11 +122,13 @@ def account_management_page(request):
     context = { 'page_title': 'アカウント管理' }
     return render(request, 'accounts/account_management.html', context)
 
-from django.db.models import Q
+from django.db.models import Q, Prefetch
 from django.utils.timesince import timesince
 from django.http import JsonResponse
+from groupf.querybudget import query_budget
 
 @login_required
+@query_budget(queries=10)
 def account_list_page(request):
     category = request.GET.get("category", "name")
     q = (request.GET.get("q") or "").strip()
@@ -134,7 +136,7 @@ def account_list_page(request):
     users = (
         User.objects.filter(is_active=True)
         .select_related("department", "role")
-        .prefetch_related("completed_tasks__tags")
+        .prefetch_related(Prefetch("skills", queryset=UserSkill.objects.select_related("tag")))
         .order_by("last_name", "first_name")
     )
 
@@ -161,7 +163,7 @@ def account_list_page(request):
 
     users_data = []
     for u in users:
-        tag_names = list(u.get_completed_tags().values_list("name", flat=True))[:10]  # 最大10個表示
+        tag_names = [skill.tag.name for skill in u.skills.all()][:10]  # 最大10個表示（完了件数順）
         users_data.append({
             "id": u.id,
             "name": f"{u.last_name} {u.first_name}",
@@ -186,8 +188,7 @@ def account_list_page(request):
 @login_required
 def api_account_detail(request, user_id):
     u = get_object_or_404(
-        User.objects.select_related('department', 'role')
-            .prefetch_related('completed_tasks__tags'),
+        User.objects.select_related('department', 'role'),
         pk=user_id,
         is_active=True
     )
@@ -195,12 +196,8 @@ def api_account_detail(request, user_id):
     def fmt_date(d):
         return d.strftime('%Y年 %m月 %d日') if d else '-'
 
-    # ★タグ（完了タスクのタグ）を作る：prefetch を活かしてDB負荷も抑える
-    tag_set = set()
-    for t in u.completed_tasks.all():
-        for tag in t.tags.all():
-            tag_set.add(tag.name)
-    tag_names = sorted(tag_set)[:10]
+    # ★タグ（完了タスクのタグ）: UserSkill から完了件数順に取得
+    tag_names = u.get_skill_names(limit=10)
 
     data = {
         "id": u.id,
@@ -263,25 +260,16 @@ def password_reset_request_view(request):
             try:
                 requesting_user = User.objects.get(employee_number=employee_number)
                 
-                # 通知タイプ 'info' を取得 (なければ作成またはエラーハンドリング)
-                # populate_data.py で作成済み前提だが、念のためget
-                try:
-                    info_type = NotificationTypeMaster.objects.get(code='info')
-                except NotificationTypeMaster.DoesNotExist:
-                     # フォールバック: タイプなしor適当なもの
-                     # 本番ではエラー以前にマスタ必須
-                     info_type = None
-
                 # マネージャーへの通知を作成
                 # リンク先は、その対象ユーザーの編集画面とする (管理者/マネージャー向け画面)
                 # URL: accounts/edit/<int:pk>/
                 link_url = reverse_lazy('account_edit_page', kwargs={'pk': requesting_user.pk})
 
-                Notification.objects.create(
-                    recipient=manager,
+                notify(
+                    manager,
                     title="パスワードリセット申請",
                     message=f"{requesting_user.last_name} {requesting_user.first_name} さん ({requesting_user.employee_number}) からパスワードリセットの依頼がありました。\n詳細画面からリセットURLを発行してください。",
-                    notification_type=info_type,
+                    type_code='info',
                     link_url=link_url,
                     related_object_id=requesting_user.pk
                 )
@@ -416,7 +404,7 @@ def trigger_password_reset(request, pk):
 
 ※このリンクは一度きり有効です。
 """
-        send_mail(subject, message, None, [target_user.email])
+        queue_email(subject, message, [target_user.email])
 
         messages.success(request, f'{target_user.last_name} さんへパスワードリセットメールを送信しました。')
 
@@ -0,0 +1,356 @@
+"""
+ベンチマーク用の大量データの生成
+
+- 乱数は seed から作るので、同じ seed・基準日・件数なら同じデータになる
+  （日時はすべて基準日(anchor)からの相対。created_at 等の auto_now 系の列を除く）
+- bulk_create でまとめて登録し、1行ずつの get_or_create・パスワードのハッシュ化はしない
+  （パスワードは全員共通で、ハッシュ化は1回だけ）
+- bulk_create ではシグナルが送られないので、最後に集計テーブル（月次集計・スキル・
+  ダッシュボード・検索索引）を各アプリの rebuild 処理で作り直す
+- 生成したデータは社員番号・部署名・タグ名などの先頭が PREFIX なので、flush() でまとめて消せる
+"""
+import datetime
+import io
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from accounts.models import Department, RoleMaster, User
+from interviews.models import Interview, InterviewStatusMaster
+from manuals.models import Manual, ManualStatusMaster, ManualVisibilityMaster
+from notifications.models import Notification, NotificationTypeMaster
+from schedule.models import ScheduleEvent, ScheduleEventTypeMaster
+from tasks.models import Tag, Task, TaskStatusMaster, TaskTypeMaster
+
+PREFIX = 'BM'
+PASSWORD = 'benchmark'
+BATCH_SIZE = 5000
+
+# 規模ごとの件数
+SCALES = {
+    'tiny': {
+        'departments': 3, 'users': 30, 'tags': 10, 'tasks': 300, 'interviews': 60,
+        'events': 150, 'notifications': 1000, 'manuals': 20,
+    },
+    'small': {
+        'departments': 10, 'users': 500, 'tags': 30, 'tasks': 20_000, 'interviews': 5_000,
+        'events': 10_000, 'notifications': 100_000, 'manuals': 200,
+    },
+    'large': {
+        'departments': 50, 'users': 5_000, 'tags': 60, 'tasks': 200_000, 'interviews': 50_000,
+        'events': 100_000, 'notifications': 1_000_000, 'manuals': 2_000,
+    },
+}
+
+LAST_NAMES = ['佐藤', '鈴木', '高橋', '田中', '伊藤', '渡辺', '山本', '中村', '小林', '加藤', '吉田', '山田']
+FIRST_NAMES = ['太郎', '花子', '健太', '美咲', '大輔', '陽菜', '翔太', '美優', '誠', '直美', '隆', 'さくら']
+TASK_WORDS = ['資料作成', '顧客対応', '設計レビュー', '議事録', 'テスト', '見積もり', '月次報告', '調査', '障害対応', '研修準備']
+MANUAL_WORDS = ['経費精算', '勤怠入力', 'VPN接続', '発注手順', '新人研修', '障害報告', 'リリース手順', '評価面談']
+# タスク状態の割合（重み）
+STATUS_WEIGHTS = {'unstarted': 2, 'in_progress': 3, 'pending_review': 1, 'completed': 4}
+DIFFICULTIES = ['high', 'mid', 'low', None]
+
+
+def counts_for(scale='small', **overrides):
+    """
+    規模 scale の件数に overrides（None 以外）を反映したもの
+    """
+    counts = dict(SCALES[scale])
+    counts.update({key: value for key, value in overrides.items() if value is not None})
+    return counts
+
+
+def employee_number(i):
+    return f'{PREFIX}{i:06d}'
+
+
+def _batched(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(model, rows):
+    """
+    rows（属性名 -> 値 の dict）を executemany で登録し、件数を返す
+    bulk_create と違い1行ずつの SQL の組み立てをしないので、件数の多いテーブルではずっと速い。
+    省略した列はフィールドの既定値（auto_now / auto_now_add は現在時刻）になる。シグナルは送られない
+    """
+    opts = model._meta
+    fields = [f for f in opts.concrete_fields if not f.primary_key]
+    now = timezone.now()
+    defaults = {
+        f.attname: now if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False) else f.get_default()
+        for f in fields
+    }
+    adapt = connection.ops.adapt_datetimefield_value
+    datetime_fields = {f.attname for f in fields if isinstance(f, models.DateTimeField)}
+
+    qn = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        qn(opts.db_table), ', '.join(qn(f.column) for f in fields), ', '.join(['%s'] * len(fields)),
+    )
+    total = 0
+    with connection.cursor() as cursor:
+        for batch in _batched(rows):
+            params = []
+            for row in batch:
+                values = {**defaults, **row}
+                params.append([
+                    adapt(values[f.attname]) if f.attname in datetime_fields else values[f.attname] for f in fields
+                ])
+            cursor.executemany(sql, params)
+            total += len(params)
+    return total
+
+
+def _masters():
+    # init_master_data と同じマスタ（無ければ作る）
+    call_command('init_master_data', stdout=io.StringIO())
+    return {
+        'role': {m.code: m for m in RoleMaster.objects.all()},
+        'task_status': {m.code: m for m in TaskStatusMaster.objects.all()},
+        'task_type': {m.code: m for m in TaskTypeMaster.objects.all()},
+        'interview_status': {m.code: m for m in InterviewStatusMaster.objects.all()},
+        'event_type': list(ScheduleEventTypeMaster.objects.all()),
+        'notification_type': list(NotificationTypeMaster.objects.all()),
+        'manual_status': ManualStatusMaster.objects.get(code='approved'),
+        'manual_visibility': ManualVisibilityMaster.objects.get(code='public'),
+    }
+
+
+def flush():
+    """
+    生成したデータを削除する
+    件数の多いテーブルはシグナル（1行ずつの集計の更新）を通さずに削除し、
+    集計テーブルはユーザー・部署の削除に合わせて消える（CASCADE）
+    """
+    users = User.objects.filter(employee_number__startswith=PREFIX)
+    with transaction.atomic():
+        tasks = Task.objects.filter(requested_by__in=users)
+        for through in (Task.assigned_users.through, Task.completed_users.through, Task.tags.through):
+            through.objects.filter(task__in=tasks)._raw_delete(through.objects.db)
+        tasks._raw_delete(Task.objects.db)
+        Notification.objects.filter(recipient__in=users)._raw_delete(Notification.objects.db)
+        ScheduleEvent.objects.filter(user__in=users)._raw_delete(ScheduleEvent.objects.db)
+        Interview.objects.filter(manager__in=users).delete()
+        Manual.objects.filter(created_by__in=users).delete()
+        Tag.objects.filter(name__startswith=PREFIX).delete()
+        users.delete()
+        Department.objects.filter(name__startswith=PREFIX).delete()
+
+
+class DatasetGenerator:
+    """
+    counts の件数のデータを作る
+        DatasetGenerator(counts_for('large'), seed=1).generate()
+    """
+
+    def __init__(self, counts, seed=0, anchor=None, log=None):
+        self.counts = counts
+        self.rng = random.Random(seed)
+        anchor = anchor or timezone.localdate()
+        self.anchor = datetime.datetime.combine(anchor, datetime.time(9), tzinfo=timezone.get_current_timezone())
+        self.log = log or (lambda message: None)
+        self.timings = {}
+
+    def generate(self):
+        """
+        データを作成し、作成件数を返す
+        """
+        self.masters = _masters()
+        with transaction.atomic():
+            self._step('departments', self.create_departments)
+            self._step('users', self.create_users)
+            self._step('tags', self.create_tags)
+            self._step('tasks', self.create_tasks)
+            self._step('interviews', self.create_interviews)
+            self._step('events', self.create_events)
+            self._step('notifications', self.create_notifications)
+            self._step('manuals', self.create_manuals)
+        self._step('derived', self.rebuild_derived)
+        return self.created
+
+    def _step(self, name, func):
+        start = time.perf_counter()
+        count = func()
+        self.timings[name] = round(time.perf_counter() - start, 2)
+        self.log(f'{name}: {count if count is not None else "-"} ({self.timings[name]}s)')
+
+    def _at(self, days_before, days_after, hours=True):
+        # 基準日の前後のランダムな日時（勤務時間内の30分単位）
+        day = self.rng.randint(-days_before, days_after)
+        value = self.anchor + datetime.timedelta(days=day)
+        if hours:
+            value += datetime.timedelta(minutes=30 * self.rng.randint(0, 16))
+        return value
+
+    # ------------------------------------------
+    # 各テーブル
+    # ------------------------------------------
+
+    def create_departments(self):
+        self.departments = Department.objects.bulk_create([
+            Department(name=f'{PREFIX}部署{i:03d}', description='ベンチマーク用') for i in range(self.counts['departments'])
+        ])
+        self.created = {'departments': len(self.departments)}
+        return len(self.departments)
+
+    def create_users(self):
+        roles = self.masters['role']
+        password = make_password(PASSWORD)
+        n = self.counts['users']
+        users = []
+        for i in range(n):
+            department = self.departments[i % len(self.departments)]
+            # 先頭は管理者、続く部署数分（各部署に1人）はマネージャー
+            if i == 0:
+                role = roles['admin']
+            elif i <= len(self.departments):
+                role = roles['manager']
+            else:
+                role = roles['employee']
+            users.append(User(
+                employee_number=employee_number(i), email=f'{employee_number(i).lower()}@bench.example.com',
+                password=password, last_name=self.rng.choice(LAST_NAMES), first_name=self.rng.choice(FIRST_NAMES),
+                last_name_kana='ベンチ', first_name_kana='ユーザー', department=department, role=role,
+                is_initial_setup_completed=True,
+            ))
+        self.users = []
+        for batch in _batched(users):
+            self.users += User.objects.bulk_create(batch)
+        self.user_ids = [u.pk for u in self.users]
+        self.members_by_department = {}
+        for user in self.users:
+            self.members_by_department.setdefault(user.department_id, []).append(user.pk)
+        self.managers = [u for u in self.users if u.role_id == roles['manager'].pk]
+        self.created['users'] = len(self.users)
+        return len(self.users)
+
+    def create_tags(self):
+        self.tags = Tag.objects.bulk_create([
+            Tag(name=f'{PREFIX}タグ{i:03d}') for i in range(self.counts['tags'])
+        ] + [Tag(name=f'{PREFIX}#難易度{level}') for level in '高中低'])
+        self.created['tags'] = len(self.tags)
+        return len(self.tags)
+
+    def create_tasks(self):
+        statuses = self.masters['task_status']
+        types = self.masters['task_type']
+        status_codes = list(STATUS_WEIGHTS)
+        weights = list(STATUS_WEIGHTS.values())
+
+        total = 0
+        for batch in _batched(range(self.counts['tasks'])):
+            tasks = []
+            plans = []
+            for i in batch:
+                code = self.rng.choices(status_codes, weights)[0]
+                requester = self.rng.choice(self.users)
+                # 担当者は依頼者と同じ部署から選ぶ
+                members = self.members_by_department[requester.department_id]
+                completed_at = self._at(365, 0) if code == 'completed' else None
+                tasks.append(Task(
+                    title=f'{self.rng.choice(TASK_WORDS)} #{i}',
+                    due_date=self._at(30, 60),
+                    status=statuses[code],
+                    task_type=types['request' if self.rng.random() < 0.4 else 'self'],
+                    requested_by_id=requester.pk,
+                    difficulty=self.rng.choice(DIFFICULTIES),
+                    notes='',
+                    completed_at=completed_at,
+                ))
+                assignees = [] if code == 'unstarted' else self.rng.sample(members, min(len(members), self.rng.randint(1, 2)))
+                tags = self.rng.sample(self.tags, self.rng.randint(0, 3))
+                plans.append((assignees, code == 'completed', tags))
+
+            tasks = Task.objects.bulk_create(tasks)
+            assigned, completed, tagged = [], [], []
+            for task, (assignees, is_completed, tags) in zip(tasks, plans):
+                assigned += [{'task_id': task.pk, 'user_id': user_id} for user_id in assignees]
+                if is_completed:
+                    completed += [{'task_id': task.pk, 'user_id': user_id} for user_id in assignees]
+                tagged += [{'task_id': task.pk, 'tag_id': tag.pk} for tag in tags]
+            _insert(Task.assigned_users.through, assigned)
+            _insert(Task.completed_users.through, completed)
+            _insert(Task.tags.through, tagged)
+            total += len(tasks)
+        self.created['tasks'] = total
+        return total
+
+    def create_interviews(self):
+        statuses = [self.masters['interview_status'][code].pk for code in ('tentative', 'confirmed', 'completed')]
+
+        def rows():
+            for _ in range(self.counts['interviews']):
+                manager = self.rng.choice(self.managers)
+                scheduled_at = self._at(180, 30)
+                # 2割は終了日時なし（1時間として扱われる）
+                end_at = scheduled_at + datetime.timedelta(minutes=self.rng.choice([30, 60])) if self.rng.random() < 0.8 else None
+                yield {
+                    'manager_id': manager.pk,
+                    'employee_id': self.rng.choice(self.members_by_department[manager.department_id]),
+                    'scheduled_at': scheduled_at, 'end_at': end_at, 'status_id': self.rng.choice(statuses),
+                    'theme': '1on1', 'location': '会議室A',
+                }
+
+        self.created['interviews'] = _insert(Interview, rows())
+        return self.created['interviews']
+
+    def create_events(self):
+        types = [t.pk for t in self.masters['event_type']]
+
+        def rows():
+            for _ in range(self.counts['events']):
+                start_at = self._at(60, 60)
+                yield {
+                    'user_id': self.rng.choice(self.user_ids), 'title': '打ち合わせ', 'start_at': start_at,
+                    'end_at': start_at + datetime.timedelta(minutes=30 * self.rng.randint(1, 6)),
+                    'event_type_id': self.rng.choice(types), 'category': self.rng.choice(['work', 'work', 'personal']),
+                }
+
+        self.created['events'] = _insert(ScheduleEvent, rows())
+        return self.created['events']
+
+    def create_notifications(self):
+        types = [t.pk for t in self.masters['notification_type']]
+
+        def rows():
+            for _ in range(self.counts['notifications']):
+                yield {
+                    'recipient_id': self.rng.choice(self.user_ids), 'title': 'お知らせ', 'message': 'ベンチマーク用の通知です',
+                    'notification_type_id': self.rng.choice(types), 'is_read': self.rng.random() < 0.7,
+                    'created_at': self.anchor - datetime.timedelta(minutes=self.rng.randint(0, 90 * 24 * 60)),
+                }
+
+        self.created['notifications'] = _insert(Notification, rows())
+        return self.created['notifications']
+
+    def create_manuals(self):
+        rows = []
+        for i in range(self.counts['manuals']):
+            word = self.rng.choice(MANUAL_WORDS)
+            rows.append(Manual(
+                title=f'{word}マニュアル {i}', description=f'{word}の手順をまとめたマニュアルです。' * 5,
+                status=self.masters['manual_status'], visibility=self.masters['manual_visibility'],
+                created_by_id=self.rng.choice(self.user_ids), department=self.rng.choice(self.departments),
+            ))
+        total = len(Manual.objects.bulk_create(rows, batch_size=BATCH_SIZE))
+        self.created['manuals'] = total
+        return total
+
+    def rebuild_derived(self):
+        # シグナルの代わりに集計テーブル・検索索引を作り直す（ダッシュボードはスキルを使うのでスキルの後）
+        for command in (
+            'rebuild_completion_rollups', 'rebuild_user_skills', 'rebuild_dashboard_snapshots', 'rebuild_search_index',
+        ):
+            call_command(command, stdout=io.StringIO())
@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from benchmarks.scenarios import DEFAULT_THRESHOLD, compare, run, scenario_names
+
+
+class Command(BaseCommand):
+    help = 'Runs timed scenarios against key views and writes a JSON report (p50/p95 latency, query counts).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=scenario_names(), help='Run only these scenarios.')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--output', help='Write the JSON report to this file (default: stdout).')
+        parser.add_argument('--baseline', help='Compare with a previous report.')
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Allowed p95 increase ratio.')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        try:
+            report = run(options['scenario'], options['iterations'], options['warmup'], log=self.stderr.write)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(text + '\n')
+            self.stderr.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(text)
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                regressions = compare(report, json.load(f), options['threshold'])
+            for name, reason in regressions:
+                self.stderr.write(self.style.WARNING(f'regression: {name}: {reason}'))
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}')
@@ -0,0 +1,219 @@
+"""
+主要画面・APIのベンチマーク（テストクライアントで実行する）
+
+generate_benchmark_data で作ったデータに対して、各シナリオを warmup 回実行してから
+iterations 回計測し、処理時間の p50 / p95 と問い合わせ回数をレポート（dict / JSON）にまとめる。
+compare() で以前のレポート（別のコミットで取ったもの）と比べ、悪化したシナリオを返す。
+"""
+import datetime
+import platform
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from groupf.querybudget import QueryRecorder
+from interviews.models import Interview
+from notifications.models import Notification
+from schedule.models import ScheduleEvent
+from tasks.models import Task
+from .datasets import PREFIX, employee_number
+
+# 比較で「悪化」とみなす p95 の増加率と、誤差として無視する増加量（ミリ秒）
+DEFAULT_THRESHOLD = 0.2
+MIN_REGRESSION_MS = 2.0
+
+
+class Scenario:
+    def __init__(self, name, url_name, viewer, params=None):
+        self.name = name
+        self.url_name = url_name
+        self.viewer = viewer
+        # params(context) -> GET パラメータ
+        self.params = params or (lambda context: {})
+
+
+def _calendar_params(context):
+    today = timezone.localdate()
+    return {
+        'start': (today - datetime.timedelta(days=14)).isoformat(),
+        'end': (today + datetime.timedelta(days=28)).isoformat(),
+        'user_id': context['member'].pk,
+    }
+
+
+def _freebusy_params(context):
+    return {'users': ','.join(str(pk) for pk in context['team'][:10]), 'duration': 60}
+
+
+SCENARIOS = [
+    Scenario('dashboard', 'top_page', 'manager'),
+    Scenario('search', 'consultation_list_view', 'manager', lambda context: {'q': '経費精算'}),
+    Scenario('recommend', 'api_recommend_users', 'manager', lambda context: {'task_id': context['task'].pk, 'limit': 20}),
+    Scenario('calendar_feed', 'schedule_get_events', 'manager', _calendar_params),
+    Scenario('freebusy', 'schedule_freebusy', 'manager', _freebusy_params),
+    Scenario('board', 'task_board_page', 'manager'),
+    Scenario('notifications', 'api_notifications', 'member'),
+    Scenario('account_list', 'account_list_page', 'admin'),
+    Scenario('follow_up', 'follow_up_report', 'manager'),
+]
+
+
+def scenario_names():
+    return [scenario.name for scenario in SCENARIOS]
+
+
+def load_context():
+    """
+    シナリオで使うユーザー・タスク（生成データから決まったものを選ぶ）
+    生成データが無い場合は None
+    """
+    admin = User.objects.filter(employee_number=employee_number(0)).first()
+    manager = User.objects.filter(employee_number=employee_number(1)).first()
+    if admin is None or manager is None:
+        return None
+    team = list(
+        User.objects.filter(department=manager.department, employee_number__startswith=PREFIX)
+        .exclude(pk=manager.pk).order_by('employee_number').values_list('pk', flat=True)
+    )
+    task = (
+        Task.objects.filter(requested_by__department=manager.department, status__code='unstarted')
+        .order_by('pk').first()
+    ) or Task.objects.order_by('pk').first()
+    return {
+        'admin': admin,
+        'manager': manager,
+        'member': User.objects.get(pk=team[0]) if team else manager,
+        'team': [manager.pk] + team,
+        'task': task,
+    }
+
+
+def percentile(values, q):
+    """
+    最近順位法のパーセンタイル（q は 0〜100）
+    """
+    values = sorted(values)
+    rank = max(1, -(-len(values) * q // 100))
+    return values[int(rank) - 1]
+
+
+def _clients(context):
+    clients = {}
+    for role in ('admin', 'manager', 'member'):
+        # ALLOWED_HOSTS に testserver が無いので localhost として送る
+        client = Client(SERVER_NAME='localhost')
+        client.force_login(context[role])
+        clients[role] = client
+    return clients
+
+
+def run_scenario(client, url, params, iterations, warmup):
+    for _ in range(warmup):
+        client.get(url, params)
+
+    durations = []
+    queries = []
+    status = None
+    for _ in range(iterations):
+        with QueryRecorder() as recorder:
+            start = time.perf_counter()
+            response = client.get(url, params)
+            durations.append((time.perf_counter() - start) * 1000)
+        queries.append(recorder.count)
+        status = response.status_code
+    return {
+        'status': status,
+        'p50_ms': round(percentile(durations, 50), 2),
+        'p95_ms': round(percentile(durations, 95), 2),
+        'mean_ms': round(sum(durations) / len(durations), 2),
+        'min_ms': round(min(durations), 2),
+        'max_ms': round(max(durations), 2),
+        'queries': max(queries),
+        'queries_min': min(queries),
+    }
+
+
+def dataset_counts():
+    return {
+        'users': User.objects.count(),
+        'tasks': Task.objects.count(),
+        'interviews': Interview.objects.count(),
+        'events': ScheduleEvent.objects.count(),
+        'notifications': Notification.objects.count(),
+    }
+
+
+def _git_commit():
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def run(names=None, iterations=20, warmup=2, log=None):
+    """
+    シナリオを実行してレポートを返す（生成データが無い場合は ValueError）
+    """
+    log = log or (lambda message: None)
+    context = load_context()
+    if context is None:
+        raise ValueError('benchmark data not found. Run generate_benchmark_data first.')
+    clients = _clients(context)
+
+    results = []
+    for scenario in SCENARIOS:
+        if names and scenario.name not in names:
+            continue
+        url = reverse(scenario.url_name)
+        params = scenario.params(context)
+        result = {'name': scenario.name, 'url': url, 'params': {k: str(v) for k, v in params.items()}}
+        result.update(run_scenario(clients[scenario.viewer], url, params, iterations, warmup))
+        log(
+            f"{scenario.name}: p50={result['p50_ms']}ms p95={result['p95_ms']}ms "
+            f"queries={result['queries']} status={result['status']}"
+        )
+        results.append(result)
+
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'commit': _git_commit(),
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'debug': settings.DEBUG,
+        },
+        'dataset': dataset_counts(),
+        'iterations': iterations,
+        'warmup': warmup,
+        'scenarios': results,
+    }
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    baseline から悪化したシナリオ: [(名前, 理由)]
+    p95 が threshold の割合（かつ MIN_REGRESSION_MS）以上増えた、または問い合わせ回数が増えた
+    """
+    before = {row['name']: row for row in baseline.get('scenarios', [])}
+    regressions = []
+    for row in report['scenarios']:
+        old = before.get(row['name'])
+        if old is None:
+            continue
+        if row['queries'] > old['queries']:
+            regressions.append((row['name'], f"queries {old['queries']} -> {row['queries']}"))
+        increase = row['p95_ms'] - old['p95_ms']
+        if increase > MIN_REGRESSION_MS and increase > old['p95_ms'] * threshold:
+            regressions.append((row['name'], f"p95 {old['p95_ms']}ms -> {row['p95_ms']}ms"))
+    return regressions
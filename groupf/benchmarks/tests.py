@@ -0,0 +1,83 @@
+import datetime
+
+from django.test import TestCase, override_settings
+
+from accounts import masters
+from accounts.models import User
+from notifications.models import Notification
+from tasks.models import MemberDashboardSnapshot, MonthlyCompletionRollup, Task
+from .datasets import PREFIX, DatasetGenerator, counts_for, flush
+from .scenarios import compare, percentile, run, scenario_names
+
+ANCHOR = datetime.date(2026, 4, 1)
+
+
+def signature():
+    # 生成データの内容（ID を除く）
+    tasks = Task.objects.filter(requested_by__employee_number__startswith=PREFIX).order_by('pk')
+    return (
+        list(tasks.values_list('title', 'due_date', 'status__code', 'requested_by__employee_number', 'completed_at')),
+        list(tasks.values_list('assigned_users__employee_number', flat=True)),
+        Notification.objects.filter(is_read=False).count(),
+    )
+
+
+@override_settings(QUERY_BUDGET_ENABLED=False)
+class BenchmarkTest(TestCase):
+    def setUp(self):
+        self.addCleanup(masters.clear)
+
+    def generate(self, seed=0):
+        return DatasetGenerator(counts_for('tiny'), seed=seed, anchor=ANCHOR).generate()
+
+    def test_generate_is_deterministic_and_flushable(self):
+        created = self.generate()
+        self.assertEqual(created['users'], 30)
+        self.assertEqual(created['notifications'], 1000)
+        self.assertEqual(Task.objects.count(), 300)
+        # シグナルを通さない登録でも集計テーブルは作り直される
+        self.assertTrue(MonthlyCompletionRollup.objects.exists())
+        # 最初の画面表示でダッシュボード集計を作らないよう、生成時に全員分を作っておく
+        self.assertEqual(
+            MemberDashboardSnapshot.objects.filter(user__employee_number__startswith=PREFIX).count(), created['users'],
+        )
+        first = signature()
+
+        flush()
+        self.assertFalse(User.objects.filter(employee_number__startswith=PREFIX).exists())
+        self.assertEqual(Task.objects.count(), 0)
+        self.assertEqual(Notification.objects.count(), 0)
+
+        self.generate()
+        self.assertEqual(signature(), first)
+
+    def test_run_reports_every_scenario(self):
+        self.generate()
+        report = run(iterations=2, warmup=0)
+        self.assertEqual([row['name'] for row in report['scenarios']], scenario_names())
+        for row in report['scenarios']:
+            self.assertEqual(row['status'], 200, row['name'])
+            self.assertLessEqual(row['p50_ms'], row['p95_ms'])
+            self.assertGreater(row['queries'], 0)
+        self.assertEqual(report['dataset']['tasks'], 300)
+
+    def test_run_without_data(self):
+        with self.assertRaises(ValueError):
+            run(iterations=1)
+
+    def test_compare(self):
+        baseline = {'scenarios': [
+            {'name': 'board', 'p95_ms': 100.0, 'queries': 6},
+            {'name': 'dashboard', 'p95_ms': 10.0, 'queries': 5},
+        ]}
+        report = {'scenarios': [
+            {'name': 'board', 'p95_ms': 130.0, 'queries': 6},
+            {'name': 'dashboard', 'p95_ms': 11.5, 'queries': 7},
+            {'name': 'search', 'p95_ms': 50.0, 'queries': 3},
+        ]}
+        self.assertEqual(compare(report, baseline), [
+            ('board', 'p95 100.0ms -> 130.0ms'),
+            ('dashboard', 'queries 5 -> 7'),
+        ])
+        self.assertEqual(percentile([5, 1, 4, 2, 3], 50), 3)
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
@@ -0,0 +1,113 @@
+"""
+チャットの WebSocket コンシューマ
+
+クライアントからの受信:
+  {"type": "message", "content": "..."}   メッセージ投稿
+  {"type": "sync", "after_id": N}          ID N 以降のメッセージを取得（再接続時の補完）
+クライアントへの送信:
+  {"type": "message", "message": {...}}   新着メッセージ
+  {"type": "sync", "messages": [...]}      差分同期の結果
+  {"type": "error", "message": "..."}
+"""
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from consultations.models import Consultation
+from . import messaging
+from .models import ChatRoom
+
+MAX_CONTENT_LENGTH = 5000
+
+
+class ThreadConsumer(AsyncJsonWebsocketConsumer):
+    """
+    相談・チャットルーム共通の処理（スレッドの取得・投稿はサブクラスで定義）
+    """
+    kind = None
+    group = None
+
+    def get_thread(self, pk, user):
+        raise NotImplementedError
+
+    def post(self, content):
+        raise NotImplementedError
+
+    def messages_queryset(self):
+        raise NotImplementedError
+
+    async def connect(self):
+        user = self.scope.get('user')
+        pk = self.scope['url_route']['kwargs']['pk']
+        self.thread = None
+        if user is not None and user.is_authenticated:
+            self.thread = await database_sync_to_async(self.get_thread)(pk, user)
+        if self.thread is None:
+            await self.close(code=4403)
+            return
+
+        self.user = user
+        self.group = messaging.group_name(self.kind, self.thread.pk)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.group:
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        action = content.get('type')
+        if action == 'message':
+            text = str(content.get('content') or '').strip()
+            if not text or len(text) > MAX_CONTENT_LENGTH:
+                await self.send_json({'type': 'error', 'message': 'メッセージが空か、長すぎます。'})
+                return
+            # 保存後に chat_message 経由で自分を含む接続者へ配信される
+            await database_sync_to_async(self.post)(text)
+        elif action == 'sync':
+            try:
+                after_id = int(content.get('after_id') or 0)
+            except (TypeError, ValueError):
+                await self.send_json({'type': 'error', 'message': 'after_id が不正です。'})
+                return
+            messages = await database_sync_to_async(self.fetch_after)(after_id)
+            await self.send_json({'type': 'sync', 'messages': messages})
+        else:
+            await self.send_json({'type': 'error', 'message': '不明な操作です。'})
+
+    def fetch_after(self, after_id):
+        return [messaging.serialize_message(m) for m in messaging.messages_after(self.messages_queryset(), after_id)]
+
+    async def chat_message(self, event):
+        await self.send_json({'type': 'message', 'message': event['message']})
+
+
+class ConsultationConsumer(ThreadConsumer):
+    kind = 'consultation'
+
+    def get_thread(self, pk, user):
+        consultation = Consultation.objects.filter(pk=pk).first()
+        if consultation is None or not messaging.can_access_consultation(user, consultation):
+            return None
+        return consultation
+
+    def post(self, content):
+        return messaging.post_consultation_message(self.thread, self.user, content)
+
+    def messages_queryset(self):
+        return self.thread.messages.all()
+
+
+class ChatRoomConsumer(ThreadConsumer):
+    kind = 'room'
+
+    def get_thread(self, pk, user):
+        room = ChatRoom.objects.filter(pk=pk).first()
+        if room is None or not messaging.can_access_room(user, room):
+            return None
+        return room
+
+    def post(self, content):
+        return messaging.post_room_message(self.thread, self.user, content)
+
+    def messages_queryset(self):
+        return self.thread.messages.all()
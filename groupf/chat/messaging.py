@@ -0,0 +1,149 @@
+"""
+チャット（相談 Consultation / チャットルーム ChatRoom）のメッセージ処理
+
+HTTP の投稿画面と WebSocket(chat/consumers.py) の両方から使う。
+投稿されたメッセージはコミット後にチャネルレイヤーで同じスレッドの接続者へ配信する。
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.utils import timezone
+
+from consultations.models import Consultation, ConsultationMessage
+from notifications.services import notify
+from . import pagination
+from .models import ChatRoom, ChatMessage
+
+MAX_PAGE_SIZE = 100
+DEFAULT_PAGE_SIZE = 30
+
+
+def group_name(kind, pk):
+    return f"{kind}_{pk}"
+
+
+def serialize_message(msg):
+    return {
+        'id': msg.id,
+        'sender_id': msg.sender_id,
+        'sender_name': msg.sender.last_name,
+        'content': msg.content,
+        'created_at': msg.created_at.isoformat(),
+    }
+
+
+def broadcast(kind, pk, msg):
+    """
+    コミット後にスレッドの接続者へメッセージを配信する
+    """
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    payload = serialize_message(msg)
+    transaction.on_commit(
+        lambda: async_to_sync(layer.group_send)(group_name(kind, pk), {'type': 'chat.message', 'message': payload})
+    )
+
+
+def messages_after(queryset, after_id, limit=MAX_PAGE_SIZE):
+    """
+    差分同期: ID が after_id より新しいメッセージ（再接続時の取りこぼし補完用）
+    """
+    return list(queryset.filter(id__gt=after_id).select_related('sender').order_by('id')[:limit])
+
+
+def parse_page_params(params):
+    """
+    after / before / limit の解釈（不正な値は ValueError）
+    after はメッセージID、before は過去ページのカーソル（chat/pagination.py）
+    """
+    after = int(params['after']) if params.get('after') else None
+    before = params.get('before') or None
+    limit = int(params.get('limit') or DEFAULT_PAGE_SIZE)
+    if limit < 1 or (after is not None and after < 0):
+        raise ValueError('invalid page params')
+    if before is not None:
+        pagination.decode_cursor(before)
+    return after, before, min(limit, MAX_PAGE_SIZE)
+
+
+def latest_page(queryset, limit=DEFAULT_PAGE_SIZE):
+    """
+    画面の初期表示用: 最新 limit 件（古い順）と、それより古いページのカーソル
+    """
+    return pagination.page_before(queryset.select_related('sender'), None, limit)
+
+
+def page_response_data(queryset, params):
+    """
+    メッセージAPI共通の応答データ
+    after 指定時は差分同期、それ以外は before（カーソル）からの履歴ページ
+    """
+    after, before, limit = parse_page_params(params)
+    if after is not None:
+        page = messages_after(queryset, after, limit)
+        next_cursor = None
+        has_more = len(page) == limit
+    else:
+        page, next_cursor = pagination.page_before(queryset.select_related('sender'), before, limit)
+        has_more = next_cursor is not None
+    return {
+        'messages': [serialize_message(m) for m in page],
+        'has_more': has_more,
+        'next_cursor': next_cursor,
+    }
+
+
+# ==========================================
+# 相談 (Consultation)
+# ==========================================
+
+def can_access_consultation(user, consultation):
+    return user.is_authenticated and user.id in (consultation.requester_id, consultation.respondent_id)
+
+
+def post_consultation_message(consultation, sender, content):
+    """
+    相談メッセージを保存し、相手への通知と接続者への配信を行う
+    """
+    with transaction.atomic():
+        message = ConsultationMessage.objects.create(consultation=consultation, sender=sender, content=content)
+
+        # 相談の更新日時を更新（一覧で上に上げるため）
+        Consultation.objects.filter(pk=consultation.pk).update(updated_at=timezone.now())
+
+        # --- 通知の作成 ---
+        # メッセージ送信者が requester なら recipient は respondent (逆も然り)
+        recipient_id = consultation.respondent_id if sender.id == consultation.requester_id else consultation.requester_id
+
+        # 自分への通知は不要なので、相手に送る
+        if recipient_id != sender.id:
+            # 未読のうちに続けて届いたメッセージは1件の通知にまとめる
+            notify(
+                recipient_id,
+                title='相談メッセージ',
+                message=f'{sender.last_name}さんから相談メッセージが届きました。確認してみましょう',
+                type_code='consultation_message',
+                related_object_id=consultation.id,
+                link_url=f"/consultations/{consultation.id}/",
+                collapse=True,
+            )
+
+        broadcast('consultation', consultation.pk, message)
+    return message
+
+
+# ==========================================
+# チャットルーム (ChatRoom)
+# ==========================================
+
+def can_access_room(user, room):
+    return user.is_authenticated and room.participants.filter(pk=user.pk).exists()
+
+
+def post_room_message(room, sender, content):
+    with transaction.atomic():
+        message = ChatMessage.objects.create(room=room, sender=sender, content=content)
+        ChatRoom.objects.filter(pk=room.pk).update(updated_at=timezone.now())
+        broadcast('room', room.pk, message)
+    return message
@@ -21,3 +21,7 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # キーセットページング用（chat/pagination.py）
+            models.Index(fields=['room', 'created_at', 'id'], name='chatmsg_room_idx'),
+        ]
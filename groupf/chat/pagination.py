@@ -0,0 +1,77 @@
+"""
+メッセージのキーセット(カーソル)ページング
+
+(created_at, id) の組を境界にして「それより古い/新しい」行だけを取得する。
+OFFSET を使わないため、会話が長くなっても1ページの取得コストは一定
+（(スレッド, created_at, id) の複合インデックスを使う）。
+
+カーソルは "<created_at の ISO 形式>_<id>" を URL セーフな base64 にした文字列。
+"""
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def encode_cursor(obj):
+    raw = f"{obj.created_at.isoformat()}_{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    カーソル文字列を (created_at, id) に戻す（不正な値は ValueError）
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        created_at, pk = raw.rsplit('_', 1)
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError('invalid cursor') from e
+    if created_at is None:
+        raise ValueError('invalid cursor')
+    return created_at, pk
+
+
+def older_than(created_at, pk):
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+
+
+def newer_than(created_at, pk):
+    return Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+
+
+def page_before(queryset, cursor=None, limit=30):
+    """
+    cursor より古いメッセージを limit 件取得する（表示用に古い順で返す）
+    戻り値: (メッセージのリスト, さらに古いページのカーソル or None)
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        queryset = queryset.filter(older_than(*decode_cursor(cursor)))
+    rows = list(queryset[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]) if has_more else None
+    return rows[::-1], next_cursor
+
+
+def iter_chunked(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    古い順に chunk_size 件ずつ取得しながら1件ずつ返す
+    （会話全体を一度にメモリへ載せない。サーバーサイドカーソルの無いDBでも動く）
+    """
+    queryset = queryset.order_by('created_at', 'id')
+    boundary = None
+    while True:
+        chunk = queryset.filter(newer_than(*boundary)) if boundary else queryset
+        rows = list(chunk[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        boundary = (rows[-1].created_at, rows[-1].pk)
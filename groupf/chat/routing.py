@@ -0,0 +1,7 @@
+from django.urls import path
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/consultations/<int:pk>/', consumers.ConsultationConsumer.as_asgi()),
+    path('ws/chat/rooms/<int:pk>/', consumers.ChatRoomConsumer.as_asgi()),
+]
@@ -1,3 +1,110 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
 
-# Create your tests here.
+from consultations.models import Consultation, ConsultationMessage
+from notifications.models import Notification
+from consultations.llm_jobs import build_chat_history
+from .pagination import iter_chunked, page_before
+from .routing import websocket_urlpatterns
+
+User = get_user_model()
+
+
+class ConsultationWebSocketTest(TransactionTestCase):
+    def setUp(self):
+        self.requester = User.objects.create_user(employee_number='0001', email='a@example.com', password='password', last_name='佐藤')
+        self.respondent = User.objects.create_user(employee_number='0002', email='b@example.com', password='password', last_name='鈴木')
+        self.outsider = User.objects.create_user(employee_number='0003', email='c@example.com', password='password')
+        self.consultation = Consultation.objects.create(title='VPN', requester=self.requester, respondent=self.respondent)
+
+    def communicator(self, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/consultations/{self.consultation.pk}/')
+        communicator.scope['user'] = user
+        return communicator
+
+    def test_message_is_pushed_to_both_participants(self):
+        async def scenario():
+            sender = self.communicator(self.requester)
+            receiver = self.communicator(self.respondent)
+            self.assertTrue((await sender.connect())[0])
+            self.assertTrue((await receiver.connect())[0])
+
+            await sender.send_json_to({'type': 'message', 'content': 'つながりません'})
+            pushed = await receiver.receive_json_from()
+            echoed = await sender.receive_json_from()
+
+            # 再接続時の差分同期
+            await receiver.send_json_to({'type': 'sync', 'after_id': 0})
+            synced = await receiver.receive_json_from()
+
+            await sender.disconnect()
+            await receiver.disconnect()
+            return pushed, echoed, synced
+
+        pushed, echoed, synced = async_to_sync(scenario)()
+        message = ConsultationMessage.objects.get()
+        self.assertEqual(pushed, {'type': 'message', 'message': echoed['message']})
+        self.assertEqual(pushed['message']['id'], message.id)
+        self.assertEqual(pushed['message']['sender_name'], '佐藤')
+        self.assertEqual([m['id'] for m in synced['messages']], [message.id])
+        self.assertTrue(Notification.objects.filter(recipient=self.respondent).exists())
+
+    def test_outsider_is_rejected(self):
+        async def scenario():
+            communicator = self.communicator(self.outsider)
+            connected, code = await communicator.connect()
+            return connected, code
+
+        self.assertEqual(async_to_sync(scenario)(), (False, 4403))
+
+    def test_delta_sync_api(self):
+        first = ConsultationMessage.objects.create(consultation=self.consultation, sender=self.requester, content='1')
+        second = ConsultationMessage.objects.create(consultation=self.consultation, sender=self.respondent, content='2')
+        url = reverse('api_consultation_messages', args=[self.consultation.pk])
+
+        self.client.login(employee_number='0001', password='password')
+        data = self.client.get(url, {'after': first.id}).json()
+        self.assertEqual([m['id'] for m in data['messages']], [second.id])
+        data = self.client.get(url, {'limit': 1}).json()
+        self.assertEqual([m['id'] for m in data['messages']], [second.id])
+        data = self.client.get(url, {'before': data['next_cursor'], 'limit': 1}).json()
+        self.assertEqual(([m['id'] for m in data['messages']], data['has_more']), ([first.id], False))
+        self.assertEqual(self.client.get(url, {'after': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'before': 'x'}).status_code, 400)
+
+        self.client.login(employee_number='0003', password='password')
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(employee_number='0001', email='a@example.com', password='password', last_name='佐藤')
+        self.consultation = Consultation.objects.create(title='VPN', requester=self.user, respondent=self.user)
+        self.messages = [
+            ConsultationMessage.objects.create(consultation=self.consultation, sender=self.user, content=str(i))
+            for i in range(7)
+        ]
+        # 同一時刻のメッセージも id で順序が決まる
+        ConsultationMessage.objects.filter(pk__in=[m.pk for m in self.messages[2:5]]).update(
+            created_at=self.messages[2].created_at
+        )
+
+    def test_pages_cover_all_messages_once(self):
+        queryset = self.consultation.messages.all()
+        seen, cursor = [], None
+        while True:
+            page, cursor = page_before(queryset, cursor, limit=3)
+            seen = [m.content for m in page] + seen
+            if cursor is None:
+                break
+        self.assertEqual(seen, [str(i) for i in range(7)])
+
+    def test_chunked_iteration_and_chat_history(self):
+        with self.assertNumQueries(3):
+            contents = [m.content for m in iter_chunked(self.consultation.messages.all(), chunk_size=3)]
+        self.assertEqual(contents, [str(i) for i in range(7)])
+        self.assertEqual(build_chat_history(self.consultation), ''.join(f'[佐藤]: {i}\n' for i in range(7)))
@@ -3,4 +3,5 @@ from . import views
 
 urlpatterns = [
     # path('', views.index, name='chat_index'),
+    path('api/rooms/<int:pk>/messages/', views.api_room_messages, name='api_room_messages'),
 ]
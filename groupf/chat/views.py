@@ -1,6 +1,25 @@
-from django.shortcuts import render
+from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+
+from .messaging import can_access_room, page_response_data
+from .models import ChatRoom
 
 # Placeholder for chat views (since consultation app handles most chat logic currently)
 def index(request):
     return render(request, 'index.html') # Default placeholder
+
+
+@login_required
+def api_room_messages(request, pk):
+    """
+    チャットルームのメッセージAPI（after: 差分同期 / before・limit: 過去メッセージ）
+    """
+    room = get_object_or_404(ChatRoom, pk=pk)
+    if not can_access_room(request.user, room):
+        return JsonResponse({'status': 'error', 'message': '権限がありません'}, status=403)
+    try:
+        data = page_response_data(room.messages.all(), request.GET)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'パラメータが不正です'}, status=400)
+    return JsonResponse(data)
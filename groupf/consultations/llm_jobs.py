@@ -0,0 +1,122 @@
+"""
+相談関連のAIジョブ（llm.jobs に登録される）
+"""
+import json
+
+from django.db import transaction
+
+from chat.pagination import iter_chunked
+from llm import client as llm_client
+from llm.jobs import register
+from .models import Consultation, Question
+
+FAILED_PROBLEM_TEXT = "【自動要約失敗】\nAPIキーが設定されていないか、AI処理中にエラーが発生しました。\nここを手動で編集して、課題内容を記述してください。"
+FAILED_SOLUTION_TEXT = "【解決策未記入】\nここを手動で編集して、解決手順を記述してください。"
+SUMMARY_RESPONSE_FORMAT = {"type": "json_object"}
+
+
+def build_summary_prompt(chat_history):
+    return f"""
+                あなたは親切で丁寧な社内ナレッジ管理者です。
+                以下の社内チャットの履歴を読み、他の社員にも役立つ「ナレッジ」として整理してください。
+
+                【重要】
+                - 誰にでもわかる、優しく丁寧な言葉遣い（です・ます調）で書いてください。
+                - 専門用語には簡単な解説を加えるなど、初心者にも配慮してください。
+                - 読む人が「なるほど！」と安心できるようなトーンでお願いします。
+
+                【判定について】
+                チャットの内容から、最終的に「解決した」か「解決しなかった（「わからない」「解決できず」などで終わっている）」かを判断してください。
+
+                出力は以下のJSON形式のみで行ってください。
+
+                {{
+                    "title": "一目で内容がわかる、親しみやすいタイトル(30文字以内)",
+                    "problem": "どのようなことで困っていたか（優しく要約）",
+                    "solution": "どのように解決したか（手順などを分かりやすく、ステップ形式などで）",
+                    "is_solved": true または false (解決していない場合は false)
+                }}
+
+                --- チャット履歴 ---
+                {chat_history}
+                """
+
+
+def iter_chat_lines(consultation):
+    # 長い会話でも一定件数ずつ読み込む
+    for msg in iter_chunked(consultation.messages.select_related('sender')):
+        yield f"[{msg.sender.last_name}]: {msg.content}\n"
+
+
+def build_chat_history(consultation):
+    return "".join(iter_chat_lines(consultation))
+
+
+def create_fallback_question(consultation, user_id):
+    # APIキーがない、または失敗した場合は「要約失敗/手動修正待ち」として保存する
+    return Question.objects.create(
+        source_consultation=consultation,
+        title=consultation.title,
+        problem_summary=FAILED_PROBLEM_TEXT,
+        solution_summary=FAILED_SOLUTION_TEXT,
+        created_by_id=user_id,
+    )
+
+
+def _summary_failed(payload, error):
+    consultation = Consultation.objects.filter(pk=payload['consultation_id']).first()
+    if consultation is not None and not Question.objects.filter(source_consultation=consultation).exists():
+        create_fallback_question(consultation, payload.get('user_id'))
+
+
+def summary_messages(consultation):
+    return [
+        {"role": "system", "content": "You are a helpful assistant that summarizes chat history into knowledge base entries. You always output valid JSON."},
+        {"role": "user", "content": build_summary_prompt(build_chat_history(consultation))}
+    ]
+
+
+def save_summary(consultation, raw_text, user_id):
+    """
+    AIの出力(JSON)からナレッジ(Question)を作成する
+    """
+    ai_data = json.loads(raw_text)
+
+    # AIが「解決していない」と判断した場合はナレッジを作成しない
+    if not ai_data.get('is_solved', True):
+        return {'question_id': None, 'ai': True}
+
+    with transaction.atomic():
+        # AI の呼び出し中に他で作成されていた場合はそれを使う
+        existing = Question.objects.filter(source_consultation=consultation).values_list('pk', flat=True).first()
+        if existing:
+            return {'question_id': existing, 'ai': None}
+        question = Question.objects.create(
+            source_consultation=consultation,
+            title=ai_data.get('title', consultation.title),
+            problem_summary=ai_data.get('problem', '自動生成失敗'),
+            solution_summary=ai_data.get('solution', '自動生成失敗'),
+            created_by_id=user_id,
+        )
+    return {'question_id': question.pk, 'ai': True}
+
+
+@register('consultations.summarize', on_failure=_summary_failed)
+def summarize_consultation(payload):
+    """
+    解決済み相談の会話を要約してナレッジ(Question)を作成する
+    """
+    consultation = Consultation.objects.filter(pk=payload['consultation_id']).first()
+    if consultation is None:
+        return {}
+    # 解決操作が重複した場合でもナレッジは1件のみ
+    existing = Question.objects.filter(source_consultation=consultation).values_list('pk', flat=True).first()
+    if existing:
+        return {'question_id': existing, 'ai': None}
+
+    if not llm_client.is_available():
+        question = create_fallback_question(consultation, payload.get('user_id'))
+        return {'question_id': question.pk, 'ai': False}
+
+    raw_text = llm_client.chat(summary_messages(consultation), response_format=SUMMARY_RESPONSE_FORMAT)
+    return save_summary(consultation, raw_text, payload.get('user_id'))
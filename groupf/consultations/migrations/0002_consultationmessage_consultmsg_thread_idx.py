@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultations', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='consultationmessage',
+            index=models.Index(fields=['consultation', 'created_at', 'id'], name='consultmsg_thread_idx'),
+        ),
+    ]
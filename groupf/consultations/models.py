@@ -49,6 +49,10 @@ class ConsultationMessage(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # キーセットページング用（chat/pagination.py）
+            models.Index(fields=['consultation', 'created_at', 'id'], name='consultmsg_thread_idx'),
+        ]
 
 class Question(models.Model):
     """
@@ -6,4 +6,6 @@ urlpatterns = [
     path('create/', views.consultation_create_view, name='consultation_create_view'),
     path('<int:pk>/', views.consultation_detail_view, name='consultation_detail_view'),
     path('<int:pk>/resolve/', views.consultation_resolve, name='consultation_resolve'),
+    path('<int:pk>/messages/', views.api_consultation_messages, name='api_consultation_messages'),
+    path('<int:pk>/summary-stream/', views.consultation_summary_stream, name='consultation_summary_stream'),
 ]
@@ -0,0 +1,301 @@
+"""
+リクエストごとの SQL 問い合わせ回数・DB時間・処理時間の計測（QueryBudgetMiddleware）
+
+- connection.execute_wrapper で問い合わせを数える（DEBUG = False の本番環境でも動く）
+- 同じ SQL（パラメータ違いを含む）を2回以上実行したものを「重複」として指紋（正規化した SQL）で記録する
+  一覧表示の N+1 問題の検出用
+- 結果は Server-Timing ヘッダ（ブラウザの開発者ツールで見られる）と、
+  ビューごとの直近 QUERY_STATS_WINDOW 件の統計（query_stats_view）で確認する
+- 上限（予算）を超えたリクエストは警告ログを出し、統計の over_budget に数える
+  上限は QUERY_BUDGET_QUERIES / QUERY_BUDGET_MS、ビューごとの上限は QUERY_BUDGETS（URL名 -> dict）
+  または @query_budget デコレータで指定する
+
+テストでは QueryCountAssertionsMixin.assertQueryCountConstant() で
+「データを増やしても問い合わせ回数が変わらない」ことを確認できる。
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.db import connections
+from django.http import HttpResponseForbidden, JsonResponse
+
+logger = logging.getLogger(__name__)
+
+# 1件の統計に残す重複 SQL の数
+TOP_DUPLICATES = 5
+
+
+def _enabled():
+    return getattr(settings, 'QUERY_BUDGET_ENABLED', True)
+
+
+def _window():
+    return getattr(settings, 'QUERY_STATS_WINDOW', 200)
+
+
+def fingerprint(sql):
+    """
+    SQL の指紋（IN (...) のパラメータ数・リテラル・空白の違いをまとめる）
+    """
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+\b', '?', sql)
+    sql = re.sub(r'\bIN \((?:%s|\?)(?:, ?(?:%s|\?))*\)', 'IN (...)', sql)
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+class QueryRecorder:
+    """
+    with ブロック内の問い合わせを数える（全データベース接続）
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def duplicates(self, limit=TOP_DUPLICATES):
+        return [(sql, n) for sql, n in self.fingerprints.most_common(limit) if n > 1]
+
+
+def query_budget(queries=None, ms=None):
+    """
+    ビューの上限を指定するデコレータ（設定 QUERY_BUDGETS があればそちらを優先する）
+        @login_required
+        @query_budget(queries=10, ms=300)
+        def top_page(request): ...
+    """
+    def decorator(view_func):
+        view_func.query_budget = {'queries': queries, 'ms': ms}
+        return view_func
+    return decorator
+
+
+def budget_for(view_name, view_func=None):
+    """
+    ビューの上限 {'queries': 回数, 'ms': ミリ秒}（None は上限なし）
+    既定値 < @query_budget < 設定 QUERY_BUDGETS の順に上書きする
+    """
+    budget = {
+        'queries': getattr(settings, 'QUERY_BUDGET_QUERIES', 50),
+        'ms': getattr(settings, 'QUERY_BUDGET_MS', 1000),
+    }
+    for key, value in (getattr(view_func, 'query_budget', None) or {}).items():
+        if value is not None:
+            budget[key] = value
+    budget.update(getattr(settings, 'QUERY_BUDGETS', {}).get(view_name, {}))
+    return budget
+
+
+def over_budget(budget, queries, ms):
+    reasons = []
+    if budget.get('queries') is not None and queries > budget['queries']:
+        reasons.append(f"queries {queries} > {budget['queries']}")
+    if budget.get('ms') is not None and ms > budget['ms']:
+        reasons.append(f"time {ms:.0f}ms > {budget['ms']}ms")
+    return reasons
+
+
+class _Stats:
+    """
+    ビューごとの直近のリクエストの計測結果（プロセス内）
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=_window()))
+        self._over = Counter()
+        self._duplicates = defaultdict(Counter)
+        self._budgets = {}
+
+    def record(self, view_name, budget, queries, db_ms, total_ms, duplicates, over):
+        with self._lock:
+            self._samples[view_name].append((queries, db_ms, total_ms))
+            self._budgets[view_name] = budget
+            if over:
+                self._over[view_name] += 1
+            for sql, n in duplicates:
+                self._duplicates[view_name][sql] = max(self._duplicates[view_name][sql], n)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._over.clear()
+            self._duplicates.clear()
+            self._budgets.clear()
+
+    def snapshot(self):
+        """
+        ビューごとの集計（p95 の処理時間が長い順）
+        """
+        def p95(values):
+            values = sorted(values)
+            return values[min(len(values) - 1, int(len(values) * 0.95))]
+
+        with self._lock:
+            items = {name: list(samples) for name, samples in self._samples.items()}
+            over = dict(self._over)
+            budgets = dict(self._budgets)
+            duplicates = {name: counter.most_common(TOP_DUPLICATES) for name, counter in self._duplicates.items()}
+
+        result = []
+        for name, samples in items.items():
+            queries = [s[0] for s in samples]
+            db_ms = [s[1] for s in samples]
+            total_ms = [s[2] for s in samples]
+            result.append({
+                'view': name,
+                'requests': len(samples),
+                'queries': {'avg': round(sum(queries) / len(queries), 1), 'p95': p95(queries), 'max': max(queries)},
+                'db_ms': {'avg': round(sum(db_ms) / len(db_ms), 1), 'p95': round(p95(db_ms), 1)},
+                'total_ms': {'avg': round(sum(total_ms) / len(total_ms), 1), 'p95': round(p95(total_ms), 1), 'max': round(max(total_ms), 1)},
+                'over_budget': over.get(name, 0),
+                'budget': budgets[name],
+                'duplicates': [{'sql': sql, 'count': n} for sql, n in duplicates.get(name, [])],
+            })
+        result.sort(key=lambda row: row['total_ms']['p95'], reverse=True)
+        return result
+
+
+stats = _Stats()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None, None
+    return match.view_name or match._func_path, match.func
+
+
+class QueryBudgetMiddleware:
+    """
+    リクエストごとの問い合わせ回数・DB時間・処理時間を計測する
+    MIDDLEWARE の先頭近くに置く（セッション・認証の問い合わせも数える）
+    ASGI（daphne）でも同期・非同期のどちらのビューの前でも使える（非同期ビューを同期に切り替えない）
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not _enabled():
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        return self._finish(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        if not _enabled():
+            return await self.get_response(request)
+
+        # DB接続はスレッドごとで、問い合わせは sync_to_async（thread_sensitive）のスレッドで実行されるため、
+        # そのスレッドの接続に計測を仕掛ける
+        start = time.perf_counter()
+        recorder = QueryRecorder()
+        await sync_to_async(recorder.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recorder.__exit__)(None, None, None)
+        return self._finish(request, response, recorder, start)
+
+    def _finish(self, request, response, recorder, start):
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = recorder.db_time * 1000
+
+        view_name, view_func = _view_name(request)
+        if view_name is None:
+            return response
+
+        duplicates = recorder.duplicates()
+        budget = budget_for(view_name, view_func)
+        reasons = over_budget(budget, recorder.count, total_ms)
+        if reasons:
+            logger.warning(
+                'query budget exceeded: %s %s (%s) duplicates=%s',
+                request.method, request.path, ', '.join(reasons), duplicates,
+            )
+        stats.record(view_name, budget, recorder.count, db_ms, total_ms, duplicates, bool(reasons))
+
+        timing = (
+            f'db;dur={db_ms:.1f};desc="{recorder.count} queries", '
+            f'dup;desc="{sum(n - 1 for _, n in duplicates)} duplicate", '
+            f'total;dur={total_ms:.1f}'
+        )
+        if response.has_header('Server-Timing'):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response['Server-Timing'] = timing
+        return response
+
+
+@login_required
+def query_stats_view(request):
+    """
+    ビューごとの計測結果（管理者のみ）。?reset=1 で集計をやり直す
+    """
+    role = getattr(request.user, 'role', None)
+    if not (request.user.is_superuser or (role and role.code == 'admin')):
+        return HttpResponseForbidden()
+    if request.GET.get('reset') == '1':
+        stats.clear()
+    return JsonResponse({'window': _window(), 'views': stats.snapshot()})
+
+
+class QueryCountAssertionsMixin:
+    """
+    TestCase 用: データを増やしても問い合わせ回数が変わらないことを確認する
+        self.assertQueryCountConstant(lambda: self.client.get(url), lambda: make_rows(10))
+    """
+
+    def assertQueryCountConstant(self, request, grow, rounds=2):
+        """
+        request(): 計測する処理（ビューの呼び出し）
+        grow(): データを増やす処理（rounds 回呼ぶ）
+        1回目は準備（キャッシュ等）のため計測しない
+        """
+        request()
+        counts = []
+        recorders = []
+        for i in range(rounds + 1):
+            if i:
+                grow()
+            with QueryRecorder() as recorder:
+                request()
+            counts.append(recorder.count)
+            recorders.append(recorder)
+        if len(set(counts)) > 1:
+            duplicates = '\n'.join(f'  {n} x {sql}' for sql, n in recorders[-1].duplicates())
+            self.fail(f'query count grows with data: {counts}\nduplicated queries:\n{duplicates or "  (none)"}')
@@ -37,12 +37,15 @@ CSRF_TRUSTED_ORIGINS = ['http://127.0.0.1:8000', 'http://localhost:8000']
 # Application definition
 
 INSTALLED_APPS = [
+    # runserver を ASGI(WebSocket 対応)で起動する
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'channels',
     'team_tasks',
     'accounts',
     'tasks',
@@ -52,14 +55,22 @@ INSTALLED_APPS = [
     'interviews',
     'notifications',
     'chat',
+    'search',
+    'llm',
+    # ベンチマーク用データの生成・計測コマンド（generate_benchmark_data / run_benchmarks）
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    # 問い合わせ回数・処理時間の計測（groupf/querybudget.py）。他のミドルウェアの問い合わせも数えるため先頭に置く
+    'groupf.querybudget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # request.user.role をマスタレジストリから設定する（accounts/middleware.py）
+    'accounts.middleware.MasterRoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -78,6 +89,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'notifications.context_processors.unread_notifications',
             ],
         },
     },
@@ -85,6 +97,46 @@ TEMPLATES = [
 # ★★★★★ ここまで ★★★★★
 
 WSGI_APPLICATION = 'groupf.wsgi.application'
+ASGI_APPLICATION = 'groupf.asgi.application'
+
+# チャットのリアルタイム配信（Django Channels）
+# 複数プロセスで動かす場合は CHANNEL_REDIS_URL を設定して Redis を使う（channels_redis が必要）
+if os.getenv('CHANNEL_REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.getenv('CHANNEL_REDIS_URL')]},
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+    }
+
+# キャッシュ（通知の未読件数・ライブ配信の変更通知 notifications/services.py で使う）
+# 全プロセス（daphne・ワーカー・管理コマンド）で共有するキャッシュが必須（プロセスごとの LocMem では
+# 別プロセスの更新が届かず、未読件数やライブ配信がずれる）
+# 複数のサーバーで動かす場合は CACHE_REDIS_URL を設定して Redis を使う（redis パッケージが必要）
+# 未設定の場合は同じサーバーのプロセス間で共有できるファイルキャッシュ（CACHE_DIR）を使う
+# （DB のキャッシュテーブルは読むたびに問い合わせが増えるため使わない）
+if os.getenv('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_REDIS_URL'),
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', str(BASE_DIR / '.cache')),
+            # ユーザーごとのキーを持つため、既定の 300 件では足りない
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+    }
+# テストでは共有キャッシュを使わない（groupf/test_runner.py）
+TEST_RUNNER = 'groupf.test_runner.TestRunner'
 
 
 # Database
@@ -148,6 +200,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+
+# AIジョブキュー（run_llm_worker コマンドで処理する）
+# LLM_JOBS_EAGER = True の場合はワーカーを使わずリクエスト内で即時実行する（開発用）
+LLM_JOBS_EAGER = os.getenv('LLM_JOBS_EAGER', 'False') == 'True'
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+LLM_JOB_MAX_ATTEMPTS = 3
+LLM_JOB_BACKOFF_SECONDS = 5
+
+# AI呼び出しの共通クライアント（llm/client.py）: 'openai' または 'fake'（APIを呼ばない）
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'openai')
+LLM_CACHE_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', '3600'))
+LLM_CACHE_MAX_ENTRIES = 256
+
 AUTH_USER_MODEL = 'accounts.User'
 LOGIN_URL = '/login/'
 
@@ -173,3 +238,56 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024  # 50MB
 FILE_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024
 
 X_FRAME_OPTIONS = "SAMEORIGIN"
+
+# マニュアル添付ファイルの本文抽出（False の場合は extract_manual_files コマンドで処理する）
+MANUAL_EXTRACTION_BACKGROUND = os.getenv('MANUAL_EXTRACTION_BACKGROUND', 'True') == 'True'
+
+# マニュアル添付ファイルの送信を Web サーバに委譲する場合: 'x-accel'(nginx) / 'x-sendfile'(Apache)
+MANUAL_FILE_OFFLOAD = os.getenv('MANUAL_FILE_OFFLOAD', '')
+MANUAL_FILE_OFFLOAD_PREFIX = os.getenv('MANUAL_FILE_OFFLOAD_PREFIX', '/protected-media/')
+
+# 通知（notifications/services.py）
+# 同じ相手・同じ対象への未読通知をまとめる時間（秒）と、未読件数キャッシュの有効期間（秒）
+NOTIFICATION_COLLAPSE_SECONDS = int(os.getenv('NOTIFICATION_COLLAPSE_SECONDS', '600'))
+NOTIFICATION_UNREAD_CACHE_SECONDS = 300
+# 通知のライブ配信（SSE）: 1接続の最大秒数（ブラウザが自動で再接続する）と、変更確認の間隔（秒）
+NOTIFICATION_STREAM_SECONDS = 55
+NOTIFICATION_POLL_INTERVAL = 1.0
+
+# CSVによるユーザー一括登録（False の場合は import_users コマンドで処理する）
+USER_IMPORT_BACKGROUND = os.getenv('USER_IMPORT_BACKGROUND', 'True') == 'True'
+# 初期パスワードのハッシュ化に使うスレッド数（None の場合は CPU コア数）
+USER_IMPORT_HASH_WORKERS = None
+# 処理中（running）のまま、この秒数を過ぎたジョブは import_users コマンドで待機中に戻す
+USER_IMPORT_TIMEOUT_SECONDS = 1800
+
+# メール送信のアウトボックス（send_outbox コマンドで送信する）
+# EMAIL_OUTBOX_BACKGROUND = True の場合は登録後にバックグラウンドスレッドでも送信する（ワーカーなしの開発環境向け。既定は DEBUG と同じ）
+# 本番では False のまま send_outbox ワーカーだけで送る（送信間隔の上限はワーカーのプロセス内で守る）
+EMAIL_OUTBOX_BACKGROUND = os.getenv('EMAIL_OUTBOX_BACKGROUND', str(DEBUG)) == 'True'
+EMAIL_OUTBOX_BATCH_SIZE = 50
+# 1分あたりの送信上限（0 は無制限）
+EMAIL_OUTBOX_RATE_PER_MINUTE = int(os.getenv('EMAIL_OUTBOX_RATE_PER_MINUTE', '60'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_BACKOFF_SECONDS = 30
+
+# 空き時間の計算（schedule/freebusy.py）: 勤務時間（時）・勤務日（月曜 = 0）・1回に指定できるユーザー数
+SCHEDULE_WORKING_HOURS = (9, 18)
+SCHEDULE_WORKING_DAYS = (0, 1, 2, 3, 4)
+SCHEDULE_FREEBUSY_MAX_USERS = 100
+# 期間を省略した場合に探す日数
+SCHEDULE_FREEBUSY_DEFAULT_DAYS = 14
+
+# マスタテーブルのプロセス内キャッシュ（accounts/masters.py）の有効期間（秒）
+# 同じプロセスでの変更はシグナルですぐに反映される。他のプロセスでの変更はこの時間内に反映される
+MASTER_CACHE_SECONDS = 300
+
+# リクエストごとの問い合わせ回数・処理時間の計測（groupf/querybudget.py）
+# 上限を超えたリクエストは警告ログを出す。ビューごとの上限は QUERY_BUDGETS（URL名 -> {'queries', 'ms'}）
+# または @query_budget デコレータで指定する
+QUERY_BUDGET_ENABLED = os.getenv('QUERY_BUDGET_ENABLED', 'True') == 'True'
+QUERY_BUDGET_QUERIES = 50
+QUERY_BUDGET_MS = 1000
+QUERY_BUDGETS = {}
+# ビューごとに統計に残す直近のリクエスト数
+QUERY_STATS_WINDOW = 200
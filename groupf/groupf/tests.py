@@ -0,0 +1,104 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts import masters
+from accounts.models import Department, RoleMaster
+from interviews.models import Interview
+from .querybudget import QueryBudgetMiddleware, QueryCountAssertionsMixin, fingerprint, stats
+
+User = get_user_model()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class QueryBudgetTest(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        stats.clear()
+        self.addCleanup(stats.clear)
+        self.addCleanup(masters.clear)
+        self.department = Department.objects.create(name='開発部')
+        self.admin_role = RoleMaster.objects.create(code='admin', name='管理者')
+        self.employee_role = RoleMaster.objects.create(code='employee', name='一般社員')
+        self.manager = User.objects.create_user(
+            employee_number='M001', email='m@example.com', password='password',
+            department=self.department, role=self.admin_role,
+        )
+        self.client.login(employee_number='M001', password='password')
+        self.members = 0
+
+    def add_members(self, n=3):
+        for _ in range(n):
+            self.members += 1
+            employee = User.objects.create_user(
+                employee_number=f'E{self.members:03d}', email=f'e{self.members}@example.com', password='x',
+                department=self.department, role=self.employee_role,
+            )
+            Interview.objects.create(
+                manager=self.manager, employee=employee, scheduled_at=timezone.now(), theme='1on1',
+            )
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) AND "name" = \'a\'  LIMIT 21'),
+            fingerprint('SELECT * FROM "t" WHERE "id" IN (%s) AND "name" = \'b\' LIMIT 21'),
+        )
+
+    def test_server_timing_and_stats(self):
+        self.add_members()
+        response = self.client.get(reverse('follow_up_report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="\d+ queries", dup;desc="\d+ duplicate", total;dur=[\d.]+')
+
+        data = self.client.get(reverse('query_stats')).json()
+        rows = {row['view']: row for row in data['views']}
+        self.assertEqual(rows['follow_up_report']['requests'], 1)
+        self.assertEqual(rows['follow_up_report']['over_budget'], 0)
+        self.assertEqual(rows['follow_up_report']['budget']['queries'], 10)
+
+    async def test_async_request_is_measured(self):
+        # ASGI では非同期のまま計測する（同期ビューは sync_to_async で実行される）
+        await self.async_client.aforce_login(self.manager)
+        response = await self.async_client.get(reverse('follow_up_report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn('follow_up_report', {row['view'] for row in stats.snapshot()})
+
+    def test_middleware_is_hybrid(self):
+        async def async_view(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(QueryBudgetMiddleware(async_view)))
+        self.assertFalse(iscoroutinefunction(QueryBudgetMiddleware(lambda request: HttpResponse())))
+
+    def test_over_budget_is_logged(self):
+        with override_settings(QUERY_BUDGETS={'follow_up_report': {'queries': 1}}):
+            with self.assertLogs('groupf.querybudget', logging.WARNING) as logs:
+                self.client.get(reverse('follow_up_report'))
+        self.assertIn('query budget exceeded', logs.output[0])
+        rows = {row['view']: row for row in self.client.get(reverse('query_stats')).json()['views']}
+        self.assertEqual(rows['follow_up_report']['over_budget'], 1)
+
+    def test_stats_require_admin(self):
+        User.objects.create_user(employee_number='E999', email='x@example.com', password='password', role=self.employee_role)
+        self.client.login(employee_number='E999', password='password')
+        self.assertEqual(self.client.get(reverse('query_stats')).status_code, 403)
+
+    def test_follow_up_report_and_account_list_do_not_grow(self):
+        for name in ('follow_up_report', 'account_list_page'):
+            with self.subTest(view=name):
+                url = reverse(name)
+                self.assertQueryCountConstant(lambda: self.client.get(url), self.add_members)
+
+    def test_assert_query_count_constant_detects_growth(self):
+        def n_plus_one():
+            for user in User.objects.all():
+                Interview.objects.filter(employee=user).first()
+
+        with self.assertRaisesRegex(AssertionError, 'query count grows with data'):
+            self.assertQueryCountConstant(n_plus_one, self.add_members)
@@ -6,6 +6,7 @@ from django.urls import path, include, re_path
 from django.contrib.staticfiles.views import serve
 from django.conf import settings
 from django.conf.urls.static import static
+from .querybudget import query_stats_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -17,6 +18,8 @@ urlpatterns = [
     path('schedule/', include('schedule.urls')),
     path('notifications/', include('notifications.urls')),
     path('chat/', include('chat.urls')),
+    path('llm/', include('llm.urls')),
+    path('ops/query-stats/', query_stats_view, name='query_stats'),
 ]
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
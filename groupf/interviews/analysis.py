@@ -0,0 +1,157 @@
+"""
+部下分析データ(MemberAnalysis)の増分更新
+
+分析データは項目ごとの短い箇条書き（構造化サマリー）として保持し、件数・文字数に上限を設ける。
+フィードバックのたびにAIへ送るのは「現在のサマリー + 今回のフィードバック」だけなので、
+面談回数が増えてもプロンプトの大きさ・応答時間は一定に保たれる。
+更新のたびに版数を上げ、MemberAnalysisRevision に履歴を残す。
+AIの呼び出し中に別のフィードバックで版が進んだ場合は、最新のサマリーから差分をやり直す
+（ワーカーの複数スレッドで同じ部下のフィードバックを処理しても、片方の更新を失わない）。
+"""
+import json
+
+from django.db import transaction
+
+from llm import client as llm_client
+from .models import MemberAnalysis, MemberAnalysisRevision
+
+# (キー, 見出し)
+SUMMARY_SECTIONS = [
+    ('praise', '効果的な褒め方'),
+    ('caution', '注意すべき接し方'),
+    ('thinking', '思考パターン'),
+    ('notes', 'その他の特徴'),
+]
+MAX_ITEMS_PER_SECTION = 8
+MAX_ITEM_CHARS = 120
+# 構造化サマリー導入前の分析テキストは、最初の1回だけ先頭をAIに渡して移行する
+MAX_LEGACY_CHARS = 2000
+# 版の競合時に差分をやり直す回数（超えた場合はジョブの再試行に任せる）
+MAX_MERGE_ATTEMPTS = 3
+
+SUMMARY_RESPONSE_FORMAT = {"type": "json_object"}
+
+
+class StaleAnalysis(Exception):
+    """
+    差分の元にした版の後に、分析データが更新された
+    """
+
+
+def normalize_summary(data):
+    """
+    AIの出力を既定の項目・上限に揃える
+    """
+    data = data if isinstance(data, dict) else {}
+    summary = {}
+    for key, _ in SUMMARY_SECTIONS:
+        items = data.get(key) or []
+        if isinstance(items, str):
+            items = [items]
+        cleaned = []
+        for item in items:
+            text = str(item).strip()
+            if text and text not in cleaned:
+                cleaned.append(text[:MAX_ITEM_CHARS])
+        summary[key] = cleaned[:MAX_ITEMS_PER_SECTION]
+    return summary
+
+
+def render_analysis_text(summary):
+    """
+    構造化サマリーを表示用の Markdown にする（analysis_text に保存）
+    """
+    blocks = []
+    for key, label in SUMMARY_SECTIONS:
+        items = summary.get(key) or []
+        if items:
+            blocks.append(f"## {label}\n" + "\n".join(f"- {item}" for item in items))
+    return "\n\n".join(blocks)
+
+
+def build_delta_prompt(analysis, feedback):
+    interview = feedback.interview
+    employee = interview.employee
+
+    if analysis.summary:
+        current = json.dumps(analysis.summary, ensure_ascii=False)
+        legacy = ""
+    else:
+        current = json.dumps(normalize_summary({}), ensure_ascii=False)
+        legacy = analysis.analysis_text[:MAX_LEGACY_CHARS]
+
+    sections = "\n".join(f'  "{key}": {label}' for key, label in SUMMARY_SECTIONS)
+    legacy_block = f"\n【以前の分析メモ（今回のみ参照）】\n{legacy}\n" if legacy else ""
+
+    return f"""
+        あなたは優秀なマネジメントコーチです。
+        部下の「取扱説明書（特性分析データ）」を、今回の面談結果だけを反映して更新してください。
+
+        【部下】{employee.last_name} {employee.first_name}
+        【今回の面談テーマ】{interview.theme}
+        【結果評価】{feedback.evaluation} (3:成功, 2:普通, 1:失敗)
+        【観察タグ】{', '.join(feedback.tags or [])}
+        【上司メモ】{feedback.memo}
+
+        【現在の分析データ(JSON)】
+        {current}
+        {legacy_block}
+        【指示】
+        - 現在の分析データに今回の結果を統合し、更新後の分析データ全体を同じJSON形式で出力してください。
+        - 各項目は {MAX_ITEMS_PER_SECTION} 件以内、1件 {MAX_ITEM_CHARS} 文字以内の箇条書き（文字列の配列）にしてください。
+        - 上限を超える場合は、重要度の低いものや重複するものを統合・削除してください。
+        - 項目:
+{sections}
+        """
+
+
+def apply_feedback(feedback):
+    """
+    フィードバック1件分を分析データに反映し、新しい版を保存する
+    APIが使えない場合は分析データを変更せず None を返す
+    版が競合し続けた場合は StaleAnalysis（ジョブがバックオフして再試行する）
+    """
+    employee = feedback.interview.employee
+    analysis, _ = MemberAnalysis.objects.get_or_create(target_user=employee)
+    if not llm_client.is_available():
+        return None
+
+    for attempt in range(MAX_MERGE_ATTEMPTS):
+        if attempt:
+            analysis.refresh_from_db()
+        raw_text = llm_client.chat(
+            [
+                {"role": "system", "content": "あなたは優秀なマネジメントコーチです。必ず有効なJSONのみを出力します。"},
+                {"role": "user", "content": build_delta_prompt(analysis, feedback)},
+            ],
+            response_format=SUMMARY_RESPONSE_FORMAT,
+        )
+        summary = normalize_summary(json.loads(raw_text))
+        try:
+            return save_revision(analysis.pk, summary, feedback, base_version=analysis.version)
+        except StaleAnalysis:
+            continue
+    raise StaleAnalysis(f"MemberAnalysis {analysis.pk} の更新が競合しました")
+
+
+def save_revision(analysis_id, summary, feedback=None, base_version=None):
+    """
+    新しい版を保存する
+    base_version を指定した場合、保存時の版がそれと異なれば StaleAnalysis（上書きしない）
+    """
+    with transaction.atomic():
+        analysis = MemberAnalysis.objects.select_for_update().get(pk=analysis_id)
+        if base_version is not None and analysis.version != base_version:
+            raise StaleAnalysis(f"MemberAnalysis {analysis_id} は v{base_version} から v{analysis.version} に更新されています")
+        analysis.summary = summary
+        analysis.analysis_text = render_analysis_text(summary)
+        analysis.version += 1
+        analysis.save(update_fields=['summary', 'analysis_text', 'version', 'last_updated'])
+        MemberAnalysisRevision.objects.create(
+            analysis=analysis,
+            version=analysis.version,
+            summary=summary,
+            analysis_text=analysis.analysis_text,
+            feedback=feedback,
+        )
+    return analysis
@@ -0,0 +1,120 @@
+"""
+面談関連のAIジョブ（llm.jobs に登録される）
+"""
+from llm import client as llm_client
+from llm.jobs import register
+from accounts.models import User
+from .analysis import apply_feedback
+from .models import Interview, InterviewFeedback
+
+SCRIPT_PENDING_TEXT = "AIがトークスクリプトを作成中です。しばらくお待ちください。"
+SCRIPT_NO_KEY_TEXT = "APIキーが設定されていないため、デモ用のテキストを表示します。\n（APIキーを設定するとここにAI生成テキストが表示されます）"
+
+
+def build_script_prompt(interview):
+    manager = interview.manager
+    employee = interview.employee
+
+    # 部下の分析データがあれば取得
+    analysis_text = "（まだ分析データはありません）"
+    if hasattr(employee, 'member_analysis'):
+        analysis_text = employee.member_analysis.analysis_text
+
+    return f"""
+        あなたは優秀なマネジメントコーチです。
+        以下の上司と部下の面談に向けた「トークスクリプト（台本）」と「アドバイス」を作成してください。
+
+        【上司】{manager.last_name} {manager.first_name}
+        【部下】{employee.last_name} {employee.first_name} ({employee.department.name if employee.department else '部署なし'}, {employee.role.name if employee.role else ''})
+        【面談テーマ】{interview.theme}
+        【部下の特性（過去の分析）】
+        {analysis_text}
+
+        【出力フォーマット】
+        # 1. アプローチ戦略
+        （簡潔に）
+        # 2. トークスクリプト
+        上司: 「〜」
+        部下: （想定）「〜」
+        上司: 「〜」
+        # 3. 注意点（NGワードなど）
+        部下の世代や特性を考慮した注意点を挙げてください。
+        例: 【世代別NGワード】もし部下がコロナ世代（Z世代など）の場合、「修学旅行の思い出は？」など、コロナ禍で失われた経験に関する話題は避ける、など。
+        """
+
+
+# ==========================================
+# トークスクリプト生成（interview_create）
+# ==========================================
+
+def _script_failed(payload, error):
+    Interview.objects.filter(pk=payload['interview_id']).update(script_generated=f"エラーが発生しました: {error}")
+
+
+def _can_view_script_job(user, payload):
+    # interview_detail と同じく、面談詳細を開ける人はスクリプト生成の状態も見られる
+    return Interview.objects.filter(pk=payload.get('interview_id')).exists()
+
+
+def load_interview(interview_id):
+    return (
+        Interview.objects.select_related('manager', 'employee__department', 'employee__role', 'employee__member_analysis')
+        .filter(pk=interview_id).first()
+    )
+
+
+def script_messages(interview):
+    return [
+        {"role": "system", "content": "あなたは優秀なマネジメントコーチです。"},
+        {"role": "user", "content": build_script_prompt(interview)}
+    ]
+
+
+def save_script(interview_id, script):
+    Interview.objects.filter(pk=interview_id).update(script_generated=script)
+    return {'interview_id': interview_id}
+
+
+@register('interviews.generate_script', on_failure=_script_failed, can_view=_can_view_script_job)
+def generate_script(payload):
+    interview = load_interview(payload['interview_id'])
+    if interview is None:
+        return {}
+
+    if llm_client.is_available():
+        script = llm_client.chat(script_messages(interview))
+    else:
+        script = SCRIPT_NO_KEY_TEXT
+    return save_script(interview.pk, script)
+
+
+# ==========================================
+# 部下分析の更新（interview_feedback）
+# ==========================================
+
+def _analysis_failed(payload, error):
+    InterviewFeedback.objects.filter(pk=payload['feedback_id']).update(ai_analysis_log=str(error))
+
+
+def _can_view_analysis_job(user, payload):
+    # member_analysis と同じく、部下の分析画面を開ける人は更新の状態も見られる
+    return User.objects.filter(pk=payload.get('target_user_id')).exists()
+
+
+@register('interviews.update_analysis', on_failure=_analysis_failed, can_view=_can_view_analysis_job)
+def update_member_analysis(payload):
+    """
+    今回のフィードバックと現在の構造化サマリーだけを送って増分更新する（interviews/analysis.py）
+    """
+    feedback = InterviewFeedback.objects.select_related('interview__employee').filter(pk=payload['feedback_id']).first()
+    if feedback is None:
+        return {}
+
+    # apply_feedback は AI の呼び出し後の保存（save_revision）だけをトランザクションで行う
+    analysis = apply_feedback(feedback)
+    feedback.ai_analysis_log = "AI Analysis Success" if analysis else "No API Key"
+    feedback.save(update_fields=['ai_analysis_log'])
+    return {
+        'target_user_id': feedback.interview.employee_id,
+        'version': analysis.version if analysis else None,
+    }
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_revisions(apps, schema_editor):
+    # 既存の分析テキストを初版(v1)として履歴に残す
+    MemberAnalysis = apps.get_model('interviews', 'MemberAnalysis')
+    MemberAnalysisRevision = apps.get_model('interviews', 'MemberAnalysisRevision')
+    revisions = []
+    for analysis in MemberAnalysis.objects.exclude(analysis_text='').iterator():
+        revisions.append(MemberAnalysisRevision(analysis=analysis, version=1, analysis_text=analysis.analysis_text))
+    MemberAnalysisRevision.objects.bulk_create(revisions, batch_size=500)
+    MemberAnalysis.objects.exclude(analysis_text='').update(version=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interviews', '0003_interview_location'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memberanalysis',
+            name='summary',
+            field=models.JSONField(blank=True, default=dict, verbose_name='構造化サマリー'),
+        ),
+        migrations.AddField(
+            model_name='memberanalysis',
+            name='version',
+            field=models.PositiveIntegerField(default=0, verbose_name='版数'),
+        ),
+        migrations.CreateModel(
+            name='MemberAnalysisRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(verbose_name='版数')),
+                ('summary', models.JSONField(default=dict, verbose_name='構造化サマリー')),
+                ('analysis_text', models.TextField(blank=True, verbose_name='AI分析テキスト（取説）')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='作成日時')),
+                ('analysis', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='interviews.memberanalysis', verbose_name='部下分析データ')),
+                ('feedback', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='analysis_revisions', to='interviews.interviewfeedback', verbose_name='反映したフィードバック')),
+            ],
+            options={
+                'verbose_name': '部下分析データ履歴',
+                'verbose_name_plural': '部下分析データ履歴',
+                'ordering': ['-version'],
+                'unique_together': {('analysis', 'version')},
+            },
+        ),
+        migrations.RunPython(seed_revisions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interviews', '0004_memberanalysis_summary_memberanalysis_version_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interview',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='更新日時'),
+        ),
+        migrations.AddIndex(
+            model_name='interview',
+            index=models.Index(fields=['manager', 'scheduled_at', 'end_at'], name='interview_manager_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interview',
+            index=models.Index(fields=['employee', 'scheduled_at', 'end_at'], name='interview_employee_date_idx'),
+        ),
+    ]
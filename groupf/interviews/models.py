@@ -40,12 +40,20 @@ class Interview(models.Model):
     location = models.CharField(max_length=100, blank=True, verbose_name="場所")
     script_generated = models.TextField(blank=True, null=True, verbose_name="AI生成スクリプト")
 
+    # カレンダー表示の ETag 用（schedule/feed.py）
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+
     def __str__(self):
         return f"面談: {self.manager} - {self.employee} ({self.scheduled_at})"
 
     class Meta:
         verbose_name = "面談"
         verbose_name_plural = "面談"
+        indexes = [
+            # カレンダー表示（上司・部下それぞれの期間検索）
+            models.Index(fields=['manager', 'scheduled_at', 'end_at'], name='interview_manager_date_idx'),
+            models.Index(fields=['employee', 'scheduled_at', 'end_at'], name='interview_employee_date_idx'),
+        ]
 
 class InterviewFeedback(models.Model):
     """
@@ -83,7 +91,12 @@ class MemberAnalysis(models.Model):
     target_user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='member_analysis', verbose_name="対象部下")
     
     # AIが生成した分析テキスト（Markdown形式想定）
+    # 増分更新後は summary から生成した表示用テキスト（interviews/analysis.py）
     analysis_text = models.TextField(blank=True, verbose_name="AI分析テキスト（取説）")
+
+    # 項目ごとの要約（件数・文字数に上限あり）。AIにはこれと今回のフィードバックだけを送る
+    summary = models.JSONField(default=dict, blank=True, verbose_name="構造化サマリー")
+    version = models.PositiveIntegerField(default=0, verbose_name="版数")
     
     last_updated = models.DateTimeField(auto_now=True, verbose_name="最終更新日時")
 
@@ -92,3 +105,25 @@ class MemberAnalysis(models.Model):
     class Meta:
         verbose_name = "部下分析データ"
         verbose_name_plural = "部下分析データ"
+
+
+class MemberAnalysisRevision(models.Model):
+    """
+    部下分析データの更新履歴（版ごとのスナップショット）
+    """
+    analysis = models.ForeignKey(MemberAnalysis, on_delete=models.CASCADE, related_name='revisions', verbose_name="部下分析データ")
+    version = models.PositiveIntegerField(verbose_name="版数")
+    summary = models.JSONField(default=dict, verbose_name="構造化サマリー")
+    analysis_text = models.TextField(blank=True, verbose_name="AI分析テキスト（取説）")
+    # どのフィードバックで更新されたか（初版・移行分は None）
+    feedback = models.ForeignKey(InterviewFeedback, on_delete=models.SET_NULL, null=True, blank=True, related_name='analysis_revisions', verbose_name="反映したフィードバック")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="作成日時")
+
+    def __str__(self):
+        return f"{self.analysis} v{self.version}"
+
+    class Meta:
+        verbose_name = "部下分析データ履歴"
+        verbose_name_plural = "部下分析データ履歴"
+        unique_together = ('analysis', 'version')
+        ordering = ['-version']
@@ -1,7 +1,15 @@
-from django.test import TestCase, Client
+import json
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from .models import Interview, InterviewStatusMaster
+from django.utils import timezone
+from llm import client as llm_client
+from llm.models import LLMJob
+from .analysis import MAX_ITEM_CHARS, MAX_ITEMS_PER_SECTION, save_revision
+from .llm_jobs import SCRIPT_PENDING_TEXT
+from .models import Interview, InterviewStatusMaster, MemberAnalysis
 
 User = get_user_model()
 
@@ -27,3 +35,106 @@ class InterviewCreateTest(TestCase):
         
         # Check if interview was created
         self.assertEqual(Interview.objects.count(), 0)
+
+
+@override_settings(LLM_BACKEND='fake', LLM_JOBS_EAGER=False)
+class InterviewScriptStreamTest(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(employee_number='0001', email='m@example.com', password='password', last_name='上司')
+        self.employee = User.objects.create_user(employee_number='0002', email='e@example.com', password='password', last_name='部下')
+        self.client.login(employee_number='0001', password='password')
+
+    async def _events(self, url):
+        await self.async_client.aforce_login(self.manager)
+        response = await self.async_client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        return [line.split(': ', 1)[1] for line in body.splitlines() if line.startswith('event: ')]
+
+    async def test_stream_forwards_tokens_and_saves_script(self):
+        response = await sync_to_async(self.client.post)(reverse('interview_create'), {
+            'employee': self.employee.id, 'theme': '目標設定', 'location': '会議室', 'scheduled_at': '2026-10-20 10:00',
+        })
+        interview = await Interview.objects.aget()
+        self.assertEqual(interview.script_generated, SCRIPT_PENDING_TEXT)
+
+        url = reverse('interview_script_stream', args=[interview.pk])
+        events = await self._events(url)
+        self.assertEqual(events[0], 'start')
+        self.assertGreater(events.count('token'), 1)
+        self.assertEqual(events[-1], 'done')
+
+        await interview.arefresh_from_db()
+        self.assertIn('目標設定', interview.script_generated)
+        job = await LLMJob.objects.aget()
+        self.assertEqual(job.status, 'succeeded')
+
+        # 処理済みのジョブは再実行しない
+        self.assertEqual(await self._events(url), ['busy'])
+
+    @override_settings(LLM_MAX_CONCURRENCY=1)
+    async def test_stream_respects_concurrency_cap(self):
+        await sync_to_async(self.client.post)(reverse('interview_create'), {
+            'employee': self.employee.id, 'theme': '目標設定', 'location': '会議室', 'scheduled_at': '2026-10-20 10:00',
+        })
+        interview = await Interview.objects.aget()
+        # ワーカーが上限いっぱいまで実行中なら、ストリームは確保せずポーリングに任せる
+        await LLMJob.objects.acreate(kind='tests.other', status='running', started_at=timezone.now(), run_after=timezone.now())
+        self.assertEqual(await self._events(reverse('interview_script_stream', args=[interview.pk])), ['busy'])
+        job = await LLMJob.objects.aget(kind='interviews.generate_script')
+        self.assertEqual(job.status, 'queued')
+
+
+@override_settings(LLM_BACKEND='fake', LLM_JOBS_EAGER=True)
+class MemberAnalysisIncrementalTest(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(employee_number='0001', email='m@example.com', password='password')
+        self.employee = User.objects.create_user(employee_number='0002', email='e@example.com', password='password')
+        self.client.login(employee_number='0001', password='password')
+
+        self.backend = llm_client.get_backend()
+        self.backend.responder = lambda model, messages, **params: json.dumps({
+            'praise': [f'具体的な成果を褒める{i}' for i in range(20)],
+            'caution': ['x' * 500],
+        })
+
+    def _feedback(self, memo):
+        interview = Interview.objects.create(manager=self.manager, employee=self.employee, scheduled_at=timezone.now(), theme=memo)
+        self.client.post(reverse('interview_feedback', args=[interview.pk]), {'evaluation': 3, 'tags': ['前向き'], 'memo': memo})
+
+    def test_sends_only_delta_and_keeps_versions(self):
+        self._feedback('初回メモ')
+        self._feedback('二回目メモ')
+
+        analysis = MemberAnalysis.objects.get(target_user=self.employee)
+        self.assertEqual(analysis.version, 2)
+        self.assertEqual(len(analysis.summary['praise']), MAX_ITEMS_PER_SECTION)
+        self.assertEqual(len(analysis.summary['caution'][0]), MAX_ITEM_CHARS)
+        self.assertIn('## 効果的な褒め方', analysis.analysis_text)
+        self.assertEqual(list(analysis.revisions.values_list('version', flat=True)), [2, 1])
+
+        # 2回目のプロンプトには前回のフィードバック本文を含めない（サマリーのみ）
+        prompts = [call['messages'][-1]['content'] for call in self.backend.calls]
+        self.assertNotIn('初回メモ', prompts[1])
+        self.assertIn('二回目メモ', prompts[1])
+
+    def test_concurrent_update_is_merged_not_lost(self):
+        self._feedback('初回メモ')
+        analysis = MemberAnalysis.objects.get(target_user=self.employee)
+        other = {'praise': ['別スレッドの更新'], 'caution': [], 'thinking': [], 'notes': []}
+        responder = self.backend.responder
+
+        def racing(model, messages, **params):
+            # 1回目のAI呼び出し中に、別のフィードバックの結果が保存される
+            if len(self.backend.calls) == 2:
+                save_revision(analysis.pk, other)
+            return responder(model, messages, **params)
+
+        self.backend.responder = racing
+        self._feedback('二回目メモ')
+
+        analysis.refresh_from_db()
+        self.assertEqual(analysis.version, 3)
+        self.assertEqual(list(analysis.revisions.values_list('version', flat=True)), [3, 2, 1])
+        # やり直しのプロンプトは、別スレッドが保存した最新のサマリーから作る
+        self.assertIn('別スレッドの更新', self.backend.calls[-1]['messages'][-1]['content'])
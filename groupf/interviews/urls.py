@@ -7,6 +7,7 @@ urlpatterns = [
     path('history/', views.interview_history_select, name='interview_history_select'),
     path('follow-up/', views.follow_up_report, name='follow_up_report'),
     path('detail/<int:pk>/', views.interview_detail, name='interview_detail'),
+    path('detail/<int:pk>/script-stream/', views.interview_script_stream, name='interview_script_stream'),
     path('feedback/<int:pk>/', views.interview_feedback, name='interview_feedback'),
     path('confirm/<int:pk>/', views.interview_confirm, name='interview_confirm'),
     path('decline/<int:pk>/', views.interview_decline, name='interview_decline'),
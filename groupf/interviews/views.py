@@ -1,8 +1,9 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.conf import settings
-from .models import Interview, InterviewStatusMaster, InterviewFeedback, MemberAnalysis
+from .models import Interview, InterviewStatusMaster, InterviewFeedback
+from accounts import masters
 from accounts.models import User
 from django.db.models import Q
 
@@ -10,7 +11,14 @@ import json
 import datetime
 from django.utils import timezone
 
-from openai import OpenAI
+from llm.jobs import enqueue, pending_job_for
+from notifications.services import notify
+from llm import client as llm_client
+from llm.streaming import sse_response, stream_job
+from groupf.querybudget import query_budget
+from .llm_jobs import SCRIPT_PENDING_TEXT, load_interview, save_script, script_messages
+from asgiref.sync import sync_to_async
+from functools import partial
 import os
 
 @login_required
@@ -72,7 +80,7 @@ def interview_home(request):
     
     # 部署内のemployee権限のユーザー一覧
     try:
-        employee_role = RoleMaster.objects.get(code='employee')
+        employee_role = masters.get(RoleMaster, 'employee')
         if user_department:
             all_employees = User.objects.filter(
                 department=user_department,
@@ -177,7 +185,7 @@ def interview_create(request):
             # 今回は renderで戻すが、employeesリストが必要。
             from accounts.models import RoleMaster
             try:
-                employee_role = RoleMaster.objects.get(code='employee')
+                employee_role = masters.get(RoleMaster, 'employee')
                 employees = User.objects.exclude(id=request.user.id).filter(
                     is_active=True,
                     role=employee_role
@@ -192,54 +200,9 @@ def interview_create(request):
 
         employee = get_object_or_404(User, pk=employee_id)
         
-        # 部下の分析データがあれば取得
-        analysis_text = "（まだ分析データはありません）"
-        if hasattr(employee, 'member_analysis'):
-            analysis_text = employee.member_analysis.analysis_text
-
-        # Geminiへのプロンプト作成
-        prompt = f"""
-        あなたは優秀なマネジメントコーチです。
-        以下の上司と部下の面談に向けた「トークスクリプト（台本）」と「アドバイス」を作成してください。
-
-        【上司】{request.user.last_name} {request.user.first_name}
-        【部下】{employee.last_name} {employee.first_name} ({employee.department.name if employee.department else '部署なし'}, {employee.role.name if employee.role else ''})
-        【面談テーマ】{theme}
-        【部下の特性（過去の分析）】
-        {analysis_text}
-
-        【出力フォーマット】
-        # 1. アプローチ戦略
-        （簡潔に）
-        # 2. トークスクリプト
-        上司: 「〜」
-        部下: （想定）「〜」
-        上司: 「〜」
-        # 3. 注意点（NGワードなど）
-        部下の世代や特性を考慮した注意点を挙げてください。
-        例: 【世代別NGワード】もし部下がコロナ世代（Z世代など）の場合、「修学旅行の思い出は？」など、コロナ禍で失われた経験に関する話題は避ける、など。
-        """
-
-        script = "AI生成に失敗しました。"
-        try:
-            if settings.OPENAI_API_KEY:
-                client = OpenAI(api_key=settings.OPENAI_API_KEY)
-                response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": "あなたは優秀なマネジメントコーチです。"},
-                        {"role": "user", "content": prompt}
-                    ]
-                )
-                script = response.choices[0].message.content
-            else:
-                script = "APIキーが設定されていないため、デモ用のテキストを表示します。\n（APIキーを設定するとここにAI生成テキストが表示されます）"
-        except Exception as e:
-            script = f"エラーが発生しました: {str(e)}"
-
         # 面談レコード保存
         try:
-            status_tentative, _ = InterviewStatusMaster.objects.get_or_create(code='tentative', defaults={'name': '仮予約'})
+            status_tentative = masters.get_or_create(InterviewStatusMaster, 'tentative', name='仮予約')
             
             interview = Interview.objects.create(
                 manager=request.user,
@@ -248,20 +211,18 @@ def interview_create(request):
                 theme=theme,
                 location=location, # 場所を保存
                 status=status_tentative,
-                script_generated=script
+                script_generated=SCRIPT_PENDING_TEXT
             )
+
+            # トークスクリプトはAIジョブで生成して後から書き戻す
+            enqueue('interviews.generate_script', {'interview_id': interview.pk}, user=request.user)
             
             # --- 部下へ通知を作成 ---
-            from notifications.models import Notification, NotificationTypeMaster
-            
-            # 通知タイプを取得（なければ作成）
-            notif_type, _ = NotificationTypeMaster.objects.get_or_create(code='interview_invite', defaults={'name': '面談依頼'})
-            
-            Notification.objects.create(
-                recipient=employee,
+            notify(
+                employee,
                 title=f"面談の依頼が届いています（{theme}）",
                 message=f"{request.user.last_name}マネージャーから面談の依頼があります。\n日時: {scheduled_at}\n場所: {location}",
-                notification_type=notif_type,
+                type_code='interview_invite',
                 related_object_id=interview.pk,
                 link_url=f"/interviews/confirm/{interview.pk}/" # 確定画面へのリンク
             )
@@ -275,7 +236,7 @@ def interview_create(request):
     # 部下リスト（employee権限のみ）
     from accounts.models import RoleMaster
     try:
-        employee_role = RoleMaster.objects.get(code='employee')
+        employee_role = masters.get(RoleMaster, 'employee')
         employees = User.objects.exclude(id=request.user.id).filter(
             is_active=True,
             role=employee_role
@@ -298,7 +259,7 @@ def interview_confirm(request, pk):
         
     if request.method == 'POST':
         # 承諾処理
-        status_confirmed, _ = InterviewStatusMaster.objects.get_or_create(code='confirmed', defaults={'name': '確定'})
+        status_confirmed = masters.get_or_create(InterviewStatusMaster, 'confirmed', name='確定')
         interview.status = status_confirmed
         interview.save()
         
@@ -325,19 +286,16 @@ def interview_decline(request, pk):
         
         try:
             # ステータスを「却下・辞退」に変更
-            declined_status = InterviewStatusMaster.objects.get(code='declined')
+            declined_status = masters.get(InterviewStatusMaster, 'declined')
             interview.status = declined_status
             interview.save()
             
             # マネージャー（上司）へ通知
-            from notifications.models import Notification, NotificationTypeMaster
-            notif_type, _ = NotificationTypeMaster.objects.get_or_create(code='interview_decline', defaults={'name': '面談辞退'})
-            
-            Notification.objects.create(
-                recipient=interview.manager,
+            notify(
+                interview.manager,
                 title=f"面談が辞退されました（{interview.employee.last_name} {interview.employee.first_name}）",
                 message=f"以下の面談が辞退されました。\nテーマ: {interview.theme}\n日時: {interview.scheduled_at}\n理由: {reason}",
-                notification_type=notif_type,
+                type_code='interview_decline',
                 related_object_id=interview.pk,
                 link_url=None # 却下されたので飛ぶ先は特にない、あるいは履歴へ
             )
@@ -356,7 +314,27 @@ def interview_detail(request, pk):
     面談詳細・スクリプト閲覧画面
     """
     interview = get_object_or_404(Interview, pk=pk)
-    return render(request, 'interviews/detail.html', {'interview': interview})
+    return render(request, 'interviews/detail.html', {
+        'interview': interview,
+        'llm_job': pending_job_for('interviews.generate_script', interview_id=interview.pk),
+    })
+
+@login_required
+async def interview_script_stream(request, pk):
+    """
+    トークスクリプトのストリーミング生成（SSE）
+    生成待ちのジョブをこの接続で実行し、トークンを順次送る
+    """
+    interview = await sync_to_async(load_interview)(pk)
+    user = await request.auser()
+    if interview is None or interview.manager_id != user.id:
+        raise Http404("interview not found")
+
+    job = await sync_to_async(pending_job_for)('interviews.generate_script', interview_id=interview.pk)
+    if not llm_client.is_available():
+        job = None  # APIキー未設定時はワーカーがデモ用テキストを書き込む
+    chat_messages = await sync_to_async(script_messages)(interview)
+    return sse_response(stream_job(job, chat_messages, partial(save_script, interview.pk)))
 
 @login_required
 def interview_feedback(request, pk):
@@ -383,74 +361,15 @@ def interview_feedback(request, pk):
         )
         
         # ★追加: 面談ステータスを「実施済み」に更新
-        status_completed, _ = InterviewStatusMaster.objects.get_or_create(
-            code='completed', 
-            defaults={'name': '実施済み'}
-        )
+        status_completed = masters.get_or_create(InterviewStatusMaster, 'completed', name='実施済み')
         interview.status = status_completed
         interview.save()
         
-        # --- AIによる部下分析の更新 ---
-        employee = interview.employee
-        
-        # 現在の分析データ
-        current_analysis = ""
-        if hasattr(employee, 'member_analysis'):
-            current_analysis = employee.member_analysis.analysis_text
-            
-        # プロンプト作成
-        prompt = f"""
-        あなたは優秀なマネジメントコーチです。
-        以下の面談結果のフィードバックに基づき、この部下の「取扱説明書（特性分析データ）」を更新・追記してください。
-        
-        【部下】{employee.last_name} {employee.first_name}
-        【今回の面談テーマ】{interview.theme}
-        【結果評価】{evaluation} (3:成功, 2:普通, 1:失敗)
-        【観察タグ】{', '.join(tags_list)}
-        【上司メモ】{memo}
+        # --- AIによる部下分析の更新（AIジョブで実行） ---
+        enqueue('interviews.update_analysis', {'feedback_id': fb.pk, 'target_user_id': interview.employee_id}, user=request.user)
 
-        【これまでの分析データ】
-        {current_analysis}
-
-        【指示】
-        上記の「これまでの分析データ」をベースに、今回の結果を踏まえて内容を洗練させてください。
-        特に「効果的な褒め方」「注意すべき接し方」「思考パターン」について具体的に記述してください。
-        Markdown形式で出力してください。
-        """
-        
-        new_analysis = current_analysis
-        ai_log = ""
-        new_analysis = current_analysis
-        ai_log = ""
-        try:
-            if settings.OPENAI_API_KEY:
-                client = OpenAI(api_key=settings.OPENAI_API_KEY)
-                response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": "あなたは優秀なマネジメントコーチです。"},
-                        {"role": "user", "content": prompt}
-                    ]
-                )
-                new_analysis = response.choices[0].message.content
-                ai_log = "AI Analysis Success"
-            else:
-                ai_log = "No API Key"
-        except Exception as e:
-            ai_log = str(e)
-            
-        # 分析データの保存
-        MemberAnalysis.objects.update_or_create(
-            target_user=employee,
-            defaults={'analysis_text': new_analysis}
-        )
-        
-        # ログ保存
-        fb.ai_analysis_log = ai_log
-        fb.save()
-        
-        messages.success(request, 'フィードバックを保存し、部下データを更新しました。')
-        return redirect('member_analysis', pk=employee.pk)
+        messages.success(request, 'フィードバックを保存しました。部下データはAIが更新中です。')
+        return redirect('member_analysis', pk=interview.employee_id)
 
     return render(request, 'interviews/feedback.html', {'interview': interview})
 
@@ -464,9 +383,15 @@ def member_analysis(request, pk):
     if hasattr(target_user, 'member_analysis'):
         analysis = target_user.member_analysis
     
+    revisions = []
+    if analysis:
+        revisions = analysis.revisions.select_related('feedback__interview')[:10]
+
     return render(request, 'interviews/analysis_view.html', {
         'target_user': target_user, 
-        'analysis': analysis
+        'analysis': analysis,
+        'revisions': revisions,
+        'llm_job': pending_job_for('interviews.update_analysis', target_user_id=target_user.pk),
     })
 
 @login_required
@@ -484,7 +409,7 @@ def interview_history_select(request):
     
     # 部下リスト（employee権限のみ）
     try:
-        employee_role = RoleMaster.objects.get(code='employee')
+        employee_role = masters.get(RoleMaster, 'employee')
         employees = User.objects.exclude(id=request.user.id).filter(
             is_active=True,
             role=employee_role
@@ -495,20 +420,21 @@ def interview_history_select(request):
     return render(request, 'interviews/history_select.html', {'employees': employees})
 
 @login_required
+@query_budget(queries=10)
 def follow_up_report(request):
     """
     要フォローアップレポート
     最近面談していないメンバーを表示
     """
     from accounts.models import RoleMaster
-    from django.db.models import Max
+    from django.db.models import OuterRef, Subquery
     
     user_department = request.user.department
     now = timezone.now()
     
     # 部署内のemployee権限のユーザー一覧
     try:
-        employee_role = RoleMaster.objects.get(code='employee')
+        employee_role = masters.get(RoleMaster, 'employee')
         if user_department:
             all_employees = User.objects.filter(
                 department=user_department,
@@ -523,25 +449,20 @@ def follow_up_report(request):
     except RoleMaster.DoesNotExist:
         all_employees = User.objects.none()
     
-    # 各メンバーの最終面談日を取得
+    # 各メンバーの最終面談日（このマネージャーとの面談）を一覧と同じ問い合わせで取得する
+    last_interviews = Interview.objects.filter(
+        manager=request.user, employee=OuterRef('pk')
+    ).order_by('-scheduled_at')
+    all_employees = all_employees.select_related('department').annotate(
+        last_date=Subquery(last_interviews.values('scheduled_at')[:1])
+    )
+
     members_data = []
     for employee in all_employees:
-        # このマネージャーとこの部下の面談履歴
-        last_interview = Interview.objects.filter(
-            manager=request.user,
-            employee=employee
-        ).order_by('-scheduled_at').first()
-        
-        if last_interview:
-            last_date = last_interview.scheduled_at
-            days_since = (now - last_date).days
-        else:
-            last_date = None
-            days_since = 999  # 面談履歴なし
-        
+        last_date = employee.last_date
+        days_since = (now - last_date).days if last_date else 999  # 999: 面談履歴なし
         members_data.append({
             'employee': employee,
-            'last_interview': last_interview,
             'last_date': last_date,
             'days_since': days_since,
         })
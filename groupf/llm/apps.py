@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class LlmConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'llm'
+
+    def ready(self):
+        # 各アプリの llm_jobs.py でジョブハンドラを登録する
+        autodiscover_modules('llm_jobs')
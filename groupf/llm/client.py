@@ -0,0 +1,242 @@
+"""
+AI(OpenAI)呼び出しの共通クライアント
+
+- OpenAI クライアントはプロセス内で1つだけ作成して使い回す
+  （HTTP接続・TLSセッションがプールされ、呼び出しごとの接続確立が不要になる）
+- 同じモデル・同じプロンプトの応答は TTL 付き LRU キャッシュから返す
+- LLM_BACKEND = 'fake' でAPIを呼ばないローカルのバックエンドに切り替えられる（テスト・オフライン開発用）
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+DEFAULT_MODEL = "gpt-4o"
+
+
+# ==========================================
+# 応答キャッシュ
+# ==========================================
+
+class ResponseCache:
+    """
+    内容アドレス型（モデル + メッセージ + パラメータのハッシュ）の応答キャッシュ
+    件数上限を超えた場合は最も古く使われたものから削除する
+    """
+    def __init__(self, max_entries=256, ttl=3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model, messages, params):
+        raw = json.dumps({'model': model, 'messages': messages, 'params': params}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+# ==========================================
+# バックエンド
+# ==========================================
+
+class OpenAIBackend:
+    def __init__(self):
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # APIキー未設定でも is_available() は呼べるよう、クライアントは初回利用時に作成
+        if self._client is None:
+            from openai import OpenAI
+            with self._lock:
+                if self._client is None:
+                    self._client = OpenAI(
+                        api_key=settings.OPENAI_API_KEY,
+                        timeout=getattr(settings, 'LLM_TIMEOUT_SECONDS', 60),
+                        # 再試行はジョブキュー側で行う
+                        max_retries=getattr(settings, 'LLM_CLIENT_MAX_RETRIES', 1),
+                    )
+        return self._client
+
+    def async_client(self):
+        # 非同期クライアントは接続プールがイベントループに紐づくため、ループごとに作成する
+        from openai import AsyncOpenAI
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = AsyncOpenAI(
+                    api_key=settings.OPENAI_API_KEY,
+                    timeout=getattr(settings, 'LLM_TIMEOUT_SECONDS', 60),
+                    max_retries=getattr(settings, 'LLM_CLIENT_MAX_RETRIES', 1),
+                )
+                self._async_clients[loop] = client
+            return client
+
+    def is_available(self):
+        return bool(settings.OPENAI_API_KEY)
+
+    def complete(self, model, messages, **params):
+        response = self.client.chat.completions.create(model=model, messages=messages, **params)
+        return response.choices[0].message.content
+
+    async def astream(self, model, messages, **params):
+        response = await self.async_client().chat.completions.create(
+            model=model, messages=messages, stream=True, **params,
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class FakeBackend:
+    """
+    APIを呼ばないバックエンド。responder を差し替えると任意の応答を返せる
+    """
+    def __init__(self):
+        self.calls = []
+        self.responder = None
+
+    def is_available(self):
+        return True
+
+    def complete(self, model, messages, **params):
+        self.calls.append({'model': model, 'messages': messages, 'params': params})
+        if self.responder is not None:
+            return self.responder(model, messages, **params)
+        if params.get('response_format', {}).get('type') == 'json_object':
+            return json.dumps({'title': 'fake', 'problem': 'fake', 'solution': 'fake', 'is_solved': True})
+        return f"[fake] {messages[-1]['content'].strip()[:200]}"
+
+    async def astream(self, model, messages, **params):
+        text = self.complete(model, messages, **params)
+        for i in range(0, len(text), 16):
+            yield text[i:i + 16]
+
+
+BACKENDS = {
+    'openai': 'llm.client.OpenAIBackend',
+    'fake': 'llm.client.FakeBackend',
+}
+
+_backend = None
+_cache = None
+_lock = threading.Lock()
+
+
+def get_backend():
+    """
+    プロセス共通のバックエンド（初回呼び出し時に作成）
+    """
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                name = getattr(settings, 'LLM_BACKEND', 'openai')
+                _backend = import_string(BACKENDS.get(name, name))()
+    return _backend
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    max_entries=getattr(settings, 'LLM_CACHE_MAX_ENTRIES', 256),
+                    ttl=getattr(settings, 'LLM_CACHE_TTL_SECONDS', 3600),
+                )
+    return _cache
+
+
+def reset():
+    """
+    バックエンドとキャッシュを作り直す（設定変更時・テスト用）
+    """
+    global _backend, _cache
+    with _lock:
+        _backend = None
+        _cache = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting, **kwargs):
+    if setting.startswith('LLM_') or setting == 'OPENAI_API_KEY':
+        reset()
+
+
+def is_available():
+    return get_backend().is_available()
+
+
+def chat(messages, model=DEFAULT_MODEL, use_cache=True, **params):
+    """
+    チャット補完の応答テキストを返す（同一リクエストはキャッシュから返す）
+    """
+    if not use_cache:
+        return get_backend().complete(model, messages, **params)
+
+    cache = get_cache()
+    key = ResponseCache.make_key(model, messages, params)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    text = get_backend().complete(model, messages, **params)
+    if text:
+        cache.set(key, text)
+    return text
+
+
+async def astream_chat(messages, model=DEFAULT_MODEL, **params):
+    """
+    応答をトークン（断片）単位で順次返す非同期ジェネレータ
+    ストリーミングは表示用のためキャッシュは使わない
+    """
+    async for token in get_backend().astream(model, messages, **params):
+        yield token
+
+
+def stats():
+    return get_cache().stats()
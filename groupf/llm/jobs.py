@@ -0,0 +1,274 @@
+"""
+AIジョブキュー(LLMJob)の登録・取得・実行
+
+- register(kind): ジョブハンドラの登録（各アプリの llm_jobs.py で使用）
+- enqueue(kind, payload): ジョブの登録（画面側はこれだけ呼んで即座に応答を返す）
+- run_pending(): run_llm_worker コマンドの1回分の処理
+  （毎回、running のまま止まったジョブを先に待機中に戻す）
+
+失敗したジョブは指数バックオフで再試行し、最大試行回数に達したら
+ハンドラの on_failure（失敗時の既定値の書き戻し）を呼んで failed にする。
+同時実行数は LLM_MAX_CONCURRENCY で全ワーカー合計の上限をかける
+（実行中の件数の確認と確保を1つの条件付き UPDATE で行う）。
+
+ハンドラの実行中はトランザクションを開かない。SQLite ではトランザクション中は
+DB全体の書き込みロックを持つため、数秒かかる AI の呼び出しの間、画面からの書き込みが止まってしまう。
+ハンドラは入力を読み、AI を呼び出してから、結果の保存だけを transaction.atomic() で行う。
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from .models import LLMJob
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATUSES = ('queued', 'running')
+
+
+class JobHandler:
+    def __init__(self, kind, func, on_failure=None, can_view=None):
+        self.kind = kind
+        self.func = func
+        self.on_failure = on_failure
+        self.can_view = can_view
+
+
+_handlers = {}
+
+
+def register(kind, on_failure=None, can_view=None):
+    """
+    ジョブハンドラを登録するデコレータ
+
+    ハンドラは payload(dict) を受け取り、JSONにできる結果を返す。
+    例外を送出した場合は再試行される。
+    ハンドラはトランザクションの外で呼ばれる（AI の呼び出し中にロックを持たないよう、結果の保存だけを atomic にする）。
+    on_failure(payload, error) は最終的に失敗した場合に呼ばれる。
+    can_view(user, payload) は登録者以外にジョブの状態を見せてよいか（対象の画面を見られる人）を返す。
+    """
+    def decorator(func):
+        _handlers[kind] = JobHandler(kind, func, on_failure, can_view)
+        return func
+    return decorator
+
+
+def get_handler(kind):
+    return _handlers.get(kind)
+
+
+# ==========================================
+# 登録
+# ==========================================
+
+def enqueue(kind, payload, user=None, max_attempts=None):
+    """
+    ジョブを登録する
+
+    LLM_JOBS_EAGER = True の場合（ワーカーを起動しない開発環境・テスト）は
+    その場で実行する。
+    """
+    if kind not in _handlers:
+        raise ValueError(f"未登録のジョブ種別です: {kind}")
+    job = LLMJob.objects.create(
+        kind=kind,
+        payload=payload,
+        created_by=user if user is not None and user.is_authenticated else None,
+        max_attempts=max_attempts or getattr(settings, 'LLM_JOB_MAX_ATTEMPTS', 3),
+        run_after=timezone.now(),
+    )
+    if getattr(settings, 'LLM_JOBS_EAGER', False):
+        run_eager(job)
+    return job
+
+
+def run_eager(job):
+    # 即時実行モード: 再試行は待たずに続けて行う
+    while job.status == 'queued':
+        job.status = 'running'
+        job.attempts += 1
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'attempts', 'started_at'])
+        execute(job, retry_delay=timedelta(0))
+    return job
+
+
+def pending_jobs(user, kinds):
+    """
+    ユーザーが登録した処理中ジョブ（画面でのポーリング表示用）
+    """
+    if not user.is_authenticated:
+        return LLMJob.objects.none()
+    return LLMJob.objects.filter(created_by=user, kind__in=kinds, status__in=PENDING_STATUSES)
+
+
+def can_view(user, job):
+    """
+    ジョブの状態を見てよいか（登録者・スタッフ、またはハンドラの can_view が許可した人）
+    """
+    if job.created_by_id == user.id or user.is_staff:
+        return True
+    handler = get_handler(job.kind)
+    return bool(handler and handler.can_view and handler.can_view(user, job.payload))
+
+
+def pending_job_for(kind, **payload):
+    """
+    対象オブジェクトの処理中ジョブ（例: pending_job_for('interviews.generate_script', interview_id=1)）
+    """
+    lookups = {f'payload__{key}': value for key, value in payload.items()}
+    return LLMJob.objects.filter(kind=kind, status__in=PENDING_STATUSES, **lookups).order_by('-pk').first()
+
+
+# ==========================================
+# 取得・実行（ワーカー側）
+# ==========================================
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def backoff_delay(attempts):
+    """
+    再試行までの待ち時間（指数バックオフ、上限あり）
+    """
+    base = getattr(settings, 'LLM_JOB_BACKOFF_SECONDS', 5)
+    limit = getattr(settings, 'LLM_JOB_BACKOFF_MAX_SECONDS', 300)
+    return timedelta(seconds=min(base * (2 ** max(attempts - 1, 0)), limit))
+
+
+def requeue_stale(timeout=None):
+    """
+    ワーカーの異常終了で running のまま残ったジョブを待機中に戻す
+    """
+    timeout = timeout or getattr(settings, 'LLM_JOB_TIMEOUT_SECONDS', 600)
+    threshold = timezone.now() - timedelta(seconds=timeout)
+    return LLMJob.objects.filter(status='running', started_at__lt=threshold).update(
+        status='queued', locked_by='', run_after=timezone.now(),
+    )
+
+
+def claim_next(owner, max_concurrency=None):
+    """
+    実行可能なジョブを1件確保する（他ワーカーと競合した場合は次の候補を試す）
+    """
+    max_concurrency = max_concurrency or getattr(settings, 'LLM_MAX_CONCURRENCY', 4)
+    for _ in range(5):
+        candidate = (
+            LLMJob.objects.filter(status='queued', run_after__lte=timezone.now())
+            .order_by('run_after', 'pk')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if candidate is None:
+            return None
+        job = claim_job(candidate, owner, max_concurrency)
+        if job is not None:
+            return job
+        if LLMJob.objects.filter(status='running').count() >= max_concurrency:
+            return None
+    return None
+
+
+def claim_job(job_id, owner, max_concurrency=None):
+    """
+    待機中のジョブを確保して返す（既に他で確保されていれば None）
+    条件付き UPDATE で確保するため、SELECT FOR UPDATE の無い SQLite でも二重実行しない
+    max_concurrency を指定した場合は、実行中の件数が上限未満のときだけ確保する
+    （件数の確認も同じ UPDATE 文の副問い合わせで行うので、複数ワーカーが同時に確認しても上限を超えない）
+    """
+    queryset = LLMJob.objects.filter(pk=job_id, status='queued')
+    if max_concurrency is not None:
+        running = (
+            LLMJob.objects.filter(status='running').order_by()
+            .values('status').annotate(n=Count('pk')).values('n')
+        )
+        queryset = queryset.filter(GreaterThan(Value(max_concurrency), Coalesce(Subquery(running), 0)))
+    claimed = queryset.update(
+        status='running', locked_by=owner, started_at=timezone.now(), attempts=F('attempts') + 1,
+    )
+    return LLMJob.objects.get(pk=job_id) if claimed else None
+
+
+def complete_job(job, result):
+    _finish(job, 'succeeded', result=result)
+
+
+def release_job(job, error=''):
+    """
+    確保したジョブを待機中に戻す（ストリーミングが中断した場合はワーカーが引き継ぐ）
+    """
+    job.status = 'queued'
+    job.error = error
+    job.locked_by = ''
+    job.run_after = timezone.now()
+    job.save(update_fields=['status', 'error', 'locked_by', 'run_after'])
+
+
+def execute(job, retry_delay=None):
+    """
+    確保済み(running)のジョブを実行して結果を保存する
+    """
+    handler = get_handler(job.kind)
+    if handler is None:
+        _finish(job, 'failed', error=f"未登録のジョブ種別です: {job.kind}")
+        return job
+
+    try:
+        result = handler.func(job.payload)
+    except Exception as e:
+        logger.warning("LLMJob %s (%s) 失敗 %s/%s: %s", job.pk, job.kind, job.attempts, job.max_attempts, e)
+        if job.attempts < job.max_attempts:
+            delay = retry_delay if retry_delay is not None else backoff_delay(job.attempts)
+            job.status = 'queued'
+            job.error = str(e)
+            job.locked_by = ''
+            job.run_after = timezone.now() + delay
+            job.save(update_fields=['status', 'error', 'locked_by', 'run_after'])
+            return job
+        if handler.on_failure:
+            try:
+                handler.on_failure(job.payload, e)
+            except Exception:
+                logger.exception("LLMJob %s の失敗時処理でエラーが発生しました", job.pk)
+        _finish(job, 'failed', error=str(e))
+        return job
+
+    _finish(job, 'succeeded', result=result)
+    return job
+
+
+def _finish(job, status, result=None, error=''):
+    job.status = status
+    job.result = result
+    job.error = error
+    job.locked_by = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'locked_by', 'finished_at'])
+
+
+def run_pending(owner=None, limit=None):
+    """
+    実行可能なジョブがなくなるまで（または limit 件まで）処理し、処理件数を返す
+    """
+    owner = owner or worker_id()
+    # 落ちたスレッド・切れたストリームのジョブが同時実行数の枠を使い続けないよう、毎回戻す
+    requeued = requeue_stale()
+    if requeued:
+        logger.info("running のまま止まったジョブ %s 件を待機中に戻しました", requeued)
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next(owner)
+        if job is None:
+            break
+        execute(job)
+        processed += 1
+    return processed
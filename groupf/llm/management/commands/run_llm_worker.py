@@ -0,0 +1,48 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from llm.jobs import run_pending, worker_id
+
+
+class Command(BaseCommand):
+    help = 'Processes queued AI (OpenAI) jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2, help='Number of worker threads in this process.')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Process the jobs that are ready now and exit.')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            processed = run_pending()
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed} jobs."))
+            return
+
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self._loop, args=(stop, options['poll_interval']), daemon=True)
+            for _ in range(max(options['concurrency'], 1))
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"LLM worker started with {len(threads)} threads.")
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(1)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def _loop(self, stop, poll_interval):
+        owner = worker_id()
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                if not run_pending(owner=owner, limit=10):
+                    stop.wait(poll_interval)
+        finally:
+            connection.close()
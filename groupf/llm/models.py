@@ -0,0 +1,49 @@
+from django.db import models
+from django.conf import settings
+
+# ==========================================
+# メインモデル定義
+# ==========================================
+
+class LLMJob(models.Model):
+    """
+    AI(OpenAI)処理のジョブキュー
+    画面ではジョブを登録するだけで、run_llm_worker コマンドが順次処理して結果を書き戻す
+    """
+    STATUS_CHOICES = [
+        ('queued', '待機中'),
+        ('running', '実行中'),
+        ('succeeded', '完了'),
+        ('failed', '失敗'),
+    ]
+    kind = models.CharField(max_length=50, verbose_name="ジョブ種別")
+    payload = models.JSONField(default=dict, verbose_name="パラメータ")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', verbose_name="状態")
+    result = models.JSONField(null=True, blank=True, verbose_name="結果")
+    error = models.TextField(blank=True, verbose_name="エラー内容")
+
+    attempts = models.PositiveIntegerField(default=0, verbose_name="試行回数")
+    max_attempts = models.PositiveIntegerField(default=3, verbose_name="最大試行回数")
+    run_after = models.DateTimeField(verbose_name="実行予定日時")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="処理中のワーカー")
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='llm_jobs', verbose_name="登録者")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="登録日時")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="開始日時")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="終了日時")
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def is_pending(self):
+        return self.status in ('queued', 'running')
+
+    class Meta:
+        verbose_name = "AIジョブ"
+        verbose_name_plural = "AIジョブ"
+        ordering = ['run_after', 'pk']
+        indexes = [
+            # ワーカーの取得クエリ: status='queued' AND run_after <= now ORDER BY run_after
+            models.Index(fields=['status', 'run_after'], name='llmjob_queue_idx'),
+        ]
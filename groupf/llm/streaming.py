@@ -0,0 +1,79 @@
+"""
+AI応答のストリーミング配信（Server-Sent Events）
+
+キュー登録済みのジョブを画面側の接続で確保し、生成中のトークンをそのまま送る。
+生成が終わったらジョブと同じ保存処理で結果を書き戻す。
+接続が切れた・エラーになった場合はジョブを待機中に戻し、ワーカーに引き継ぐ。
+
+非同期ビューで動かすため、LLMの応答待ちの間は同期ワーカーを占有しない。
+（トークン単位で届けるには ASGI サーバ(uvicorn / daphne 等)で起動すること。
+WSGI では Django が応答全体をまとめてから返す）
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+
+from . import client as llm_client
+from .jobs import claim_job, complete_job, release_job
+
+logger = logging.getLogger(__name__)
+
+STREAM_OWNER = 'stream'
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx のバッファリングを無効化（トークンを即時に届ける）
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _save(save, text):
+    with transaction.atomic():
+        return save(text)
+
+
+async def stream_job(job, messages, save, **params):
+    """
+    ジョブを確保してトークンを SSE で送り、完了時に save(text) の結果で完了にする
+
+    job が None（処理済み）や他のワーカーが実行中の場合、同時実行数（LLM_MAX_CONCURRENCY）が
+    上限に達している場合は 'busy' を送って終了する（画面側はポーリングに切り替える）。
+    """
+    claimed = None
+    if job is not None:
+        max_concurrency = getattr(settings, 'LLM_MAX_CONCURRENCY', 4)
+        claimed = await sync_to_async(claim_job)(job.pk, STREAM_OWNER, max_concurrency)
+    if claimed is None:
+        yield sse_event('busy', {})
+        return
+
+    parts = []
+    finished = False
+    try:
+        yield sse_event('start', {'job_id': claimed.pk})
+        async for token in llm_client.astream_chat(messages, **params):
+            parts.append(token)
+            yield sse_event('token', {'text': token})
+
+        result = await sync_to_async(_save)(save, ''.join(parts))
+        await sync_to_async(complete_job)(claimed, result)
+        finished = True
+        yield sse_event('done', {'result': result})
+    except Exception as e:
+        logger.warning("LLMJob %s のストリーミングに失敗しました: %s", claimed.pk, e)
+        yield sse_event('error', {'message': 'AIの応答生成に失敗しました。しばらくしてから自動で再試行されます。'})
+    finally:
+        if not finished:
+            # 切断・エラー時はワーカーに引き継ぐ（キャンセル中でも確実に戻す）
+            await asyncio.shield(sync_to_async(release_job)(claimed, 'stream interrupted'))
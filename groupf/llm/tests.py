@@ -0,0 +1,176 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from consultations.models import Consultation, ConsultationStatusMaster, Question
+from interviews.models import Interview
+from tasks.models import Task
+from . import client as llm_client
+from .client import ResponseCache
+from .jobs import claim_job, claim_next, enqueue, register, run_pending
+from .models import LLMJob
+
+User = get_user_model()
+
+calls = []
+
+
+@register('tests.echo')
+def echo(payload):
+    calls.append(payload)
+    return {'echo': payload['value']}
+
+
+def _flaky_failed(payload, error):
+    calls.append(('failed', str(error)))
+
+
+@register('tests.atomic_depth')
+def atomic_depth(payload):
+    # ハンドラ実行時に開いているトランザクション（テスト自体のものを含む）の数
+    return {'depth': len(connection.atomic_blocks)}
+
+
+@register('tests.flaky', on_failure=_flaky_failed)
+def flaky(payload):
+    raise RuntimeError('rate limited')
+
+
+@override_settings(OPENAI_API_KEY=None, LLM_JOBS_EAGER=False, LLM_JOB_BACKOFF_SECONDS=5)
+class LLMJobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.user = User.objects.create_user(employee_number='0001', email='user@example.com', password='password')
+        self.client.login(employee_number='0001', password='password')
+
+    def test_enqueue_then_worker_writes_result(self):
+        job = enqueue('tests.echo', {'value': 1}, user=self.user)
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(calls, [])
+
+        response = self.client.get(reverse('api_llm_job_status', args=[job.id]))
+        self.assertTrue(response.json()['is_pending'])
+
+        self.assertEqual(run_pending(), 1)
+        response = self.client.get(reverse('api_llm_job_status', args=[job.id]))
+        self.assertEqual(response.json()['status'], 'succeeded')
+        self.assertEqual(response.json()['result'], {'echo': 1})
+
+        other = User.objects.create_user(employee_number='0002', email='other@example.com', password='password')
+        self.client.login(employee_number='0002', password='password')
+        self.assertEqual(self.client.get(reverse('api_llm_job_status', args=[job.id])).status_code, 404)
+
+    def test_status_visible_to_viewers_of_target(self):
+        # 面談詳細を開ける人（登録者以外）にも、スクリプト生成の状態を返す
+        employee = User.objects.create_user(employee_number='0002', email='e@example.com', password='password')
+        interview = Interview.objects.create(manager=self.user, employee=employee, scheduled_at=timezone.now(), theme='1on1')
+        job = enqueue('interviews.generate_script', {'interview_id': interview.pk}, user=self.user)
+        self.client.login(employee_number='0002', password='password')
+        response = self.client.get(reverse('api_llm_job_status', args=[job.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_pending'])
+
+        # 対象が無くなったジョブは登録者以外には見せない
+        interview.delete()
+        self.assertEqual(self.client.get(reverse('api_llm_job_status', args=[job.id])).status_code, 404)
+
+    def test_retry_with_backoff_then_fail(self):
+        job = enqueue('tests.flaky', {}, max_attempts=2)
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=4))
+        # バックオフ中は取得されない
+        self.assertEqual(run_pending(), 0)
+
+        LLMJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertEqual(calls, [('failed', 'rate limited')])
+
+    @override_settings(LLM_MAX_CONCURRENCY=1)
+    def test_concurrency_cap(self):
+        first = enqueue('tests.echo', {'value': 1})
+        enqueue('tests.echo', {'value': 2})
+        self.assertEqual(claim_next('worker-a').pk, first.pk)
+        self.assertIsNone(claim_next('worker-b'))
+        # 件数の確認を同時に通過したワーカーがあっても、確保の UPDATE で上限を超えない
+        second = LLMJob.objects.get(status='queued')
+        self.assertIsNone(claim_job(second.pk, 'worker-c', max_concurrency=1))
+        self.assertEqual(LLMJob.objects.filter(status='running').count(), 1)
+
+    @override_settings(LLM_MAX_CONCURRENCY=1, LLM_JOB_TIMEOUT_SECONDS=60)
+    def test_stale_running_job_is_requeued_by_each_run(self):
+        # スレッドやストリームが落ちて running のまま残ったジョブが枠を塞いでも、次の実行で戻る
+        job = enqueue('tests.echo', {'value': 1})
+        LLMJob.objects.filter(pk=job.pk).update(status='running', started_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+
+    def test_handler_runs_outside_transaction(self):
+        # AI の呼び出し中にDBのロックを持たないよう、ハンドラはトランザクションを開かずに呼ぶ
+        job = enqueue('tests.atomic_depth', {})
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.result, {'depth': len(connection.atomic_blocks)})
+
+    def test_consultation_resolve_enqueues_summary(self):
+        respondent = User.objects.create_user(employee_number='0003', email='r@example.com', password='password')
+        ConsultationStatusMaster.objects.create(code='resolved', name='解決済み')
+        consultation = Consultation.objects.create(title='VPNがつながらない', requester=self.user, respondent=respondent)
+
+        response = self.client.post(reverse('consultation_resolve', args=[consultation.pk]))
+        self.assertRedirects(response, reverse('consultation_list_view'), fetch_redirect_response=False)
+        self.assertFalse(Question.objects.exists())
+
+        run_pending()
+        question = Question.objects.get(source_consultation=consultation)
+        self.assertEqual(question.title, 'VPNがつながらない')
+        self.assertEqual(question.created_by, self.user)
+
+
+class ResponseCacheTest(TestCase):
+    def test_ttl_and_lru_eviction(self):
+        now = [0]
+        cache = ResponseCache(max_entries=2, ttl=10, clock=lambda: now[0])
+        cache.set('a', 'A')
+        cache.set('b', 'B')
+        self.assertEqual(cache.get('a'), 'A')
+        cache.set('c', 'C')  # 最も古く使われた b を削除
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 'C')
+
+        now[0] = 11
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats(), {'entries': 1, 'hits': 2, 'misses': 2})
+
+
+@override_settings(LLM_BACKEND='fake', LLM_JOBS_EAGER=True)
+class LLMClientTest(TestCase):
+    def setUp(self):
+        llm_client.reset()
+        self.backend = llm_client.get_backend()
+        self.backend.responder = lambda model, messages, **params: '#議事録 #会議 #難易度高'
+        self.user = User.objects.create_user(employee_number='0001', email='user@example.com', password='password')
+
+    def test_tag_generation_uses_shared_cached_client(self):
+        first = Task.objects.create(title='議事録の作成', due_date=timezone.now(), requested_by=self.user)
+        second = Task.objects.create(title='議事録の作成', due_date=timezone.now(), requested_by=self.user)
+        for task in (first, second):
+            enqueue('tasks.generate_tags', {'task_id': task.id}, user=self.user)
+
+        for task in (first, second):
+            task.refresh_from_db()
+            self.assertEqual(task.difficulty, 'high')
+            self.assertEqual(sorted(task.tags.values_list('name', flat=True)), ['会議', '議事録', '難易度高'])
+
+        # 同じタスク名は2回目をキャッシュから返す
+        self.assertEqual(len(self.backend.calls), 1)
+        self.assertEqual(llm_client.stats()['hits'], 1)
+        self.assertIs(llm_client.get_backend(), self.backend)
@@ -0,0 +1,6 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('api/jobs/<int:job_id>/', views.api_job_status, name='api_llm_job_status'),
+]
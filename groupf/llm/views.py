@@ -0,0 +1,25 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from .jobs import can_view
+from .models import LLMJob
+
+
+@login_required
+def api_job_status(request, job_id):
+    """
+    AIジョブの状態（画面からのポーリング用）
+    登録者のほか、対象の画面を見られる人（ハンドラの can_view）にも返す
+    """
+    job = LLMJob.objects.filter(pk=job_id).first()
+    if job is None or not can_view(request.user, job):
+        return JsonResponse({'status': 'error', 'message': 'ジョブが見つかりません'}, status=404)
+
+    return JsonResponse({
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'attempts': job.attempts,
+        'result': job.result,
+        'error': job.error if job.status == 'failed' else '',
+        'is_pending': job.is_pending,
+    })
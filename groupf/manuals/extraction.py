@@ -0,0 +1,200 @@
+"""
+マニュアル添付ファイル(ManualFile)の本文抽出
+
+アップロード時はファイルIDを登録するだけで、抽出処理はリクエスト外
+（バックグラウンドスレッド、または extract_manual_files コマンド）で行う。
+内容ハッシュが前回と同じファイルは再抽出しない。
+抽出に必要なライブラリ（PDF の pypdf）が無い場合は pending のまま残し、インストール後の実行で抽出する。
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+import zipfile
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ManualFile
+
+logger = logging.getLogger(__name__)
+
+# 1ファイルあたりの抽出テキスト上限（検索索引の肥大化防止）
+MAX_EXTRACTED_CHARS = getattr(settings, 'MANUAL_EXTRACTION_MAX_CHARS', 200_000)
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class UnsupportedFile(Exception):
+    pass
+
+
+class MissingDependency(Exception):
+    """
+    抽出に必要なライブラリが無い（形式としては対象なので、後で再抽出する）
+    """
+
+
+# ==========================================
+# 形式ごとの抽出処理
+# ==========================================
+
+def _decode(data):
+    for encoding in ('utf-8-sig', 'cp932'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('utf-8', errors='ignore')
+
+
+def _extract_plain(f):
+    return _decode(f.read(MAX_EXTRACTED_CHARS * 4))
+
+
+def _xml_text(xml_bytes, tag):
+    # 名前空間付きの <w:t> / <a:t> / <t> 要素のテキストを連結
+    root = ElementTree.fromstring(xml_bytes)
+    return ' '.join(el.text for el in root.iter() if el.tag.endswith('}' + tag) and el.text)
+
+
+def _extract_office(f, members, tag):
+    with zipfile.ZipFile(f) as z:
+        names = sorted(
+            (n for n in z.namelist() if any(re.fullmatch(m, n) for m in members)),
+            key=lambda n: [int(x) if x.isdigit() else x for x in re.split(r'(\d+)', n)],
+        )
+        return '\n'.join(_xml_text(z.read(n), tag) for n in names)
+
+
+def _extract_docx(f):
+    return _extract_office(f, [r'word/document\.xml'], 't')
+
+
+def _extract_xlsx(f):
+    return _extract_office(f, [r'xl/sharedStrings\.xml'], 't')
+
+
+def _extract_pptx(f):
+    return _extract_office(f, [r'ppt/slides/slide\d+\.xml'], 't')
+
+
+def _extract_pdf(f):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise MissingDependency('pypdf がインストールされていません')
+    reader = PdfReader(f)
+    return '\n'.join(page.extract_text() or '' for page in reader.pages)
+
+
+EXTRACTORS = {
+    '.txt': _extract_plain,
+    '.csv': _extract_plain,
+    '.md': _extract_plain,
+    '.docx': _extract_docx,
+    '.xlsx': _extract_xlsx,
+    '.pptx': _extract_pptx,
+    '.pdf': _extract_pdf,
+}
+
+
+def extract_text(field_file, filename):
+    ext = os.path.splitext(filename)[1].lower()
+    extractor = EXTRACTORS.get(ext)
+    if extractor is None:
+        raise UnsupportedFile(f'{ext} は抽出対象外です')
+    with field_file.open('rb') as f:
+        text = extractor(f)
+    # 連続する空白を詰めて上限で切る
+    return re.sub(r'\s+', ' ', text).strip()[:MAX_EXTRACTED_CHARS]
+
+
+def file_hash(field_file):
+    digest = hashlib.sha256()
+    with field_file.open('rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ==========================================
+# 抽出の実行
+# ==========================================
+
+def extract_manual_file(mf, force=False):
+    """
+    1ファイル分の抽出を行い、結果を保存する。
+    内容ハッシュが変わっていない場合、抽出に必要なライブラリが無い場合はスキップして False を返す。
+    """
+    try:
+        content_hash = file_hash(mf.file)
+    except (OSError, ValueError) as e:
+        logger.warning("ManualFile %s: ファイルを開けません: %s", mf.pk, e)
+        mf.extraction_status = 'failed'
+        mf.save(update_fields=['extraction_status'])
+        return False
+
+    if not force and mf.content_hash == content_hash and mf.extraction_status in ('done', 'unsupported'):
+        return False
+
+    try:
+        mf.extracted_text = extract_text(mf.file, mf.original_name or mf.file.name)
+        mf.extraction_status = 'done'
+    except MissingDependency as e:
+        # 最終状態にはせず、ハッシュも記録しない（次回の抽出で再試行する）
+        logger.warning("ManualFile %s: 抽出できません: %s", mf.pk, e)
+        mf.extraction_status = 'pending'
+        mf.save(update_fields=['extraction_status'])
+        return False
+    except UnsupportedFile:
+        mf.extracted_text = ''
+        mf.extraction_status = 'unsupported'
+    except Exception as e:
+        logger.warning("ManualFile %s: 抽出に失敗しました: %s", mf.pk, e)
+        mf.extracted_text = ''
+        mf.extraction_status = 'failed'
+
+    mf.content_hash = content_hash
+    mf.extracted_at = timezone.now()
+    mf.save(update_fields=['content_hash', 'extracted_text', 'extraction_status', 'extracted_at'])
+    return True
+
+
+def process_files(file_ids=None, force=False, limit=None):
+    """
+    抽出待ちのファイル（または指定ファイル）を処理し、処理件数を返す
+    """
+    files = ManualFile.objects.select_related('manual').order_by('pk')
+    if file_ids is not None:
+        files = files.filter(pk__in=file_ids)
+    elif not force:
+        files = files.filter(extraction_status='pending')
+    if limit:
+        files = files[:limit]
+
+    return sum(1 for mf in files.iterator() if extract_manual_file(mf, force=force))
+
+
+def _run_in_background(file_ids):
+    try:
+        process_files(file_ids)
+    except Exception:
+        logger.exception("ManualFile の本文抽出に失敗しました")
+    finally:
+        connection.close()
+
+
+def schedule_extraction(file_ids):
+    """
+    コミット後にバックグラウンドスレッドで抽出する（アップロード画面は待たせない）
+    MANUAL_EXTRACTION_BACKGROUND = False の場合は extract_manual_files コマンドに任せる
+    """
+    if not getattr(settings, 'MANUAL_EXTRACTION_BACKGROUND', True):
+        return
+    file_ids = list(file_ids)
+    transaction.on_commit(
+        lambda: threading.Thread(target=_run_in_background, args=(file_ids,), daemon=True).start()
+    )
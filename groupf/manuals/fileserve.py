@@ -0,0 +1,148 @@
+"""
+マニュアル添付ファイルの配信(manual_file_view)
+
+- ETag / Last-Modified（ファイルサイズと更新日時から生成）による 304 応答
+- Range リクエスト（単一範囲）による 206 部分応答（PDFビューアのページ移動など）
+- MANUAL_FILE_OFFLOAD 設定時は X-Accel-Redirect / X-Sendfile ヘッダを返し、
+  本体の送信は Web サーバ(nginx / Apache)に任せる
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_validators(st):
+    """
+    (ETag, Last-Modified のUNIX時刻) を返す
+    """
+    etag = '"{:x}-{:x}"'.format(st.st_size, st.st_mtime_ns)
+    return etag, int(st.st_mtime)
+
+
+def parse_range(header, size):
+    """
+    Range ヘッダを解釈して (start, end) を返す（end は末尾を含む）
+    ヘッダが無い・複数範囲・逆順（bytes=5-2）などで解釈しない場合は None、
+    範囲がファイル外（空ファイルへの末尾指定を含む）の場合は ValueError
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None  # 複数範囲や不正な形式は全体を返す
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # 末尾から N バイト
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError('empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None  # 不正な範囲は無視して全体を返す
+    if start >= size:
+        raise ValueError('range not satisfiable')
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    # If-Range が現在の版と一致しない場合は部分応答せず全体を返す
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _iter_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _offload_response(path):
+    """
+    Web サーバへ送信を委譲するレスポンス（Range も Web サーバ側で処理される）
+    """
+    mode = getattr(settings, 'MANUAL_FILE_OFFLOAD', '')
+    if mode == 'x-accel':
+        # nginx: internal 指定の location に MEDIA_ROOT を割り当てておく
+        relative = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = getattr(settings, 'MANUAL_FILE_OFFLOAD_PREFIX', '/protected-media/') + relative
+        return response
+    if mode == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = path
+        return response
+    return None
+
+
+def serve_file(request, field_file, filename, content_type=None):
+    """
+    ファイルを inline で返す（条件付きGET・Range・オフロード対応）
+    """
+    path = field_file.path
+    st = os.stat(path)
+    etag, last_modified = file_validators(st)
+    content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Accept-Ranges'] = 'bytes'
+        # ログイン必須のためブラウザキャッシュのみ許可し、毎回再検証させる
+        response['Cache-Control'] = 'private, no-cache'
+        if response.status_code in (200, 206):
+            response['Content-Type'] = content_type
+            response['Content-Disposition'] = content_disposition_header(False, filename)
+        return response
+
+    # If-None-Match / If-Modified-Since（および If-Match 系）の判定
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return finish(conditional)
+
+    offloaded = _offload_response(path)
+    if offloaded is not None:
+        return finish(offloaded)
+
+    # If-Range が古い版を指す場合は Range を無視する（416 ではなく全体の 200）
+    if not _if_range_matches(request, etag, last_modified):
+        return finish(FileResponse(open(path, 'rb')))
+
+    size = st.st_size
+    try:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return finish(response)
+
+    if byte_range is None:
+        return finish(FileResponse(open(path, 'rb')))
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(_iter_range(path, start, length), status=206)
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return finish(response)
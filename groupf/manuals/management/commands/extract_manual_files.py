@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from manuals.extraction import process_files
+
+
+class Command(BaseCommand):
+    help = 'Extracts text from uploaded manual files for the search index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Re-extract all files even if their content is unchanged.')
+        parser.add_argument('--limit', type=int, default=None, help='Maximum number of files to process.')
+
+    def handle(self, *args, **options):
+        processed = process_files(force=options['force'], limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"Extracted {processed} manual files."))
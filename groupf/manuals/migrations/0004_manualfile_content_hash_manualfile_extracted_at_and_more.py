@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manuals', '0003_alter_manual_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='manualfile',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='内容ハッシュ(SHA-256)'),
+        ),
+        migrations.AddField(
+            model_name='manualfile',
+            name='extracted_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='抽出日時'),
+        ),
+        migrations.AddField(
+            model_name='manualfile',
+            name='extracted_text',
+            field=models.TextField(blank=True, verbose_name='抽出テキスト'),
+        ),
+        migrations.AddField(
+            model_name='manualfile',
+            name='extraction_status',
+            field=models.CharField(choices=[('pending', '抽出待ち'), ('done', '抽出済み'), ('unsupported', '対象外'), ('failed', '失敗')], db_index=True, default='pending', max_length=20, verbose_name='抽出状態'),
+        ),
+    ]
@@ -92,11 +92,24 @@ class ViewingHistory(models.Model):
 
 
 class ManualFile(models.Model):
+    EXTRACTION_STATUS_CHOICES = [
+        ("pending", "抽出待ち"),
+        ("done", "抽出済み"),
+        ("unsupported", "対象外"),
+        ("failed", "失敗"),
+    ]
+
     manual = models.ForeignKey(Manual, on_delete=models.CASCADE, related_name="files")
     file = models.FileField(upload_to="manuals/files/")
     original_name = models.CharField(max_length=255, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    # 本文抽出（検索用）: manuals/extraction.py でバックグラウンド処理する
+    content_hash = models.CharField(max_length=64, blank=True, verbose_name="内容ハッシュ(SHA-256)")
+    extracted_text = models.TextField(blank=True, verbose_name="抽出テキスト")
+    extraction_status = models.CharField(max_length=20, choices=EXTRACTION_STATUS_CHOICES, default="pending", db_index=True, verbose_name="抽出状態")
+    extracted_at = models.DateTimeField(null=True, blank=True, verbose_name="抽出日時")
+
     def __str__(self):
         return self.original_name or os.path.basename(self.file.name)
 
@@ -1,7 +1,16 @@
-from django.test import TestCase, Client
+import io
+import tempfile
+import zipfile
+from unittest import mock
+
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from .models import Manual, ManualStatusMaster, ManualVisibilityMaster
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import FileResponse
+from .extraction import EXTRACTORS, MissingDependency, process_files
+from .fileserve import parse_range
+from .models import Manual, ManualFile, ManualStatusMaster, ManualVisibilityMaster
 
 User = get_user_model()
 
@@ -58,3 +67,147 @@ class ManualListTest(TestCase):
         # Check that others ARE in the list
         self.assertIn(pending_manual, manuals)
         self.assertIn(approved_manual, manuals)
+
+
+class ManualZipDownloadTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name, MANUAL_EXTRACTION_BACKGROUND=False)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(employee_number='0001', email='user@example.com', password='password')
+        self.client.login(employee_number='0001', password='password')
+        self.manual = Manual.objects.create(title='手順書', created_by=self.user)
+        self.text = ManualFile.objects.create(
+            manual=self.manual, file=SimpleUploadedFile('memo.txt', b'hello ' * 1000), original_name='memo.txt',
+        )
+        self.pdf = ManualFile.objects.create(
+            manual=self.manual, file=SimpleUploadedFile('guide.pdf', b'%PDF-1.4 data'), original_name='guide.pdf',
+        )
+
+    def _download(self):
+        response = self.client.get(reverse('manual_download_zip', args=[self.manual.pk]))
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_streams_archive_and_reuses_cache(self):
+        response, body = self._download()
+        self.assertNotIsInstance(response, FileResponse)
+        with zipfile.ZipFile(io.BytesIO(body)) as z:
+            infos = {info.filename: info for info in z.infolist()}
+            self.assertEqual(z.read(f'memo_{self.text.id}.txt'), b'hello ' * 1000)
+        self.assertEqual(infos[f'memo_{self.text.id}.txt'].compress_type, zipfile.ZIP_DEFLATED)
+        self.assertEqual(infos[f'guide_{self.pdf.id}.pdf'].compress_type, zipfile.ZIP_STORED)
+
+        # 2回目はキャッシュ済みアーカイブをそのまま返す
+        response, cached_body = self._download()
+        self.assertIsInstance(response, FileResponse)
+        self.assertEqual(cached_body, body)
+
+        # ファイル構成が変わればキャッシュは使わない
+        self.pdf.delete()
+        response, body = self._download()
+        self.assertNotIsInstance(response, FileResponse)
+        with zipfile.ZipFile(io.BytesIO(body)) as z:
+            self.assertEqual(z.namelist(), [f'memo_{self.text.id}.txt'])
+
+
+class ManualExtractionTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name, MANUAL_EXTRACTION_BACKGROUND=False)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        user = User.objects.create_user(employee_number='0001', email='user@example.com', password='password')
+        manual = Manual.objects.create(title='手順書', created_by=user)
+        self.pdf = ManualFile.objects.create(
+            manual=manual, file=SimpleUploadedFile('guide.pdf', b'%PDF-1.4 data'), original_name='guide.pdf',
+        )
+
+    def test_missing_dependency_is_retried(self):
+        def missing(f):
+            raise MissingDependency('pypdf がインストールされていません')
+
+        with mock.patch.dict(EXTRACTORS, {'.pdf': missing}):
+            self.assertEqual(process_files(), 0)
+        self.pdf.refresh_from_db()
+        self.assertEqual((self.pdf.extraction_status, self.pdf.content_hash), ('pending', ''))
+
+        # ライブラリを入れた後の実行で抽出される
+        with mock.patch.dict(EXTRACTORS, {'.pdf': lambda f: 'PDF 本文'}):
+            self.assertEqual(process_files(), 1)
+        self.pdf.refresh_from_db()
+        self.assertEqual((self.pdf.extraction_status, self.pdf.extracted_text), ('done', 'PDF 本文'))
+
+
+class ManualFileViewTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name, MANUAL_EXTRACTION_BACKGROUND=False)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = User.objects.create_user(employee_number='0001', email='user@example.com', password='password')
+        self.client.login(employee_number='0001', password='password')
+        manual = Manual.objects.create(title='手順書', created_by=self.user)
+        self.mf = ManualFile.objects.create(
+            manual=manual, file=SimpleUploadedFile('guide.pdf', b'0123456789'), original_name='guide.pdf',
+        )
+        self.url = reverse('manual_file_view', args=[self.mf.id])
+
+    def test_validators_and_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+        # 版が変わっていれば If-Range により全体を返す（範囲外でも 416 にしない）
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=20-', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+        # 逆順の範囲は無視して全体を返す
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5-2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+    def test_parse_range_edges(self):
+        self.assertEqual(parse_range('bytes=-3', 10), (7, 9))
+        self.assertEqual(parse_range('bytes=5-100', 10), (5, 9))
+        self.assertIsNone(parse_range('bytes=5-2', 10))
+        self.assertIsNone(parse_range('bytes=0-1,4-5', 10))
+        # 空ファイルには末尾指定も満たせない
+        with self.assertRaises(ValueError):
+            parse_range('bytes=-5', 0)
+        with self.assertRaises(ValueError):
+            parse_range('bytes=0-', 0)
+
+    @override_settings(MANUAL_FILE_OFFLOAD='x-accel', MANUAL_FILE_OFFLOAD_PREFIX='/protected/')
+    def test_offload_to_web_server(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/' + self.mf.file.name)
+        self.assertEqual(response.content, b'')
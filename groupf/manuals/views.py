@@ -2,15 +2,17 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from django.http import FileResponse, Http404
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.utils.http import content_disposition_header
 from .models import Manual, ViewingHistory, ManualStatusMaster, ManualFile
 from django.db.models import Q
-from notifications.models import Notification, NotificationTypeMaster
+from accounts import masters
+from notifications.services import notify
 from .forms import ManualCreateForm, ManualFileUploadForm
+from .extraction import schedule_extraction
+from .fileserve import serve_file
+from .zipstream import cache_path, collect_entries, stream_zip
 import os
-import mimetypes
-import zipfile
-import io
 
 
 
@@ -33,7 +35,7 @@ def manual_list(request):
     else:
         # 承認済みマニュアル + 自分が作成した承認待ちマニュアル（却下は除く）
         try:
-            approved_status = ManualStatusMaster.objects.get(code='approved')
+            approved_status = masters.get(ManualStatusMaster, 'approved')
             
             # 承認済み OR (自分の作成 かつ 削除されていない かつ 却下されていない)
             manuals = Manual.objects.filter(
@@ -86,12 +88,17 @@ def manual_files_upload(request, pk):
         messages.error(request, "ファイルが選択されていません。")
         return redirect("manual_detail", pk=manual.pk)
 
+    created_ids = []
     for f in files:
-        ManualFile.objects.create(
+        mf = ManualFile.objects.create(
             manual=manual,
             file=f,
             original_name=getattr(f, "name", "")
         )
+        created_ids.append(mf.id)
+
+    # 本文抽出（検索索引用）はレスポンス後にバックグラウンドで行う
+    schedule_extraction(created_ids)
 
     messages.success(request, f"{len(files)} 件アップロードしました。")
 
@@ -100,7 +107,7 @@ def manual_files_upload(request, pk):
     is_manager_or_admin = request.user.role and request.user.role.code in ['manager', 'admin']
     if not is_manager_or_admin:
         try:
-            pending_status = ManualStatusMaster.objects.get(code='pending')
+            pending_status = masters.get(ManualStatusMaster, 'pending')
             # 既に pending なら変更不要だが、approved などの場合は pending に戻す
             if manual.status != pending_status:
                 manual.status = pending_status
@@ -120,23 +127,12 @@ def manual_file_view(request, file_id):
     except ManualFile.DoesNotExist:
         raise Http404("file not found")
 
-    name = (mf.file.name or "").lower()
-
-    # PDF：iframe用に inline
-    if name.endswith(".pdf"):
-        response = FileResponse(mf.file.open("rb"), content_type="application/pdf")
-        response["Content-Disposition"] = f'inline; filename="{mf.original_name or mf.file.name}"'
-        return response
-
-    # 画像だけ：img表示できるように content_type を付けて inline にする
-    if name.endswith((".png", ".jpg", ".jpeg")):
-        ctype, _ = mimetypes.guess_type(name)
-        response = FileResponse(mf.file.open("rb"), content_type=ctype or "image/jpeg")
-        response["Content-Disposition"] = f'inline; filename="{mf.original_name or mf.file.name}"'
-        return response
-
-    # それ以外：従来通り（必要なら attachment にしてもOK）
-    return FileResponse(mf.file.open("rb"))
+    # PDF・画像は iframe / img で表示できるよう inline で返す
+    # Range・条件付きGET（304）に対応（manuals/fileserve.py）
+    try:
+        return serve_file(request, mf.file, mf.original_name or os.path.basename(mf.file.name))
+    except (OSError, ValueError):
+        raise Http404("file not found")
 
 
 @login_required
@@ -173,7 +169,7 @@ def manual_approval_list(request):
             manual = Manual.objects.get(pk=manual_id, is_deleted=False)
             
             # ステータスを「承認待ち」から「公開中」に変更
-            approved_status = ManualStatusMaster.objects.get(code='approved')
+            approved_status = masters.get(ManualStatusMaster, 'approved')
             manual.status = approved_status
             manual.approved_by = request.user
             manual.approved_at = timezone.now()
@@ -205,7 +201,7 @@ def manual_reject(request, pk):
         
         try:
             # ステータスを「却下」に変更
-            rejected_status = ManualStatusMaster.objects.get(code='rejected')
+            rejected_status = masters.get(ManualStatusMaster, 'rejected')
             manual.status = rejected_status
             
             # 論理削除については、要件文に「承認まちから論理削除、状態を却下にする」とあるが
@@ -222,12 +218,11 @@ def manual_reject(request, pk):
             manual.save()
             
             # 通知作成
-            notif_type = NotificationTypeMaster.objects.get(code='manual_reject')
-            Notification.objects.create(
-                recipient=manual.created_by,
+            notify(
+                manual.created_by,
                 title="マニュアルが却下されました",
                 message=f"マニュアル「{manual.title}」が却下されました。\n理由: {reason}",
-                notification_type=notif_type,
+                type_code='manual_reject',
                 related_object_id=manual.pk,
                 link_url=f"/manuals/detail/{manual.pk}/" # 修正画面などへのリンクが望ましいが一旦詳細へ
             )
@@ -236,8 +231,6 @@ def manual_reject(request, pk):
             
         except ManualStatusMaster.DoesNotExist:
             messages.error(request, 'ステータスマスタ(rejected)が見つかりません。')
-        except NotificationTypeMaster.DoesNotExist:
-            messages.error(request, '通知タイプマスタ(manual_reject)が見つかりません。')
             
     return redirect('manual_pending_list')
 
@@ -258,7 +251,7 @@ def manual_create_view(request):
             if request.user.role and request.user.role.code in ['manager', 'admin']:
                 # マネージャー以上は直接公開
                 try:
-                    approved_status = ManualStatusMaster.objects.get(code='approved')
+                    approved_status = masters.get(ManualStatusMaster, 'approved')
                     manual.status = approved_status
                     manual.approved_by = request.user  # 自己承認として記録
                     manual.approved_at = timezone.now()
@@ -269,7 +262,7 @@ def manual_create_view(request):
             else:
                 # 従業員は承認待ち
                 try:
-                    pending_status = ManualStatusMaster.objects.get(code='pending')
+                    pending_status = masters.get(ManualStatusMaster, 'pending')
                     manual.status = pending_status
                     messages.info(request, 'マニュアルを作成しました。承認されると公開されます。')
                 except ManualStatusMaster.DoesNotExist:
@@ -364,7 +357,7 @@ def manual_pending_list_view(request):
     
     # 承認待ちマニュアルを取得
     try:
-        pending_status = ManualStatusMaster.objects.get(code='pending')
+        pending_status = masters.get(ManualStatusMaster, 'pending')
         pending_manuals = Manual.objects.filter(
             status=pending_status,
             is_deleted=False
@@ -387,43 +380,19 @@ def manual_detail_view(request, pk):
 def manual_download_zip(request, pk):
     """
     マニュアルに関連するファイルをまとめてZIPでダウンロード
+    読みながら送信するストリーミング形式。同じファイル構成ならキャッシュを返す
     """
     manual = get_object_or_404(Manual, pk=pk)
-    
-    # ZIPファイルを作成するメモリバッファ
-    buffer = io.BytesIO()
-    
-    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as z:
-        # メインファイル
-        if manual.file:
-            try:
-                file_path = manual.file.path
-                if os.path.exists(file_path):
-                    filename = os.path.basename(manual.file.name)
-                    z.write(file_path, filename)
-            except Exception:
-                pass # ファイルが見つからない場合はスキップ
-
-        # 添付ファイル
-        for mf in manual.files.all():
-            if mf.file:
-                try:
-                    file_path = mf.file.path
-                    if os.path.exists(file_path):
-                        # ファイル名 (オリジナル名優先、なければファイル名)
-                        filename = mf.original_name or os.path.basename(mf.file.name)
-                        # 同じ名前のファイルがZIP内にあると上書き等の問題が出るため、
-                        # 簡易的にIDを付与してユニークにする
-                        base, ext = os.path.splitext(filename)
-                        filename = f"{base}_{mf.id}{ext}"
-                        
-                        z.write(file_path, filename)
-                except Exception:
-                    pass
-
-    buffer.seek(0)
-    
+
+    entries = collect_entries(manual)
+    cached = cache_path(manual, entries)
+
     # ダウンロードファイル名
     zip_filename = f"{manual.title}.zip"
-    
-    return FileResponse(buffer, as_attachment=True, filename=zip_filename)
+
+    if os.path.exists(cached):
+        return FileResponse(open(cached, "rb"), as_attachment=True, filename=zip_filename)
+
+    response = StreamingHttpResponse(stream_zip(manual, entries, cache_to=cached), content_type="application/zip")
+    response["Content-Disposition"] = content_disposition_header(True, zip_filename)
+    return response
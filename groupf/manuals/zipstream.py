@@ -0,0 +1,174 @@
+"""
+マニュアル添付ファイルのZIPストリーミング(manual_download_zip)
+
+ファイルを読みながらZIPエントリを書き出し、書けた分からクライアントへ送る。
+アーカイブ全体をメモリに持たないため、添付が大きくてもメモリ使用量は一定。
+完成したアーカイブは「ファイル構成（名前・サイズ・更新日時）」をキーに
+MEDIA_ROOT/zip_cache へ保存し、次回以降はそのまま返す。
+"""
+import hashlib
+import logging
+import os
+import zipfile
+from datetime import datetime
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+CACHE_DIR_NAME = 'zip_cache'
+
+# 既に圧縮済みの形式は再圧縮せず格納のみ（CPU時間の節約。サイズはほぼ変わらない）
+STORED_EXTENSIONS = {
+    '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.zip',
+    '.docx', '.xlsx', '.pptx', '.mp4', '.mp3',
+}
+
+
+class _StreamBuffer:
+    """
+    ZipFile の書き込み先（シーク不可のストリームとして振る舞う）
+    書き込まれたバイト列を溜めておき、take() で取り出す
+    """
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def collect_entries(manual):
+    """
+    アーカイブに含めるファイル一覧 [(ZIP内の名前, ファイルパス, stat)]
+    ファイルが存在しないものは除外する
+    """
+    entries = []
+
+    def add(arcname, field_file):
+        try:
+            path = field_file.path
+            entries.append((arcname, path, os.stat(path)))
+        except (OSError, ValueError, NotImplementedError):
+            pass  # ファイルが見つからない場合はスキップ
+
+    # メインファイル
+    if manual.file:
+        add(os.path.basename(manual.file.name), manual.file)
+
+    # 添付ファイル（同名ファイルの衝突を避けるためIDを付与）
+    for mf in manual.files.all():
+        if mf.file:
+            base, ext = os.path.splitext(mf.original_name or os.path.basename(mf.file.name))
+            add(f"{base}_{mf.id}{ext}", mf.file)
+
+    return entries
+
+
+def _cache_dir():
+    return os.path.join(settings.MEDIA_ROOT, CACHE_DIR_NAME)
+
+
+def cache_path(manual, entries):
+    key = hashlib.sha256(repr([
+        (arcname, os.path.basename(path), st.st_size, st.st_mtime_ns)
+        for arcname, path, st in entries
+    ]).encode()).hexdigest()[:32]
+    return os.path.join(_cache_dir(), f"{manual.pk}-{key}.zip")
+
+
+def _zip_info(arcname, st):
+    info = zipfile.ZipInfo(arcname, date_time=datetime.fromtimestamp(st.st_mtime).timetuple()[:6])
+    ext = os.path.splitext(arcname)[1].lower()
+    info.compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    info.file_size = st.st_size
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def _remove_stale_archives(manual, keep_path):
+    prefix = f"{manual.pk}-"
+    try:
+        names = os.listdir(_cache_dir())
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(_cache_dir(), name)
+        if name.startswith(prefix) and path != keep_path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def stream_zip(manual, entries, cache_to=None):
+    """
+    ZIPのバイト列を順次 yield するジェネレータ
+
+    cache_to を指定すると同時に一時ファイルへ書き出し、最後まで送信できた場合のみ
+    キャッシュとして確定する（途中切断時は破棄）。
+    """
+    buffer = _StreamBuffer()
+    cache_file = tmp_path = None
+    if cache_to:
+        try:
+            os.makedirs(os.path.dirname(cache_to), exist_ok=True)
+            tmp_path = f"{cache_to}.{os.getpid()}.{id(buffer)}.tmp"
+            cache_file = open(tmp_path, 'wb')
+        except OSError:
+            logger.warning("ZIPキャッシュを作成できません: %s", cache_to)
+            cache_file = tmp_path = None
+
+    def drain():
+        data = buffer.take()
+        if data and cache_file:
+            cache_file.write(data)
+        return data
+
+    completed = False
+    try:
+        with zipfile.ZipFile(buffer, 'w') as z:
+            for arcname, path, st in entries:
+                info = _zip_info(arcname, st)
+                try:
+                    src = open(path, 'rb')
+                except OSError:
+                    continue
+                with src, z.open(info, 'w', force_zip64=st.st_size > zipfile.ZIP64_LIMIT) as dest:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                        dest.write(chunk)
+                        data = drain()
+                        if data:
+                            yield data
+                data = drain()
+                if data:
+                    yield data
+        data = drain()
+        if data:
+            yield data
+        completed = True
+    finally:
+        if cache_file:
+            cache_file.close()
+            if completed:
+                os.replace(tmp_path, cache_to)
+                _remove_stale_archives(manual, cache_to)
+            else:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
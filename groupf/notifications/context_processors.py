@@ -0,0 +1,11 @@
+from . import services
+
+
+def unread_notifications(request):
+    """
+    ヘッダー・サイドバーの未読バッジ用（キャッシュから取得）
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'unread_notification_count': services.unread_count(user)}
@@ -0,0 +1,134 @@
+"""
+通知のライブ配信（Server-Sent Events / ロングポーリング）
+
+通知の作成・既読化のたびに services.touch() がユーザーごとのスタンプ（キャッシュ）を更新する。
+待機中の接続はスタンプだけを見て、変わったときにだけDBから新着を取得するので、
+接続数が増えてもDBへの問い合わせは増えない。
+（複数プロセスで動かす場合はプロセス間で共有されるキャッシュ(Redis 等)を CACHES に設定すること。
+共有されていなくても FALLBACK_CHECK_SECONDS ごとにDBを確認する）
+
+新着の判定は created_at で行う。コミット順と created_at の順が前後しても取りこぼさないよう、
+直近 OVERLAP_SECONDS の範囲を毎回読み直し、送信済み（同じ id・created_at）のものは除く。
+まとめられた通知（services の collapse）は created_at が更新されるので再送される。
+"""
+import asyncio
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from llm.streaming import sse_event
+from . import services
+from .models import Notification
+
+OVERLAP_SECONDS = 5
+FALLBACK_CHECK_SECONDS = 30
+MAX_BATCH = 50
+
+
+def serialize(notification):
+    notif_type = notification.notification_type
+    return {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'type': notif_type.code if notif_type else None,
+        'type_name': notif_type.name if notif_type else None,
+        'link_url': notification.link_url,
+        'related_object_id': notification.related_object_id,
+        'is_read': notification.is_read,
+        'repeat_count': notification.repeat_count,
+        'created_at': notification.created_at.isoformat(),
+    }
+
+
+def recent_notifications(user_id, since):
+    """
+    since - OVERLAP_SECONDS 以降に作成（更新）された通知（古い順）
+    """
+    return list(
+        Notification.objects
+        .filter(recipient_id=user_id, created_at__gte=since - timedelta(seconds=OVERLAP_SECONDS))
+        .select_related('notification_type')
+        .order_by('created_at', 'id')[:MAX_BATCH]
+    )
+
+
+def _poll_interval():
+    return getattr(settings, 'NOTIFICATION_POLL_INTERVAL', 1.0)
+
+
+async def wait_for_change(user_id, stamp, timeout):
+    """
+    スタンプが stamp から変わるまで最大 timeout 秒待つ
+    戻り値: 新しいスタンプ（タイムアウト時は None）
+    """
+    deadline = time.monotonic() + timeout
+    interval = _poll_interval()
+    while time.monotonic() < deadline:
+        current = await sync_to_async(services.current_stamp)(user_id)
+        if current != stamp:
+            return current
+        await asyncio.sleep(min(interval, max(deadline - time.monotonic(), 0)))
+    return None
+
+
+class Tracker:
+    """
+    1つの接続で送信済みの通知を覚えておき、新着・更新分だけを返す
+    """
+
+    def __init__(self, user_id, since=None):
+        self.user_id = user_id
+        self.since = since or timezone.now()
+        self.sent = {}
+
+    def fetch(self):
+        fresh = []
+        for notification in recent_notifications(self.user_id, self.since):
+            if self.sent.get(notification.id) != notification.created_at:
+                self.sent[notification.id] = notification.created_at
+                fresh.append(notification)
+        if fresh:
+            self.since = max(self.since, fresh[-1].created_at)
+        # 読み直し範囲より古いものは忘れる
+        horizon = self.since - timedelta(seconds=OVERLAP_SECONDS * 2)
+        self.sent = {pk: created_at for pk, created_at in self.sent.items() if created_at >= horizon}
+        return fresh
+
+
+async def event_stream(user_id, duration=None):
+    """
+    SSE: 接続時に未読件数を送り、以降は新着通知と未読件数の変化を送る
+
+    duration 秒で接続を閉じる（EventSource が自動で再接続する）。
+    """
+    duration = duration or getattr(settings, 'NOTIFICATION_STREAM_SECONDS', 55)
+    deadline = time.monotonic() + duration
+    tracker = Tracker(user_id)
+    stamp = await sync_to_async(services.current_stamp)(user_id)
+    unread = await sync_to_async(services.unread_count)(user_id)
+    yield sse_event('unread', {'count': unread})
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        changed = await wait_for_change(user_id, stamp, min(remaining, FALLBACK_CHECK_SECONDS))
+        if changed is None and time.monotonic() >= deadline:
+            return
+        if changed is not None:
+            stamp = changed
+
+        fresh = await sync_to_async(tracker.fetch)()
+        for notification in fresh:
+            yield sse_event('notification', serialize(notification))
+        count = await sync_to_async(services.unread_count)(user_id)
+        if count != unread:
+            unread = count
+            yield sse_event('unread', {'count': unread})
+        elif changed is None and not fresh:
+            # 接続維持（プロキシのタイムアウト対策）
+            yield ": keep-alive\n\n"
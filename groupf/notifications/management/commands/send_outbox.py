@@ -0,0 +1,40 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from notifications.outbox import deliver_batch, metrics
+
+
+class Command(BaseCommand):
+    help = 'Sends queued emails from the outbox, reusing one SMTP connection per batch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Emails per SMTP connection (default: EMAIL_OUTBOX_BATCH_SIZE).')
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds to wait when the outbox is empty.')
+        parser.add_argument('--once', action='store_true', help='Send the emails that are ready now and exit.')
+        parser.add_argument('--stats', action='store_true', help='Print outbox metrics as JSON and exit.')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(metrics(), ensure_ascii=False, indent=2))
+            return
+
+        if options['once']:
+            total = 0
+            while True:
+                claimed = deliver_batch(options['batch_size'])
+                if not claimed:
+                    break
+                total += claimed
+            self.stdout.write(self.style.SUCCESS(f"Processed {total} emails."))
+            return
+
+        self.stdout.write("Outbox sender started.")
+        try:
+            while True:
+                close_old_connections()
+                if not deliver_batch(options['batch_size']):
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_notification_notif_recipient_unread_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipients', models.JSONField(verbose_name='宛先')),
+                ('subject', models.CharField(max_length=255, verbose_name='件名')),
+                ('body', models.TextField(verbose_name='本文')),
+                ('from_email', models.CharField(blank=True, max_length=255, verbose_name='送信元')),
+                ('status', models.CharField(choices=[('queued', '送信待ち'), ('sending', '送信中'), ('sent', '送信済み'), ('failed', '失敗')], default='queued', max_length=20, verbose_name='状態')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='試行回数')),
+                ('max_attempts', models.PositiveIntegerField(default=5, verbose_name='最大試行回数')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='送信予定日時')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='送信開始日時')),
+                ('last_error', models.TextField(blank=True, verbose_name='エラー内容')),
+                ('send_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='送信時間(ms)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='登録日時')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='送信日時')),
+            ],
+            options={
+                'verbose_name': '送信メール',
+                'verbose_name_plural': '送信メール',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='email_outbox_queue_idx')],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 # ==========================================
 # マスタテーブル定義
@@ -40,6 +41,8 @@ class Notification(models.Model):
     link_url = models.CharField(max_length=200, blank=True, null=True, verbose_name="リンクURL")
     
     is_read = models.BooleanField(default=False, verbose_name="既読")
+    # 連続した同じ通知をまとめた件数（notifications/services.py の collapse）
+    repeat_count = models.PositiveIntegerField(default=1, verbose_name="まとめた件数")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="通知日時")
 
     def __str__(self):
@@ -49,3 +52,47 @@ class Notification(models.Model):
         verbose_name = "通知"
         verbose_name_plural = "通知"
         ordering = ['-created_at']
+        indexes = [
+            # 未読一覧・未読件数・新着の取得用
+            models.Index(fields=['recipient', 'is_read', 'created_at'], name='notif_recipient_unread_idx'),
+        ]
+
+
+class EmailOutbox(models.Model):
+    """
+    送信待ちメール（notifications/outbox.py の send_outbox ワーカーが送信する）
+    画面側は行を追加するだけで、SMTP への接続は待たない
+    """
+    STATUS_CHOICES = [
+        ('queued', '送信待ち'),
+        ('sending', '送信中'),
+        ('sent', '送信済み'),
+        ('failed', '失敗'),
+    ]
+
+    recipients = models.JSONField(verbose_name="宛先")
+    subject = models.CharField(max_length=255, verbose_name="件名")
+    body = models.TextField(verbose_name="本文")
+    from_email = models.CharField(max_length=255, blank=True, verbose_name="送信元")
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', verbose_name="状態")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="試行回数")
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name="最大試行回数")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="送信予定日時")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="送信開始日時")
+    last_error = models.TextField(blank=True, verbose_name="エラー内容")
+    send_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name="送信時間(ms)")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="登録日時")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="送信日時")
+
+    class Meta:
+        verbose_name = "送信メール"
+        verbose_name_plural = "送信メール"
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='email_outbox_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
@@ -0,0 +1,279 @@
+"""
+メール送信のアウトボックス(EmailOutbox)
+
+- queue_email() / queue_messages(): 画面・処理側は送信待ちの行を追加するだけ
+- deliver_batch(): send_outbox コマンドの1回分の処理
+  送信中のまま止まったメールを送信待ちに戻してから、1バッチを1つの SMTP 接続で送り（TLS ハンドシェイクは1回）、
+  EMAIL_OUTBOX_RATE_PER_MINUTE を超えないよう送信間隔をあける（間隔はプロセス内の全スレッドで共有する）
+- 失敗したメールは指数バックオフで再送し、最大試行回数に達したら failed にする
+- metrics(): 件数（送信待ち・送信済み・失敗）と送信までの時間
+
+EMAIL_OUTBOX_BACKGROUND = True の場合は、登録のコミット後にバックグラウンドスレッドでも送信する
+（ワーカーを起動しない開発環境向け。既定は DEBUG と同じ。複数のプロセスで送信しても同じメールを二重に送らないが、
+送信間隔はプロセスごとなので、本番では send_outbox ワーカーだけで送る）。
+"""
+import logging
+import smtplib
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+# 送信中のまま止まった（ワーカーが落ちた）メールを送信待ちに戻すまでの時間
+STALE_AFTER = timedelta(minutes=10)
+METRICS_WINDOW = timedelta(hours=1)
+
+# そのメールだけの失敗（接続はそのまま使える）
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+# 接続ごと作り直すべきエラー（SMTPException も OSError の派生なので MESSAGE_ERRORS を先に判定する）
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, OSError)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+# ==========================================
+# 登録
+# ==========================================
+
+def _row(subject, body, recipients, from_email=None):
+    return EmailOutbox(
+        subject=subject,
+        body=body,
+        recipients=list(recipients),
+        from_email=from_email or '',
+        max_attempts=_setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 5),
+    )
+
+
+def _explicit_from(message):
+    # 既定の送信元は保存せず、送信時の DEFAULT_FROM_EMAIL を使う
+    return None if message.from_email == settings.DEFAULT_FROM_EMAIL else message.from_email
+
+
+def queue_email(subject, body, recipients, from_email=None):
+    """
+    メールを送信待ちに登録する（send_mail の代わり）
+    """
+    row = _row(subject, body, recipients, from_email)
+    row.save()
+    _schedule_delivery()
+    return row
+
+
+def queue_messages(messages):
+    """
+    EmailMessage のリストをまとめて送信待ちに登録する
+    """
+    rows = EmailOutbox.objects.bulk_create(
+        [_row(m.subject, m.body, m.to, _explicit_from(m)) for m in messages],
+        batch_size=500,
+    )
+    if rows:
+        _schedule_delivery()
+    return rows
+
+
+def _schedule_delivery():
+    if not _setting('EMAIL_OUTBOX_BACKGROUND', False):
+        return
+    transaction.on_commit(lambda: threading.Thread(target=_run_in_background, daemon=True).start())
+
+
+def _run_in_background():
+    try:
+        while deliver_batch():
+            pass
+    except Exception:
+        logger.exception("メールの送信に失敗しました")
+    finally:
+        connection.close()
+
+
+# ==========================================
+# 送信
+# ==========================================
+
+def requeue_stale():
+    return EmailOutbox.objects.filter(status='sending', locked_at__lt=timezone.now() - STALE_AFTER).update(
+        status='queued', locked_at=None
+    )
+
+
+def claim_batch(limit=None):
+    """
+    送信待ちのメールを最大 limit 件確保する（他のワーカーと重複しない）
+    """
+    limit = limit or _setting('EMAIL_OUTBOX_BATCH_SIZE', 50)
+    now = timezone.now()
+    ids = list(
+        EmailOutbox.objects.filter(status='queued', run_after__lte=now)
+        .order_by('run_after', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    # 条件付き UPDATE で確保し、確保できた行だけを送る
+    EmailOutbox.objects.filter(pk__in=ids, status='queued').update(status='sending', locked_at=now)
+    return list(EmailOutbox.objects.filter(pk__in=ids, status='sending', locked_at=now).order_by('run_after', 'id'))
+
+
+def backoff_delay(attempts):
+    base = _setting('EMAIL_OUTBOX_BACKOFF_SECONDS', 30)
+    return timedelta(seconds=base * (2 ** max(attempts - 1, 0)))
+
+
+def _mark_sent(item, started):
+    item.status = 'sent'
+    item.attempts += 1
+    item.sent_at = timezone.now()
+    item.send_ms = int((time.monotonic() - started) * 1000)
+    item.last_error = ''
+    item.save(update_fields=['status', 'attempts', 'sent_at', 'send_ms', 'last_error'])
+    _stats['sent'] += 1
+
+
+def _mark_failed(item, error):
+    item.attempts += 1
+    item.last_error = str(error)[:1000]
+    if item.attempts >= item.max_attempts:
+        item.status = 'failed'
+        _stats['failed'] += 1
+        logger.error("メール #%s の送信に失敗しました: %s", item.pk, error)
+    else:
+        item.status = 'queued'
+        item.run_after = timezone.now() + backoff_delay(item.attempts)
+        _stats['retried'] += 1
+    item.locked_at = None
+    item.save(update_fields=['attempts', 'last_error', 'status', 'run_after', 'locked_at'])
+
+
+def _release(items, error):
+    # 接続できなかったメールは試行回数を数えたうえで再送を待つ
+    for item in items:
+        _mark_failed(item, error)
+
+
+def _message(item):
+    return EmailMessage(item.subject, item.body, item.from_email or None, item.recipients)
+
+
+class _Throttle:
+    """
+    送信間隔の調整（プロセス内で1つ。バックグラウンドスレッドが複数あっても合計で上限を超えない）
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self):
+        per_minute = _setting('EMAIL_OUTBOX_RATE_PER_MINUTE', 0)
+        if not per_minute:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self.next_at)
+            self.next_at = start_at + 60.0 / per_minute
+        if start_at > now:
+            time.sleep(start_at - now)
+
+
+_throttle = _Throttle()
+
+
+def deliver_batch(limit=None):
+    """
+    1バッチ分を1つの接続で送信する（先に送信中のまま止まったメールを送信待ちに戻す）
+    戻り値: 確保したメールの件数（0 なら送信待ちなし）
+    """
+    requeued = requeue_stale()
+    if requeued:
+        logger.info("送信中のまま止まったメール %s 件を送信待ちに戻しました", requeued)
+    batch = claim_batch(limit)
+    if not batch:
+        return 0
+
+    mail_connection = get_connection(fail_silently=False)
+    try:
+        mail_connection.open()
+    except Exception as e:
+        logger.warning("メールサーバに接続できません: %s", e)
+        _release(batch, e)
+        return len(batch)
+
+    try:
+        for index, item in enumerate(batch):
+            _throttle.wait()
+            started = time.monotonic()
+            try:
+                mail_connection.send_messages([_message(item)])
+            except MESSAGE_ERRORS as e:
+                _mark_failed(item, e)
+            except CONNECTION_ERRORS as e:
+                _mark_failed(item, e)
+                # 接続が切れた場合は1回だけ張り直して続ける
+                try:
+                    mail_connection.close()
+                    mail_connection.open()
+                except Exception as reopen_error:
+                    _release(batch[index + 1:], reopen_error)
+                    break
+            except Exception as e:
+                _mark_failed(item, e)
+            else:
+                _mark_sent(item, started)
+    finally:
+        try:
+            mail_connection.close()
+        except Exception:
+            pass
+    return len(batch)
+
+
+# ==========================================
+# 指標
+# ==========================================
+
+_stats = {'sent': 0, 'failed': 0, 'retried': 0}
+
+
+def metrics():
+    """
+    送信状況の指標
+    - queued / sending / sent / failed: 状態ごとの件数
+    - oldest_queued_seconds: 最も古い送信待ちの待ち時間
+    - avg_send_ms / max_send_ms: 直近1時間の SMTP 送信時間
+    - avg_latency_seconds: 直近1時間の登録から送信までの時間
+    - process: このプロセスでの送信・失敗・再送の回数
+    """
+    counts = {status: 0 for status, _ in EmailOutbox.STATUS_CHOICES}
+    for row in EmailOutbox.objects.values('status').annotate(n=Count('id')):
+        counts[row['status']] = row['n']
+
+    now = timezone.now()
+    oldest = EmailOutbox.objects.filter(status='queued').order_by('created_at').values_list('created_at', flat=True).first()
+    recent = list(
+        EmailOutbox.objects.filter(status='sent', sent_at__gte=now - METRICS_WINDOW)
+        .values_list('created_at', 'sent_at', 'send_ms')[:1000]
+    )
+    send_ms = [r[2] for r in recent if r[2] is not None]
+    latencies = [(r[1] - r[0]).total_seconds() for r in recent]
+    return {
+        **counts,
+        'oldest_queued_seconds': (now - oldest).total_seconds() if oldest else 0,
+        'avg_send_ms': sum(send_ms) / len(send_ms) if send_ms else None,
+        'max_send_ms': max(send_ms) if send_ms else None,
+        'avg_latency_seconds': sum(latencies) / len(latencies) if latencies else None,
+        'process': dict(_stats),
+    }
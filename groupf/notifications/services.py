@@ -0,0 +1,186 @@
+"""
+通知の作成・既読管理（各画面からはここを経由して通知を作る）
+
+- 複数人への通知は bulk_create でまとめて1回の INSERT にする
+- 通知タイプマスタはプロセス内のレジストリ（accounts/masters.py）から引き、毎回の検索をしない
+- 未読件数はユーザーごとにキャッシュし、ヘッダーのバッジ表示で COUNT(*) を走らせない
+  （キャッシュは全プロセスで共有するものが必須。settings.CACHES を参照）
+- collapse=True の通知は、同じ相手・種類・対象の未読通知が一定時間内にあれば
+  新しい行を作らずにまとめる（相談メッセージの連投など）
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts import masters
+from .models import Notification, NotificationTypeMaster
+
+# マスタ未登録時に作成する名前（init_master_data と同じ）
+DEFAULT_TYPE_NAMES = {
+    'info': 'お知らせ',
+    'task_assign': 'タスクアサイン',
+    'interview_invite': '面談依頼',
+    'manual_approval': 'マニュアル承認依頼',
+    'manual_reject': 'マニュアル却下',
+    'interview_decline': '面談辞退',
+    'consultation_message': '相談メッセージ',
+}
+
+BULK_BATCH_SIZE = 500
+
+
+def clear_type_cache(**kwargs):
+    masters.clear(NotificationTypeMaster)
+
+
+def get_type_id(code):
+    """
+    通知タイプのIDを返す（未登録なら作成する）
+    """
+    return masters.get_or_create(NotificationTypeMaster, code, name=DEFAULT_TYPE_NAMES.get(code, code)).pk
+
+
+def _collapse_window():
+    return timedelta(seconds=getattr(settings, 'NOTIFICATION_COLLAPSE_SECONDS', 600))
+
+
+def _recipient_ids(recipients):
+    if recipients is None:
+        return []
+    if hasattr(recipients, 'values_list'):
+        # QuerySet はIDだけを取得する
+        return list(recipients.values_list('pk', flat=True).distinct())
+    if not isinstance(recipients, (list, tuple, set, frozenset)):
+        recipients = [recipients]
+    ids = []
+    for recipient in recipients:
+        recipient_id = getattr(recipient, 'pk', recipient)
+        if recipient_id is not None and recipient_id not in ids:
+            ids.append(recipient_id)
+    return ids
+
+
+def notify(recipients, title, message, type_code='info', related_object_id=None, link_url=None, collapse=False):
+    """
+    通知を作成する
+
+    recipients: ユーザー / ユーザーID / それらのリスト・QuerySet
+    戻り値: 新しく作成した Notification のリスト（まとめられた分は含まない）
+    """
+    all_ids = recipient_ids = _recipient_ids(recipients)
+    if not recipient_ids:
+        return []
+    type_id = get_type_id(type_code) if type_code else None
+    link_url = str(link_url) if link_url else link_url
+    now = timezone.now()
+
+    with transaction.atomic():
+        if collapse:
+            recent = Notification.objects.filter(
+                recipient_id__in=recipient_ids,
+                notification_type_id=type_id,
+                related_object_id=related_object_id,
+                is_read=False,
+                created_at__gte=now - _collapse_window(),
+            )
+            collapsed = set(recent.values_list('recipient_id', flat=True))
+            if collapsed:
+                # 既存の未読通知を最新の内容にして先頭に上げる（未読件数は変わらない）
+                recent.update(
+                    title=title, message=message, link_url=link_url,
+                    created_at=now, repeat_count=F('repeat_count') + 1,
+                )
+                recipient_ids = [r for r in recipient_ids if r not in collapsed]
+
+        created = Notification.objects.bulk_create(
+            [
+                Notification(
+                    recipient_id=recipient_id,
+                    title=title,
+                    message=message,
+                    notification_type_id=type_id,
+                    related_object_id=related_object_id,
+                    link_url=link_url,
+                )
+                for recipient_id in recipient_ids
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+        # まとめられた相手も内容が変わったのでライブ配信の対象にする
+        transaction.on_commit(lambda: (_increment_unread(recipient_ids), touch(all_ids)))
+    return created
+
+
+# ==========================================
+# 未読件数
+# ==========================================
+
+def unread_cache_key(user_id):
+    return f"notifications:unread:{user_id}"
+
+
+def _unread_timeout():
+    # 管理画面など service を通らない更新があっても一定時間で正しい値に戻る
+    return getattr(settings, 'NOTIFICATION_UNREAD_CACHE_SECONDS', 300)
+
+
+def unread_count(user):
+    user_id = getattr(user, 'pk', user)
+    key = unread_cache_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+        cache.set(key, count, _unread_timeout())
+    return count
+
+
+def stamp_key(user_id):
+    return f"notifications:stamp:{user_id}"
+
+
+def touch(user_ids):
+    """
+    通知の変更をライブ配信（notifications/live.py）に知らせる
+    """
+    now = time.time()
+    cache.set_many({stamp_key(user_id): now for user_id in user_ids}, None)
+
+
+def current_stamp(user_id):
+    return cache.get(stamp_key(user_id))
+
+
+def _increment_unread(user_ids):
+    for user_id in user_ids:
+        try:
+            cache.incr(unread_cache_key(user_id))
+        except ValueError:
+            # キャッシュに無ければ次回の表示時に数え直す
+            pass
+
+
+def invalidate_unread(user_ids):
+    cache.delete_many([unread_cache_key(user_id) for user_id in user_ids])
+    touch(user_ids)
+
+
+def mark_read(user, ids=None):
+    """
+    通知を既読にする（ids を省略した場合はすべて）
+    戻り値: 既読にした件数
+    """
+    queryset = Notification.objects.filter(recipient=user, is_read=False)
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    updated = queryset.update(is_read=True)
+    if updated:
+        # コミット前に他の接続が古い件数を入れ直すことがあるので、コミット後にも消す
+        user_id = user.pk
+        invalidate_unread([user_id])
+        transaction.on_commit(lambda: invalidate_unread([user_id]))
+    return updated
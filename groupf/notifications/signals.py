@@ -0,0 +1,16 @@
+"""
+services.py を通らない変更（管理画面・個別の save など）でもキャッシュを整合させる
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import services
+from .models import Notification
+
+
+@receiver([post_save, post_delete], sender=Notification)
+def invalidate_unread_count(sender, instance, **kwargs):
+    recipient_id = instance.recipient_id
+    transaction.on_commit(lambda: services.invalidate_unread([recipient_id]))
+
@@ -1,3 +1,250 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+import json
+import socketserver
+import threading
+from datetime import timedelta
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from consultations.models import Consultation
+from chat.messaging import post_consultation_message
+from . import live, outbox, services
+from .models import EmailOutbox, Notification, NotificationTypeMaster
+
+User = get_user_model()
+
+
+class NotificationServiceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        services.clear_type_cache()
+        self.users = [
+            User.objects.create_user(employee_number=f'000{i}', email=f'u{i}@example.com', password='password', last_name=f'社員{i}')
+            for i in range(1, 4)
+        ]
+
+    def test_bulk_fan_out_and_cached_type(self):
+        # 通知タイプはコミット後にレジストリへ保存される
+        self.addCleanup(services.clear_type_cache)
+        with self.captureOnCommitCallbacks(execute=True):
+            services.notify(self.users, 'お知らせ', '本文', type_code='info')
+        with self.captureOnCommitCallbacks(execute=True):
+            services.get_type_id('info')
+        # 2回目以降はタイプを検索せず、3人分を1回の INSERT で作成する
+        with self.assertNumQueries(4):  # ID取得 + SAVEPOINT/INSERT/RELEASE
+            services.notify(User.objects.filter(pk__in=[u.pk for u in self.users]), 'お知らせ2', '本文')
+        self.assertEqual(Notification.objects.count(), 6)
+        self.assertEqual(NotificationTypeMaster.objects.get(code='info').name, 'お知らせ')
+
+    def test_unread_counter_is_cached(self):
+        user = self.users[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            services.notify(user, 'A', '本文')
+        self.assertEqual(services.unread_count(user), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            services.notify(user, 'B', '本文')
+        with self.assertNumQueries(0):
+            self.assertEqual(services.unread_count(user), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(services.mark_read(user), 2)
+        self.assertEqual(services.unread_count(user), 0)
+
+        self.client.login(employee_number='0001', password='password')
+        with self.captureOnCommitCallbacks(execute=True):
+            services.notify(user, 'C', '本文')
+        response = self.client.get(reverse('notifications_index'))
+        self.assertEqual(response.context['unread_notification_count'], 1)
+
+    def test_consultation_messages_collapse_into_one_notification(self):
+        requester, respondent = self.users[:2]
+        consultation = Consultation.objects.create(title='VPN', requester=requester, respondent=respondent)
+        for text in ('1', '2', '3'):
+            post_consultation_message(consultation, requester, text)
+
+        notification = Notification.objects.get(recipient=respondent)
+        self.assertEqual(notification.repeat_count, 3)
+
+        # 既読後のメッセージは新しい通知になる
+        services.mark_read(respondent)
+        post_consultation_message(consultation, requester, '4')
+        self.assertEqual(Notification.objects.filter(recipient=respondent).count(), 2)
+        self.assertFalse(Notification.objects.filter(recipient=requester).exists())
+
+
+@override_settings(NOTIFICATION_POLL_INTERVAL=0.05)
+class NotificationLiveTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        services.clear_type_cache()
+        self.user = User.objects.create_user(employee_number='0001', email='u@example.com', password='password')
+        self.client.login(employee_number='0001', password='password')
+
+    def test_paginated_list_and_bulk_mark_read(self):
+        for i in range(5):
+            services.notify(self.user, f'通知{i}', '本文')
+        url = reverse('api_notifications')
+        first = self.client.get(url, {'limit': 3}).json()
+        self.assertEqual([n['title'] for n in first['notifications']], ['通知4', '通知3', '通知2'])
+        second = self.client.get(url, {'limit': 3, 'cursor': first['next_cursor']}).json()
+        self.assertEqual([n['title'] for n in second['notifications']], ['通知1', '通知0'])
+        self.assertIsNone(second['next_cursor'])
+
+        ids = [n['id'] for n in first['notifications']]
+        read_url = reverse('api_notifications_read')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(read_url, json.dumps({'ids': ids}), content_type='application/json')
+        self.assertEqual(response.json()['updated'], 3)
+        self.assertEqual(response.json()['unread_count'], 2)
+        unread = self.client.get(url, {'unread': '1'}).json()
+        self.assertEqual(len(unread['notifications']), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(read_url, json.dumps({'all': True}), content_type='application/json')
+        self.assertEqual((response.json()['updated'], response.json()['unread_count']), (2, 0))
+
+    def test_stream_pushes_new_notifications(self):
+        def create():
+            with self.captureOnCommitCallbacks(execute=True):
+                services.notify(self.user, '新着', '本文')
+
+        async def scenario():
+            stream = live.event_stream(self.user.pk, duration=5)
+            events = [await stream.__anext__()]
+            await sync_to_async(create)()
+            events.append(await stream.__anext__())
+            events.append(await stream.__anext__())
+            await stream.aclose()
+            return events
+
+        unread, notification, unread_after = async_to_sync(scenario)()
+        self.assertIn('event: unread', unread)
+        self.assertIn('"count": 0', unread)
+        self.assertIn('event: notification', notification)
+        self.assertIn('"title": "新着"', notification)
+        self.assertIn('"count": 1', unread_after)
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """
+    テスト用の最小限の SMTP サーバ（接続数と受信したメールを記録する）
+    """
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply('220 localhost ready')
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode(errors='replace').strip()
+            if not line:
+                return
+            command = line.split(' ', 1)[0].upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif command == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                address = line.split(':', 1)[1].strip().strip('<>')
+                if address in server.reject:
+                    self.reply('550 no such user')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 end with .')
+                while self.rfile.readline().strip() != b'.':
+                    pass
+                server.received.extend(recipients)
+                self.reply('250 OK')
+            elif command == 'RSET':
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.connections = 0
+        self.received = []
+        self.reject = set()
+
+
+class EmailOutboxTest(TestCase):
+    def setUp(self):
+        self.smtp = FakeSMTPServer()
+        threading.Thread(target=self.smtp.serve_forever, daemon=True).start()
+        self.addCleanup(self.smtp.server_close)
+        self.addCleanup(self.smtp.shutdown)
+        self.enterContext(override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.smtp.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+            DEFAULT_FROM_EMAIL='noreply@example.com',
+            EMAIL_OUTBOX_BACKGROUND=False,
+            EMAIL_OUTBOX_RATE_PER_MINUTE=0,
+            EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+        ))
+
+    def test_batch_reuses_one_connection_and_retries_failures(self):
+        self.smtp.reject.add('bad@example.com')
+        for i in range(5):
+            outbox.queue_email('件名', '本文', [f'user{i}@example.com'])
+        bad = outbox.queue_email('件名', '本文', ['bad@example.com'])
+        self.assertEqual(self.smtp.connections, 0)
+
+        self.assertEqual(outbox.deliver_batch(), 6)
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(sorted(self.smtp.received), [f'user{i}@example.com' for i in range(5)])
+
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), ('queued', 1))
+        self.assertGreater(bad.run_after, timezone.now())
+        stats = outbox.metrics()
+        self.assertEqual((stats['sent'], stats['queued'], stats['failed']), (5, 1, 0))
+        self.assertIsNotNone(stats['avg_send_ms'])
+
+        # バックオフ中は送らない。期限後の再送で最大試行回数に達したら failed
+        self.assertEqual(outbox.deliver_batch(), 0)
+        EmailOutbox.objects.filter(pk=bad.pk).update(run_after=timezone.now())
+        outbox.deliver_batch()
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), ('failed', 2))
+        self.assertIn('550', bad.last_error)
+
+    def test_stale_sending_rows_are_requeued(self):
+        item = outbox.queue_email('件名', '本文', ['user@example.com'])
+        # 送信中のままワーカーが落ちたメールは、次のバッチで送信待ちに戻して送る
+        EmailOutbox.objects.filter(pk=item.pk).update(
+            status='sending', locked_at=timezone.now() - outbox.STALE_AFTER - timedelta(minutes=1),
+        )
+        self.assertEqual(outbox.deliver_batch(), 1)
+        item.refresh_from_db()
+        self.assertEqual(item.status, 'sent')
+        self.assertEqual(self.smtp.received, ['user@example.com'])
+
+    def test_unreachable_server_requeues_batch(self):
+        item = outbox.queue_email('件名', '本文', ['user@example.com'])
+        with override_settings(EMAIL_PORT=1):
+            self.assertEqual(outbox.deliver_batch(), 1)
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.attempts), ('queued', 1))
@@ -3,4 +3,8 @@ from . import views
 
 urlpatterns = [
     path('', views.index, name='notifications_index'),
+    path('api/', views.api_list, name='api_notifications'),
+    path('api/read/', views.api_mark_read, name='api_notifications_read'),
+    path('api/poll/', views.api_poll, name='api_notifications_poll'),
+    path('stream/', views.notification_stream, name='notifications_stream'),
 ]
@@ -1,9 +1,118 @@
+import json
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_POST
 
+from chat.pagination import decode_cursor, page_before
+from llm.streaming import sse_response
+from . import live, services
 from .models import Notification
 
+PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+LONG_POLL_SECONDS = 25
+
+
+def notification_page(user, cursor=None, limit=PAGE_SIZE, unread_only=False):
+    """
+    通知のキーセットページ（新しい順）と、次のページのカーソル
+    """
+    queryset = Notification.objects.filter(recipient=user).select_related('notification_type')
+    if unread_only:
+        queryset = queryset.filter(is_read=False)
+    rows, next_cursor = page_before(queryset, cursor, limit)
+    return rows[::-1], next_cursor
+
+
 @login_required
 def index(request):
-    notifications = Notification.objects.filter(recipient=request.user).select_related('notification_type').order_by('-created_at')
-    return render(request, 'notifications/index.html', {'notifications': notifications})
+    notifications, next_cursor = notification_page(request.user)
+    return render(request, 'notifications/index.html', {
+        'notifications': notifications,
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+def api_list(request):
+    """
+    通知一覧API
+    - cursor: 前回の next_cursor（省略時は最新から）
+    - limit: 件数（最大 MAX_PAGE_SIZE）
+    - unread=1: 未読のみ
+    """
+    cursor = request.GET.get('cursor') or None
+    try:
+        limit = min(int(request.GET.get('limit') or PAGE_SIZE), MAX_PAGE_SIZE)
+        if cursor:
+            decode_cursor(cursor)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'パラメータが不正です'}, status=400)
+    if limit < 1:
+        return JsonResponse({'status': 'error', 'message': 'パラメータが不正です'}, status=400)
+
+    rows, next_cursor = notification_page(request.user, cursor, limit, request.GET.get('unread') == '1')
+    return JsonResponse({
+        'notifications': [live.serialize(n) for n in rows],
+        'next_cursor': next_cursor,
+        'unread_count': services.unread_count(request.user),
+    })
+
+
+@login_required
+@require_POST
+def api_mark_read(request):
+    """
+    既読API（一括）
+    JSON: {"ids": [1, 2, ...]} または {"all": true}
+    """
+    try:
+        data = json.loads(request.body or '{}')
+        ids = None if data.get('all') else [int(pk) for pk in data.get('ids', [])]
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'status': 'error', 'message': 'パラメータが不正です'}, status=400)
+
+    updated = services.mark_read(request.user, ids) if ids is None or ids else 0
+    return JsonResponse({'status': 'success', 'updated': updated, 'unread_count': services.unread_count(request.user)})
+
+
+@login_required
+async def notification_stream(request):
+    """
+    新着通知・未読件数のライブ配信（SSE）
+    """
+    user = await request.auser()
+    return sse_response(live.event_stream(user.pk))
+
+
+@login_required
+async def api_poll(request):
+    """
+    ロングポーリング（SSE が使えない環境向け）
+    - since: 前回応答の since（ISO形式）
+    - stamp: 前回応答の stamp
+    変更があるか LONG_POLL_SECONDS 経過するまで応答を保留する。
+    返す通知は前回分と重なることがあるので、クライアント側で id ごとに上書きする。
+    """
+    user = await request.auser()
+    since = parse_datetime(request.GET.get('since') or '')
+    if since is None:
+        return JsonResponse({'status': 'error', 'message': 'since が不正です'}, status=400)
+
+    stamp = await sync_to_async(services.current_stamp)(user.pk)
+    if request.GET.get('stamp') == str(stamp):
+        changed = await live.wait_for_change(user.pk, stamp, LONG_POLL_SECONDS)
+        if changed is not None:
+            stamp = changed
+    rows = await sync_to_async(live.recent_notifications)(user.pk, since)
+    unread = await sync_to_async(services.unread_count)(user.pk)
+    return JsonResponse({
+        'notifications': [live.serialize(n) for n in rows],
+        'since': max([n.created_at for n in rows], default=since).isoformat(),
+        'stamp': str(stamp),
+        'unread_count': unread,
+    })
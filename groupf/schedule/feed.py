@@ -0,0 +1,165 @@
+"""
+カレンダー(FullCalendar)に表示するイベントの取得・変換
+
+- 表示範囲と「重なる」予定を取得する（start_at < 範囲終了 AND end_at > 範囲開始）
+  範囲より前に始まる複数日の予定も表示される。(user, start_at, end_at) の複合インデックスを使う
+- 面談は担当上司・対象部下・状態をまとめて取得し、1件ごとの追加問い合わせをしない
+- ETag は表示対象の件数と最終更新日時から作る（変更が無ければ 304 を返し、本体を作らない）
+"""
+import datetime
+import hashlib
+
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from interviews.models import Interview
+from .models import ScheduleEvent
+
+# 終了日時が未設定の面談の長さ
+DEFAULT_INTERVIEW_DURATION = datetime.timedelta(hours=1)
+
+COLOR_PERSONAL = '#dc3545'  # red
+COLOR_WORK = '#3788d8'  # blue
+COLOR_MASKED = '#6c757d'  # grey
+
+# 面談の状態ごとの色 (背景色, 文字色)
+INTERVIEW_COLORS = {
+    'tentative': ('#ffc107', 'black'),  # yellow
+    'confirmed': ('#198754', 'white'),  # green
+    'completed': ('#6c757d', 'white'),  # grey
+}
+INTERVIEW_DEFAULT_COLOR = ('#0d6efd', 'white')
+
+
+def parse_bound(value):
+    """
+    FullCalendar の start / end パラメータ（ISO 8601 の日時 or 日付）を aware な datetime にする
+    不正な値は ValueError
+    """
+    if not value:
+        return None
+    # URL の + がスペースに変換されて届く場合がある（タイムゾーンの +09:00）
+    value = value.strip().replace(' ', '+')
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'invalid datetime: {value}')
+        parsed = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def schedule_events_in(user_ids, start=None, end=None):
+    """
+    表示範囲と重なる ScheduleEvent
+    """
+    queryset = ScheduleEvent.objects.filter(user_id__in=user_ids)
+    if end is not None:
+        queryset = queryset.filter(start_at__lt=end)
+    if start is not None:
+        queryset = queryset.filter(end_at__gt=start)
+    return queryset
+
+
+def interviews_in(user_ids, start=None, end=None):
+    """
+    表示範囲と重なる面談（user_ids が担当上司 or 対象部下）
+    終了日時が未設定の面談は DEFAULT_INTERVIEW_DURATION で終わるものとして扱う
+    """
+    queryset = Interview.objects.filter(Q(manager_id__in=user_ids) | Q(employee_id__in=user_ids))
+    if end is not None:
+        queryset = queryset.filter(scheduled_at__lt=end)
+    if start is not None:
+        queryset = queryset.filter(
+            Q(end_at__gt=start)
+            | Q(end_at__isnull=True, scheduled_at__gt=start - DEFAULT_INTERVIEW_DURATION)
+        )
+    return queryset
+
+
+def interview_end(interview):
+    return interview.end_at or interview.scheduled_at + DEFAULT_INTERVIEW_DURATION
+
+
+def feed_etag(viewer, target, start, end):
+    """
+    閲覧者・表示対象・範囲ごとの ETag
+    予定の追加・変更は最終更新日時、削除は件数の変化で検出する
+    """
+    parts = [viewer.pk, target.pk, start.isoformat() if start else '', end.isoformat() if end else '']
+    for queryset in (schedule_events_in([target.pk], start, end), interviews_in([target.pk], start, end)):
+        stats = queryset.aggregate(count=Count('id'), latest=Max('updated_at'))
+        parts += [stats['count'], stats['latest'].isoformat() if stats['latest'] else '']
+    digest = hashlib.sha1('|'.join(str(p) for p in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def _serialize_event(event, is_me):
+    title = event.title
+    description = event.description
+    color = COLOR_PERSONAL if event.category == 'personal' else COLOR_WORK
+
+    # 他人の予定は詳細を隠す
+    if not is_me:
+        description = ""
+        if event.category == 'personal':
+            title = "不在"
+        elif event.category == 'work':
+            title, color = "予定あり", COLOR_MASKED
+
+    return {
+        'title': title,
+        'description': description,
+        'start': event.start_at.isoformat(),
+        'end': event.end_at.isoformat(),
+        'color': color,
+        'extendedProps': {
+            'category': event.category
+        }
+    }
+
+
+def _serialize_interview(interview, viewer_id, target_id, is_me):
+    # 面談の当事者、または自分自身の予定として見る場合は詳細を表示する
+    is_party = viewer_id in (interview.manager_id, interview.employee_id)
+    if is_party or is_me:
+        partner = interview.employee if interview.manager_id == target_id else interview.manager
+        title = f"面談: {interview.theme}"
+        description = f"相手: {partner.last_name}\n場所: {interview.location}"
+        status_code = interview.status.code if interview.status else None
+        color, text_color = INTERVIEW_COLORS.get(status_code, INTERVIEW_DEFAULT_COLOR)
+    else:
+        # 無関係な他人が見る場合 -> マスキング
+        title = "予定あり"
+        description = ""
+        color, text_color = COLOR_MASKED, 'white'
+
+    return {
+        'title': title,
+        'description': description,
+        'start': interview.scheduled_at.isoformat(),
+        'end': interview_end(interview).isoformat(),
+        'color': color,
+        'textColor': text_color,
+    }
+
+
+def build_events(viewer, target, start, end):
+    """
+    FullCalendar 用のイベントのリスト（問い合わせは予定・面談の2回）
+    """
+    is_me = viewer.pk == target.pk
+    events = [
+        _serialize_event(event, is_me)
+        for event in schedule_events_in([target.pk], start, end).order_by('start_at', 'id')
+    ]
+    interviews = (
+        interviews_in([target.pk], start, end)
+        .select_related('manager', 'employee', 'status')
+        .order_by('scheduled_at', 'id')
+    )
+    events += [_serialize_interview(interview, viewer.pk, target.pk, is_me) for interview in interviews]
+    return events
@@ -0,0 +1,162 @@
+"""
+複数ユーザーの空き時間（free/busy）の計算
+
+- 予定(ScheduleEvent)と面談(Interview)を全員分まとめて取得する（ユーザー数によらず問い合わせは2回）
+- 取得した区間を開始時刻順に並べ、1回の走査で重なり・隣接を結合する（スイープライン）
+- 結合した「誰かが予定あり」の区間を勤務時間から除いたものが全員の空き時間
+- 空き時間から指定の長さの候補枠を作り、面談作成画面で日時の候補として表示する
+
+予定の内容（タイトル等）は返さないので、他人の非公開予定も区間としてだけ扱われる。
+"""
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from .feed import DEFAULT_INTERVIEW_DURATION, interviews_in, schedule_events_in
+
+DEFAULT_SLOT_STEP = datetime.timedelta(minutes=30)
+DEFAULT_SLOT_LIMIT = 20
+
+
+def _working_hours():
+    # (開始時, 終了時) 例: (9, 18)
+    return getattr(settings, 'SCHEDULE_WORKING_HOURS', (9, 18))
+
+
+def _working_days():
+    # 曜日（月曜 = 0）
+    return getattr(settings, 'SCHEDULE_WORKING_DAYS', (0, 1, 2, 3, 4))
+
+
+def busy_intervals(user_ids, start, end):
+    """
+    user_ids の予定・面談の区間を (ユーザーID, 開始, 終了) のリストで返す
+    """
+    user_ids = list(user_ids)
+    members = set(user_ids)
+    intervals = [
+        (user_id, max(s, start), min(e, end))
+        for user_id, s, e in schedule_events_in(user_ids, start, end).values_list('user_id', 'start_at', 'end_at')
+    ]
+    rows = interviews_in(user_ids, start, end).values_list('manager_id', 'employee_id', 'scheduled_at', 'end_at')
+    for manager_id, employee_id, s, e in rows:
+        e = e or s + DEFAULT_INTERVIEW_DURATION
+        for user_id in {manager_id, employee_id} & members:
+            intervals.append((user_id, max(s, start), min(e, end)))
+    return [interval for interval in intervals if interval[1] < interval[2]]
+
+
+def merge_intervals(intervals):
+    """
+    (開始, 終了) の区間のリストを、重なり・隣接を結合した開始順のリストにする
+    """
+    merged = []
+    for s, e in sorted(intervals):
+        if merged and s <= merged[-1][1]:
+            if e > merged[-1][1]:
+                merged[-1][1] = e
+        else:
+            merged.append([s, e])
+    return [(s, e) for s, e in merged]
+
+
+def working_windows(start, end):
+    """
+    start〜end の範囲の勤務時間帯（ローカル時刻の勤務日・勤務時間）
+    """
+    begin_hour, end_hour = _working_hours()
+    days = _working_days()
+    day = timezone.localtime(start).date()
+    last = timezone.localtime(end).date()
+    tz = timezone.get_current_timezone()
+    while day <= last:
+        if day.weekday() in days:
+            s = datetime.datetime.combine(day, datetime.time(begin_hour), tzinfo=tz)
+            e = datetime.datetime.combine(day, datetime.time(0), tzinfo=tz) + datetime.timedelta(hours=end_hour)
+            s, e = max(s, start), min(e, end)
+            if s < e:
+                yield s, e
+        day += datetime.timedelta(days=1)
+
+
+def subtract(windows, busy):
+    """
+    windows（開始順）から busy（結合済み・開始順）を除いた区間
+    """
+    free = []
+    index = 0
+    for s, e in windows:
+        # この枠より前に終わる予定は以降の枠にも関係しない
+        while index < len(busy) and busy[index][1] <= s:
+            index += 1
+        cursor = s
+        i = index
+        while i < len(busy) and busy[i][0] < e:
+            if busy[i][0] > cursor:
+                free.append((cursor, busy[i][0]))
+            cursor = max(cursor, busy[i][1])
+            i += 1
+        if cursor < e:
+            free.append((cursor, e))
+    return free
+
+
+def _align(value, step):
+    # 区切りのよい時刻（step 単位）に切り上げる
+    local = timezone.localtime(value)
+    midnight = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    offset = (local - midnight) % step
+    return local if not offset else local + (step - offset)
+
+
+def slots(free, duration, step=DEFAULT_SLOT_STEP, limit=DEFAULT_SLOT_LIMIT):
+    """
+    空き時間から duration の長さの候補枠を step 間隔で作る
+    """
+    result = []
+    for s, e in free:
+        cursor = _align(s, step)
+        while cursor + duration <= e:
+            result.append((cursor, cursor + duration))
+            if len(result) >= limit:
+                return result
+            cursor += step
+    return result
+
+
+class FreeBusy:
+    """
+    user_ids 全員の start〜end の free/busy
+    """
+
+    def __init__(self, user_ids, start, end):
+        self.user_ids = list(dict.fromkeys(user_ids))
+        self.start = start
+        self.end = end
+        intervals = busy_intervals(self.user_ids, start, end)
+
+        per_user = {user_id: [] for user_id in self.user_ids}
+        for user_id, s, e in intervals:
+            per_user[user_id].append((s, e))
+        self.busy_by_user = {user_id: merge_intervals(items) for user_id, items in per_user.items()}
+        # 誰か1人でも予定がある時間（全員分を1回で結合）
+        self.busy = merge_intervals((s, e) for _, s, e in intervals)
+        self.free = subtract(list(working_windows(start, end)), self.busy)
+
+    def slots(self, duration, step=DEFAULT_SLOT_STEP, limit=DEFAULT_SLOT_LIMIT):
+        return slots(self.free, duration, step, limit)
+
+    def as_dict(self, duration=None, step=DEFAULT_SLOT_STEP, limit=DEFAULT_SLOT_LIMIT):
+        def pairs(items):
+            return [{'start': s.isoformat(), 'end': e.isoformat()} for s, e in items]
+
+        data = {
+            'start': self.start.isoformat(),
+            'end': self.end.isoformat(),
+            'busy': {str(user_id): pairs(items) for user_id, items in self.busy_by_user.items()},
+            'free': pairs(self.free),
+        }
+        if duration:
+            data['slots'] = pairs(self.slots(duration, step, limit))
+        return data
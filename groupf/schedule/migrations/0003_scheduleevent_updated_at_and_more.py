@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0002_scheduleevent_category'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduleevent',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='更新日時'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleevent',
+            index=models.Index(fields=['user', 'start_at', 'end_at'], name='schedule_user_range_idx'),
+        ),
+    ]
@@ -46,9 +46,16 @@ class ScheduleEvent(models.Model):
     
     is_private = models.BooleanField(default=False, verbose_name="非公開")
 
+    # カレンダー表示の ETag 用（feed.py）
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+
     def __str__(self):
         return f"{self.title} ({self.user})"
 
     class Meta:
         verbose_name = "スケジュール"
         verbose_name_plural = "スケジュール"
+        indexes = [
+            # 表示範囲と重なる予定の検索（start_at < 範囲終了 AND end_at > 範囲開始）
+            models.Index(fields=['user', 'start_at', 'end_at'], name='schedule_user_range_idx'),
+        ]
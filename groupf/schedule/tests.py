@@ -1,3 +1,125 @@
+from datetime import datetime, timedelta
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from interviews.models import Interview, InterviewStatusMaster
+from .freebusy import FreeBusy, merge_intervals
+from .models import ScheduleEvent
+
+
+class CalendarFeedTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('1001', 'me@example.com', 'pass', last_name='自分')
+        self.other = User.objects.create_user('1002', 'other@example.com', 'pass', last_name='同僚')
+        self.confirmed = InterviewStatusMaster.objects.create(code='confirmed', name='確定')
+        self.client.login(employee_number='1001', password='pass')
+        self.window_start = timezone.make_aware(datetime(2026, 3, 1))
+        self.url = reverse('schedule_get_events')
+        self.params = {'user_id': self.user.pk, 'start': '2026-03-01T00:00:00+09:00', 'end': '2026-04-12T00:00:00+09:00'}
+
+    def _event(self, title, start, hours, **extra):
+        return ScheduleEvent.objects.create(
+            user=self.user, title=title, start_at=start, end_at=start + timedelta(hours=hours), **extra
+        )
+
+    def test_overlapping_events_are_included(self):
+        # 表示範囲より前に始まり、範囲内に終わる複数日の予定
+        self._event('出張', self.window_start - timedelta(days=2), 72)
+        self._event('範囲外', self.window_start - timedelta(days=5), 2)
+        for i in range(3):
+            Interview.objects.create(
+                manager=self.user, employee=self.other, status=self.confirmed, theme=f'面談{i}',
+                scheduled_at=self.window_start + timedelta(days=i + 1),
+            )
+
+        # セッション・ユーザー + ETag 用の集計2回 + 予定・面談の本体2回（面談ごとの追加問い合わせなし）
+        with self.assertNumQueries(2 + 4):
+            response = self.client.get(self.url, self.params)
+        titles = [e['title'] for e in response.json()]
+        self.assertIn('出張', titles)
+        self.assertNotIn('範囲外', titles)
+        self.assertEqual(titles.count('面談: 面談0'), 1)
+        self.assertEqual(len(titles), 4)
+
+    def test_other_users_events_are_masked(self):
+        self._event('通院', self.window_start + timedelta(days=1), 2, category='personal')
+        self.client.login(employee_number='1002', password='pass')
+        events = self.client.get(self.url, self.params).json()
+        self.assertEqual(events[0]['title'], '不在')
+        self.assertEqual(events[0]['description'], '')
+
+    def test_not_modified_until_changed(self):
+        event = self._event('会議', self.window_start + timedelta(days=1), 1)
+        response = self.client.get(self.url, self.params)
+        etag = response['ETag']
+
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        event.title = '定例会議'
+        event.save()
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # 削除も検出する
+        etag = response['ETag']
+        event.delete()
+        response = self.client.get(self.url, self.params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+
+    def test_invalid_range(self):
+        response = self.client.get(self.url, {'start': 'yesterday', 'end': 'today'})
+        self.assertEqual(response.status_code, 400)
+
+
+class FreeBusyTest(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user('2001', 'manager@example.com', 'pass')
+        self.members = User.objects.bulk_create(
+            [User(employee_number=f'3{i:03d}', email=f'member{i}@example.com') for i in range(30)]
+        )
+        # 2026-03-02 は月曜日
+        self.day = timezone.make_aware(datetime(2026, 3, 2))
+        self.client.login(employee_number='2001', password='pass')
+
+    def _at(self, hour, minute=0, days=0):
+        return self.day + timedelta(days=days, hours=hour, minutes=minute)
+
+    def test_merge_intervals(self):
+        merged = merge_intervals([(5, 7), (1, 3), (2, 4), (4, 5), (9, 10)])
+        self.assertEqual(merged, [(1, 7), (9, 10)])
+
+    def test_common_free_slots(self):
+        ScheduleEvent.objects.create(user=self.manager, title='会議', start_at=self._at(9), end_at=self._at(11))
+        # 前日から続く予定も重なりとして扱う
+        ScheduleEvent.objects.create(
+            user=self.members[0], title='出張', start_at=self._at(20, days=-1), end_at=self._at(12)
+        )
+        Interview.objects.create(manager=self.manager, employee=self.members[1], scheduled_at=self._at(13))
+
+        result = FreeBusy([self.manager.pk, self.members[0].pk], self._at(0), self._at(0, days=1))
+        self.assertEqual(result.busy, [(self._at(0), self._at(12)), (self._at(13), self._at(14))])
+        self.assertEqual(result.free, [(self._at(12), self._at(13)), (self._at(14), self._at(18))])
+        slots = result.slots(timedelta(hours=1), limit=3)
+        self.assertEqual([s for s, _ in slots], [self._at(12), self._at(14), self._at(14, 30)])
+
+    def test_api_query_count_is_fixed(self):
+        for i, member in enumerate(self.members):
+            ScheduleEvent.objects.create(user=member, title='作業', start_at=self._at(9 + i % 8), end_at=self._at(10 + i % 8))
+            Interview.objects.create(manager=self.manager, employee=member, scheduled_at=self._at(9 + i % 8, days=1))
+        users = ','.join(str(u.pk) for u in [self.manager] + self.members)
 
-# Create your tests here.
+        # セッション・ユーザー + 対象ユーザーの確認 + 予定・面談の2回
+        with self.assertNumQueries(2 + 1 + 2):
+            response = self.client.get(reverse('schedule_freebusy'), {
+                'users': users, 'start': self._at(0).isoformat(), 'end': self._at(0, days=5).isoformat(), 'duration': 60,
+            })
+        data = response.json()
+        self.assertEqual(len(data['busy']), 31)
+        # 1日目・2日目は 9:00-17:00 が誰かの予定で埋まっている
+        self.assertEqual(data['slots'][0]['start'], self._at(17).isoformat())
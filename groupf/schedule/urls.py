@@ -4,5 +4,6 @@ from . import views
 urlpatterns = [
     path('', views.index, name='schedule_index'),
     path('events/', views.get_events, name='schedule_get_events'),
+    path('api/freebusy/', views.api_freebusy, name='schedule_freebusy'),
     path('add/', views.add_event, name='schedule_add_event'),
 ]
@@ -5,15 +5,20 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
-from django.db.models import Q
 from django.views.decorators.http import require_POST
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.conf import settings
 from .models import ScheduleEvent
-from interviews.models import Interview
+from . import feed, freebusy
 from accounts.models import User
+from groupf.querybudget import query_budget
 import json
 import datetime
 
+# 空き時間APIで指定できる期間の上限（日）
+FREEBUSY_MAX_DAYS = 62
+
 @login_required
 def index(request):
     """
@@ -23,117 +28,66 @@ def index(request):
     return render(request, 'schedule/index.html', {'users': users})
 
 @login_required
+@query_budget(queries=10)
 def get_events(request):
     """
     FullCalendar用イベントデータ取得API
+    表示範囲と重なる予定を返す。内容が変わっていなければ 304 を返す（feed.py）
     """
     target_user_id = request.GET.get('user_id')
     
-    if target_user_id:
+    if target_user_id and str(target_user_id) != str(request.user.pk):
         target_user = get_object_or_404(User, pk=target_user_id)
     else:
         target_user = request.user
-        
-    start_str = request.GET.get('start')
-    end_str = request.GET.get('end')
-    
-    # URLパラメータの+がスペースに変換される問題への対処
-    if start_str and ' ' in start_str:
-        start_str = start_str.replace(' ', '+')
-    if end_str and ' ' in end_str:
-        end_str = end_str.replace(' ', '+')
-    
-    events = []
-    
-    # helper: 閲覧制限ロジック
-    is_me = (target_user == request.user)
-    
-    # 1. ScheduleEvent (その他の予定)
-    schedule_events = ScheduleEvent.objects.filter(user=target_user)
-    if start_str and end_str:
-        schedule_events = schedule_events.filter(start_at__range=(start_str, end_str))
-        
-    for event in schedule_events:
-        title = event.title
-        description = event.description
-        color = '#3788d8' # default blue
-        
-        # マスキング処理
-        if not is_me:
-            # 他人の場合
-            description = "" # 詳細は隠す
-            
-            if event.category == 'personal':
-                title = "不在"
-                color = '#dc3545' # red
-            elif event.category == 'work':
-                title = "予定あり"
-                color = '#6c757d' # grey
-        else:
-            # 自分の場合
-            if event.category == 'personal':
-                color = '#dc3545'
-            elif event.category == 'work':
-                color = '#3788d8'
 
-        events.append({
-            'title': title,
-            'description': description,
-            'start': event.start_at.isoformat(),
-            'end': event.end_at.isoformat(),
-            'color': color,
-            'extendedProps': {
-                'category': event.category
-            }
-        })
+    try:
+        start = feed.parse_bound(request.GET.get('start'))
+        end = feed.parse_bound(request.GET.get('end'))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': '表示期間の指定が正しくありません'}, status=400)
 
-    # 2. Interviews (面談)
-    # target_user が manager または employee になっている面談
-    interviews = Interview.objects.filter(
-        Q(manager=target_user) | Q(employee=target_user)
-    )
-    if start_str and end_str:
-        interviews = interviews.filter(scheduled_at__range=(start_str, end_str))
-        
-    for interview in interviews:
-        # 面談の当事者かどうか
-        is_party = (request.user == interview.manager or request.user == interview.employee)
-        
-        if is_party or is_me: # 自分自身の予定として見る場合も詳細は見える（is_meは上で判定済みだが念の為）
-            # 詳細表示
-            title = f"面談: {interview.theme}"
-            description = f"相手: {interview.employee.last_name if interview.manager == target_user else interview.manager.last_name}\n場所: {interview.location}"
-            
-            # ステータスごとの色
-            if interview.status and interview.status.code == 'tentative':
-                color = '#ffc107' # yellow
-                textColor = 'black'
-            elif interview.status and interview.status.code == 'confirmed':
-                color = '#198754' # green
-                textColor = 'white'
-            elif interview.status and interview.status.code == 'completed':
-                color = '#6c757d' # grey
-                textColor = 'white'
-            else:
-                color = '#0d6efd'
-                textColor = 'white'
-        else:
-            # 無関係な他人が見る場合 -> マスキング
-            title = "予定あり"
-            description = ""
-            color = '#6c757d' # grey
-            textColor = 'white'
+    etag = feed.feed_etag(request.user, target_user, start, end)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(feed.build_events(request.user, target_user, start, end), safe=False)
+    response['ETag'] = etag
+    # ブラウザのキャッシュは毎回 ETag で確認させる
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
-        events.append({
-            'title': title,
-            'description': description,
-            'start': interview.scheduled_at.isoformat(),
-            'end': interview.end_at.isoformat() if interview.end_at else (interview.scheduled_at + datetime.timedelta(hours=1)).isoformat(),
-            'color': color,
-            'textColor': textColor,
-        })
-        
-    return JsonResponse(events, safe=False)
+@login_required
+def api_freebusy(request):
+    """
+    複数ユーザーの空き時間API（freebusy.py）
+    GET パラメータ:
+      users: ユーザーIDのカンマ区切り（省略時は自分）
+      start / end: 期間（省略時は現在から SCHEDULE_FREEBUSY_DEFAULT_DAYS 日間）
+      duration: 候補枠の長さ（分）、step: 候補枠の間隔（分）、limit: 候補枠の最大件数
+    """
+    try:
+        user_ids = [int(v) for v in request.GET.get('users', '').split(',') if v.strip()] or [request.user.pk]
+        start = feed.parse_bound(request.GET.get('start')) or timezone.now()
+        end = feed.parse_bound(request.GET.get('end')) or start + datetime.timedelta(
+            days=getattr(settings, 'SCHEDULE_FREEBUSY_DEFAULT_DAYS', 14)
+        )
+        duration = datetime.timedelta(minutes=int(request.GET.get('duration', 60)))
+        step = datetime.timedelta(minutes=int(request.GET.get('step', 30)))
+        limit = min(int(request.GET.get('limit', freebusy.DEFAULT_SLOT_LIMIT)), 100)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'パラメータが正しくありません'}, status=400)
+
+    if len(user_ids) > getattr(settings, 'SCHEDULE_FREEBUSY_MAX_USERS', 100):
+        return JsonResponse({'status': 'error', 'message': '一度に指定できるユーザー数を超えています'}, status=400)
+    if not start < end or end - start > datetime.timedelta(days=FREEBUSY_MAX_DAYS):
+        return JsonResponse({'status': 'error', 'message': f'期間は{FREEBUSY_MAX_DAYS}日以内で指定してください'}, status=400)
+    if duration <= datetime.timedelta(0) or step <= datetime.timedelta(0):
+        return JsonResponse({'status': 'error', 'message': 'パラメータが正しくありません'}, status=400)
+
+    # 在籍中のユーザーだけを対象にする
+    user_ids = list(User.objects.filter(pk__in=user_ids, is_active=True).values_list('pk', flat=True))
+    result = freebusy.FreeBusy(user_ids, start, end)
+    return JsonResponse(result.as_dict(duration, step, limit))
 
 @login_required
 @require_POST
@@ -0,0 +1,207 @@
+"""
+統一検索（top_page / consultation_list_view）の全文検索索引
+
+SQLite では SearchDocument を外部コンテンツとする FTS5 仮想テーブル(search_fts)を
+trigram トークナイザで作成している（日本語も分かち書きなしで部分一致検索できる）。
+trigram は3文字未満の語を検索できないため、短い検索語と SQLite 以外のDBでは
+SearchDocument への部分一致検索にフォールバックする。
+"""
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import SearchDocument
+
+FTS_TABLE = 'search_fts'
+MIN_FTS_QUERY_LENGTH = 3
+SNIPPET_TOKENS = 24
+SNIPPET_CHARS = 60
+MAX_RESULTS = 100
+# 添付ファイルの抽出テキストを索引に含める上限（マニュアル1件あたり）
+MAX_FILE_TEXT_CHARS = 500_000
+
+# snippet() の強調マーカー（HTMLエスケープ後に <mark> へ置換する）
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+
+class HitList(list):
+    """
+    検索結果リスト（テンプレートの {{ results.count }} を QuerySet と同様に使えるようにする）
+    """
+    def count(self):
+        return len(self)
+
+
+# ==========================================
+# 索引の更新
+# ==========================================
+
+def manual_document_body(manual):
+    """
+    説明文 + 抽出済み添付ファイルの本文
+    """
+    parts = [manual.description or '']
+    texts = manual.files.filter(extraction_status='done').order_by('pk').values_list('extracted_text', flat=True)
+    remaining = MAX_FILE_TEXT_CHARS
+    for text in texts:
+        if remaining <= 0:
+            break
+        parts.append(text[:remaining])
+        remaining -= len(text)
+    return '\n'.join(part for part in parts if part)
+
+
+def index_manual(manual):
+    if manual.is_deleted:
+        remove_document('manual', manual.pk)
+        return
+    SearchDocument.objects.update_or_create(
+        kind='manual', object_id=manual.pk,
+        defaults={'title': manual.title, 'body': manual_document_body(manual)},
+    )
+
+
+def index_question(question):
+    SearchDocument.objects.update_or_create(
+        kind='question', object_id=question.pk,
+        defaults={
+            'title': question.title,
+            'body': f"{question.problem_summary}\n{question.solution_summary}",
+        },
+    )
+
+
+def remove_document(kind, object_id):
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def rebuild_index():
+    """
+    全ドキュメントを作り直す（rebuild_search_index コマンドから呼ばれる）
+    """
+    from manuals.models import Manual
+    from consultations.models import Question
+
+    SearchDocument.objects.all().delete()
+    for manual in Manual.objects.filter(is_deleted=False).iterator():
+        index_manual(manual)
+    for question in Question.objects.iterator():
+        index_question(question)
+
+    if fts_available():
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
+
+    return SearchDocument.objects.count()
+
+
+# ==========================================
+# 検索
+# ==========================================
+
+_fts_tables = {}
+
+
+def fts_available():
+    # FTS5 テーブルの有無はDBごとに1回だけ確認する
+    if connection.vendor != 'sqlite':
+        return False
+    name = str(connection.settings_dict['NAME'])
+    if not _fts_tables.get(name):
+        _fts_tables[name] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_tables[name]
+
+
+def _fts_query(terms):
+    # 各語をフレーズとして AND 検索（ダブルクォートはエスケープ）
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def _highlight(text):
+    return mark_safe(
+        escape(text).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+    )
+
+
+def _fts_hits(terms, limit):
+    sql = f"""
+        SELECT d.kind, d.object_id,
+               snippet({FTS_TABLE}, -1, %s, %s, '…', %s) AS snippet
+        FROM {FTS_TABLE}
+        JOIN {SearchDocument._meta.db_table} d ON d.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH %s
+        ORDER BY bm25({FTS_TABLE}, 10.0, 1.0)
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [_MARK_START, _MARK_END, SNIPPET_TOKENS, _fts_query(terms), limit])
+        return [(kind, object_id, _highlight(snippet)) for kind, object_id, snippet in cursor.fetchall()]
+
+
+def _make_snippet(text, term):
+    pos = text.lower().find(term.lower())
+    if pos < 0:
+        return _highlight(text[:SNIPPET_CHARS])
+    start = max(pos - SNIPPET_CHARS // 2, 0)
+    end = pos + len(term) + SNIPPET_CHARS // 2
+    fragment = (
+        ('…' if start > 0 else '') + text[start:pos]
+        + _MARK_START + text[pos:pos + len(term)] + _MARK_END
+        + text[pos + len(term):end] + ('…' if end < len(text) else '')
+    )
+    return _highlight(fragment)
+
+
+def _like_hits(terms, limit):
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(body__icontains=term)
+
+    # タイトル一致を優先
+    documents = (
+        SearchDocument.objects.filter(condition)
+        .annotate(title_rank=Case(When(title__icontains=terms[0], then=Value(0)), default=Value(1), output_field=IntegerField()))
+        .order_by('title_rank', '-updated_at')[:limit]
+    )
+    return [(d.kind, d.object_id, _make_snippet(d.body, terms[0])) for d in documents]
+
+
+def search(query, limit=MAX_RESULTS):
+    """
+    マニュアル・ナレッジを関連度順に検索する
+
+    戻り値は従来と同じ {'manuals', 'questions', 'count'} 形式。
+    各オブジェクトには search_snippet（強調表示付きの抜粋）を付与する。
+    """
+    from manuals.models import Manual
+    from consultations.models import Question
+
+    terms = (query or '').split()
+    manuals, questions = HitList(), HitList()
+    if not terms:
+        return {'manuals': manuals, 'questions': questions, 'count': 0}
+
+    if fts_available() and all(len(term) >= MIN_FTS_QUERY_LENGTH for term in terms):
+        hits = _fts_hits(terms, limit)
+    else:
+        hits = _like_hits(terms, limit)
+
+    manual_ids = [object_id for kind, object_id, _ in hits if kind == 'manual']
+    question_ids = [object_id for kind, object_id, _ in hits if kind == 'question']
+    manual_map = Manual.objects.filter(is_deleted=False).select_related('status', 'visibility').in_bulk(manual_ids)
+    question_map = Question.objects.select_related('source_consultation').in_bulk(question_ids)
+
+    for kind, object_id, snippet in hits:
+        obj = (manual_map if kind == 'manual' else question_map).get(object_id)
+        if obj is None:
+            continue
+        obj.search_snippet = snippet
+        (manuals if kind == 'manual' else questions).append(obj)
+
+    return {
+        'manuals': manuals,
+        'questions': questions,
+        'count': len(manuals) + len(questions),
+    }
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from search.index import rebuild_index, fts_available
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index for manuals and knowledge questions.'
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        backend = 'FTS5 (trigram)' if fts_available() else 'LIKE fallback'
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} documents ({backend})."))
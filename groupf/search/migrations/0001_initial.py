@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('manual', 'マニュアル'), ('question', 'ナレッジ')], max_length=20, verbose_name='種類')),
+                ('object_id', models.IntegerField(verbose_name='対象ID')),
+                ('title', models.CharField(max_length=200, verbose_name='タイトル')),
+                ('body', models.TextField(blank=True, verbose_name='本文')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+            ],
+            options={
+                'verbose_name': '検索ドキュメント',
+                'verbose_name_plural': '検索ドキュメント',
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+    ]
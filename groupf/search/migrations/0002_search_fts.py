@@ -0,0 +1,79 @@
+from django.db import migrations
+
+FTS_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+        title, body,
+        content='search_searchdocument', content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_searchdocument_ai AFTER INSERT ON search_searchdocument BEGIN
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_searchdocument_ad AFTER DELETE ON search_searchdocument BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_searchdocument_au AFTER UPDATE ON search_searchdocument BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS search_searchdocument_au",
+    "DROP TRIGGER IF EXISTS search_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS search_searchdocument_ai",
+    "DROP TABLE IF EXISTS search_fts",
+]
+
+
+def create_fts(apps, schema_editor):
+    # FTS5 は SQLite 専用。他のDBでは SearchDocument への部分一致検索で動作する
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in FTS_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+def populate_documents(apps, schema_editor):
+    SearchDocument = apps.get_model('search', 'SearchDocument')
+    Manual = apps.get_model('manuals', 'Manual')
+    Question = apps.get_model('consultations', 'Question')
+
+    documents = [
+        SearchDocument(kind='manual', object_id=m.pk, title=m.title, body=m.description or '')
+        for m in Manual.objects.filter(is_deleted=False)
+    ]
+    documents += [
+        SearchDocument(kind='question', object_id=q.pk, title=q.title, body=f"{q.problem_summary}\n{q.solution_summary}")
+        for q in Question.objects.all()
+    ]
+    SearchDocument.objects.bulk_create(documents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+        ('manuals', '0003_alter_manual_file'),
+        ('consultations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+        migrations.RunPython(populate_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+from django.db import models
+
+# ==========================================
+# メインモデル定義
+# ==========================================
+
+class SearchDocument(models.Model):
+    """
+    統一検索（マニュアル・ナレッジ）用の検索ドキュメント
+    SQLite では FTS5(trigram) の外部コンテンツテーブルとして使用し、トリガーで索引を同期する
+    """
+    KIND_CHOICES = [
+        ('manual', 'マニュアル'),
+        ('question', 'ナレッジ'),
+    ]
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="種類")
+    object_id = models.IntegerField(verbose_name="対象ID")
+    title = models.CharField(max_length=200, verbose_name="タイトル")
+    body = models.TextField(blank=True, verbose_name="本文")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
+
+    class Meta:
+        verbose_name = "検索ドキュメント"
+        verbose_name_plural = "検索ドキュメント"
+        unique_together = ('kind', 'object_id')
@@ -0,0 +1,50 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from manuals.models import Manual, ManualFile
+from consultations.models import Question
+from .index import index_manual, index_question, remove_document
+
+
+# マニュアル: 作成・承認・編集・論理削除のたびに索引を更新
+@receiver(post_save, sender=Manual)
+def manual_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_manual(instance)
+
+
+@receiver(post_delete, sender=Manual)
+def manual_deleted(sender, instance, **kwargs):
+    remove_document('manual', instance.pk)
+
+
+# 添付ファイル: 本文抽出の完了・削除時にマニュアルの索引を更新
+@receiver(post_save, sender=ManualFile)
+def manual_file_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    # アップロード直後（抽出前）は本文が変わらないので更新しない
+    if update_fields is None or 'extracted_text' not in update_fields:
+        return
+    index_manual(instance.manual)
+
+
+@receiver(post_delete, sender=ManualFile)
+def manual_file_deleted(sender, instance, **kwargs):
+    manual = Manual.objects.filter(pk=instance.manual_id).first()
+    if manual is not None:
+        index_manual(manual)
+
+
+# ナレッジ: consultation_resolve での作成・管理画面での編集
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_question(instance)
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, **kwargs):
+    remove_document('question', instance.pk)
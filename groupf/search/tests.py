@@ -0,0 +1,95 @@
+import io
+import tempfile
+import zipfile
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from manuals.models import Manual, ManualFile
+from manuals.extraction import extract_manual_file, process_files
+from consultations.models import Question
+from .index import search, fts_available
+
+User = get_user_model()
+
+
+class UnifiedSearchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            employee_number='0001', email='user@example.com', password='password',
+            last_name='社員', first_name='一郎',
+        )
+
+    def test_index_follows_saves_and_ranks_title_first(self):
+        body_hit = Manual.objects.create(title='経費のまとめ', description='経費精算システムの使い方', created_by=self.user)
+        title_hit = Manual.objects.create(title='経費精算システム手順書', description='', created_by=self.user)
+        question = Question.objects.create(
+            title='交通費', problem_summary='経費精算システムに入れない', solution_summary='再ログイン',
+        )
+
+        self.assertTrue(fts_available())
+        results = search('経費精算システム')
+        self.assertEqual(list(results['manuals']), [title_hit, body_hit])
+        self.assertEqual(list(results['questions']), [question])
+        self.assertEqual(results['count'], 3)
+        self.assertIn('<mark>', results['manuals'][1].search_snippet)
+
+        body_hit.is_deleted = True
+        body_hit.save()
+        question.delete()
+        results = search('経費精算システム')
+        self.assertEqual(list(results['manuals']), [title_hit])
+        self.assertEqual(results['questions'].count(), 0)
+
+    def test_short_query_falls_back_to_partial_match(self):
+        manual = Manual.objects.create(title='経理の基本', description='<b>伝票</b>の書き方', created_by=self.user)
+        results = search('伝票')
+        self.assertEqual(list(results['manuals']), [manual])
+        self.assertNotIn('<b>', results['manuals'][0].search_snippet)
+
+
+class ManualFileExtractionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            employee_number='0001', email='user@example.com', password='password',
+            last_name='社員', first_name='一郎',
+        )
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _docx(self, text):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as z:
+            z.writestr(
+                'word/document.xml',
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f'<w:body><w:p><w:r><w:t>{text}</w:t></w:r></w:p></w:body></w:document>',
+            )
+        return buffer.getvalue()
+
+    def test_extracted_file_text_is_searchable_and_skipped_when_unchanged(self):
+        manual = Manual.objects.create(title='手順書', description='', created_by=self.user)
+        docx = ManualFile.objects.create(
+            manual=manual, file=SimpleUploadedFile('guide.docx', self._docx('請求書発行フロー')), original_name='guide.docx',
+        )
+        image = ManualFile.objects.create(
+            manual=manual, file=SimpleUploadedFile('photo.png', b'\x89PNG'), original_name='photo.png',
+        )
+        self.assertEqual(list(search('請求書発行')['manuals']), [])
+
+        self.assertEqual(process_files(), 2)
+        docx.refresh_from_db()
+        image.refresh_from_db()
+        self.assertEqual(docx.extraction_status, 'done')
+        self.assertEqual(image.extraction_status, 'unsupported')
+        self.assertEqual(list(search('請求書発行')['manuals']), [manual])
+
+        # 内容が変わらなければ再抽出しない
+        self.assertFalse(extract_manual_file(docx))
+
+        docx.delete()
+        self.assertEqual(list(search('請求書発行')['manuals']), [])
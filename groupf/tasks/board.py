@@ -0,0 +1,158 @@
+"""
+タスクボード(task_board_page)の表示データ
+
+- 表示対象のタスクを1回の問い合わせで取得する（担当者・完了者・タグはまとめて prefetch）
+- 列（状態）ごとの件数上限は ROW_NUMBER() OVER (PARTITION BY 状態) で絞り込み、
+  Python で4つの列に振り分ける
+- 「もっと見る」は列ごとの (due_date, id) のキーセットページング
+- changes(): 指定日時以降に更新されたタスクだけを返し、画面を作り直さずにカードを差し替える
+"""
+import base64
+import binascii
+from datetime import timedelta
+
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts import masters
+from .models import Task, TaskStatusMaster
+
+# (状態コード, 見出し)
+COLUMNS = (
+    ('unstarted', '未着手'),
+    ('in_progress', '着手中'),
+    ('pending_review', '確認待ち'),
+    ('completed', '完了'),
+)
+COLUMN_LIMIT = 20
+# 完了列に表示する期間
+COMPLETED_VISIBLE_DAYS = 7
+# 更新の取りこぼし（コミット順と updated_at の前後）を防ぐための読み直し幅
+CHANGES_OVERLAP = timedelta(seconds=5)
+
+
+def encode_cursor(task):
+    raw = f"{task.due_date.isoformat()}_{task.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    カーソル文字列を (due_date, id) に戻す（不正な値は ValueError）
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        due_date, pk = raw.rsplit('_', 1)
+        due_date = parse_datetime(due_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError('invalid cursor') from e
+    if due_date is None:
+        raise ValueError('invalid cursor')
+    return due_date, pk
+
+
+def _status_ids():
+    # 状態コード -> ID（マスタレジストリから。問い合わせなし）
+    return {code: masters.get_id(TaskStatusMaster, code) for code, _ in COLUMNS}
+
+
+def visible_tasks(user):
+    """
+    ボードに表示するタスク（依頼タスクのうち未完了、または直近 COMPLETED_VISIBLE_DAYS 日に完了したもの）
+    """
+    status_ids = _status_ids()
+    active_ids = [status_ids[code] for code, _ in COLUMNS if code != 'completed' and status_ids[code]]
+    recent = timezone.now() - timedelta(days=COMPLETED_VISIBLE_DAYS)
+
+    condition = Q(status_id__in=active_ids)
+    if status_ids['completed']:
+        condition |= Q(status_id=status_ids['completed'], completed_at__gte=recent)
+    tasks = Task.objects.filter(condition)
+    if user.department_id:
+        tasks = tasks.filter(requested_by__department_id=user.department_id)
+    # パターンA: Board shows only requests
+    return tasks.filter(task_type__code='request')
+
+
+def _with_related(queryset):
+    return queryset.select_related('requested_by', 'status', 'task_type').prefetch_related(
+        'assigned_users', 'completed_users', 'tags'
+    )
+
+
+def build_board(user, limit=COLUMN_LIMIT):
+    """
+    列ごとに先頭 limit 件のタスクを取得する
+    戻り値: [{'code', 'title', 'tasks', 'next_cursor'}]（COLUMNS の順）
+    """
+    status_ids = _status_ids()
+    ranked = visible_tasks(user).annotate(
+        column_row=Window(RowNumber(), partition_by=F('status_id'), order_by=[F('due_date').asc(), F('id').asc()])
+    )
+    rows = _with_related(ranked.filter(column_row__lte=limit + 1).order_by('due_date', 'id'))
+
+    by_status = {status_id: [] for status_id in status_ids.values()}
+    for task in rows:
+        by_status.setdefault(task.status_id, []).append(task)
+
+    columns = []
+    for code, title in COLUMNS:
+        tasks = by_status.get(status_ids[code], [])
+        has_more = len(tasks) > limit
+        tasks = tasks[:limit]
+        columns.append({
+            'code': code,
+            'title': title,
+            'tasks': tasks,
+            'next_cursor': encode_cursor(tasks[-1]) if has_more else None,
+        })
+    return columns
+
+
+def column_page(user, code, cursor, limit=COLUMN_LIMIT):
+    """
+    列 code の cursor より後ろのタスク（もっと見る）
+    戻り値: (タスクのリスト, 次のカーソル or None)
+    """
+    status_id = _status_ids().get(code)
+    if status_id is None:
+        return [], None
+    due_date, pk = decode_cursor(cursor)
+    tasks = visible_tasks(user).filter(status_id=status_id).filter(
+        Q(due_date__gt=due_date) | Q(due_date=due_date, id__gt=pk)
+    )
+    rows = list(_with_related(tasks.order_by('due_date', 'id'))[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]) if has_more else None
+
+
+def column_code(task):
+    status_ids = {v: k for k, v in _status_ids().items()}
+    return status_ids.get(task.status_id)
+
+
+def changes(user, since, known_ids=()):
+    """
+    since 以降に更新されたタスク
+    戻り値: (表示対象のタスクのリスト, ボードから消えたタスクIDのリスト, 次回の since)
+    known_ids: 画面に表示中のタスクID（削除・対象外になったものを removed で返す）
+    """
+    now = timezone.now()
+    changed_ids = set(
+        Task.objects.filter(updated_at__gte=since - CHANGES_OVERLAP).values_list('id', flat=True)
+    )
+    known_ids = set(known_ids)
+    check_ids = changed_ids | known_ids
+    if not check_ids:
+        return [], [], now
+
+    visible_ids = set(visible_tasks(user).filter(pk__in=check_ids).values_list('id', flat=True))
+    updated_ids = changed_ids & visible_ids
+    updated = list(_with_related(Task.objects.filter(pk__in=updated_ids).order_by('due_date', 'id'))) if updated_ids else []
+    removed = sorted((known_ids or changed_ids) - visible_ids)
+    return updated, removed, now
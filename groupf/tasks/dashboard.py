@@ -0,0 +1,134 @@
+"""
+チームダッシュボード(top_page)の集計処理
+
+メンバーごとの集計結果は MemberDashboardSnapshot に保存しておき、
+top_page ではメンバー数に関係なく一定回数のクエリで表示データを組み立てる。
+"""
+from datetime import date
+
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Task, MemberDashboardSnapshot
+from .skills import get_skill_names
+
+DEADLINE_CATEGORIES = ('0-3日', '4-7日', '8日以上')
+
+
+def get_deadline_category(deadline, today=None):
+    """
+    期限カテゴリ判定 (JSの getDeadlineCategory とロジックを合わせる)
+    deadline は 'YYYY-MM-DD' 形式の文字列
+    """
+    if not deadline:
+        return '8日以上'
+    today = today or timezone.now().date()
+    diff = (date.fromisoformat(deadline) - today).days
+    if diff <= 3:
+        return '0-3日'
+    elif diff <= 7:
+        return '4-7日'
+    return '8日以上'
+
+
+def build_snapshot_data(user):
+    """
+    1ユーザー分の集計データを作成する
+    """
+    active_tasks = (
+        Task.objects.filter(assigned_users=user)
+        .exclude(status__code='completed')
+    )
+
+    tasks = []
+    for task in active_tasks.select_related('task_type'):
+        tasks.append({
+            'id': task.id,
+            'deadline': task.due_date.strftime('%Y-%m-%d') if task.due_date else '',
+            # 全体集計用: タスク種別が「依頼」か
+            'is_request_type': bool(task.task_type and task.task_type.code == 'request'),
+            # メンバー個別用: 他人から依頼されたものか
+            'is_requested': bool(task.requested_by_id and task.requested_by_id != user.id),
+        })
+
+    # 難易度は Task.difficulty で集計（GROUP BY 1回）。未判定の場合は「中」扱い
+    difficulty_counts = {'high': 0, 'mid': 0, 'low': 0}
+    for row in active_tasks.order_by().values('difficulty').annotate(count=Count('id')):
+        difficulty_counts[row['difficulty'] or 'mid'] += row['count']
+
+    # スキル: 完了件数の多いタグ上位3つ（UserSkill）
+    skills = get_skill_names(user, limit=3)
+
+    return {
+        'active_tasks': tasks,
+        'difficulty_counts': difficulty_counts,
+        'skills': skills,
+    }
+
+
+def refresh_member_snapshot(user):
+    data = build_snapshot_data(user)
+    snapshot, _ = MemberDashboardSnapshot.objects.update_or_create(user=user, defaults=data)
+    return snapshot
+
+
+def refresh_member_snapshots(user_ids):
+    """
+    指定ユーザーの集計データを再計算する（シグナルから呼ばれる）
+    """
+    from accounts.models import User
+
+    for user in User.objects.filter(id__in=set(user_ids)):
+        refresh_member_snapshot(user)
+
+
+def build_dashboard(members):
+    """
+    top_page 用の members データと全体統計を組み立てる
+
+    members は User の QuerySet。集計データが未作成のメンバーのみその場で作成する。
+    """
+    members = members.select_related('role', 'department', 'dashboard_snapshot')
+    today = timezone.now().date()
+
+    dashboard_data = []
+    overall_tasks = {}
+
+    for member in members:
+        try:
+            snapshot = member.dashboard_snapshot
+        except MemberDashboardSnapshot.DoesNotExist:
+            snapshot = refresh_member_snapshot(member)
+
+        own_tasks = []
+        request_tasks = []
+        for task in snapshot.active_tasks:
+            if task['is_requested']:
+                request_tasks.append({'deadline': task['deadline']})
+            else:
+                own_tasks.append({'deadline': task['deadline']})
+            # 全体集計はタスク単位（重複排除）で行う
+            overall_tasks[task['id']] = task
+
+        dashboard_data.append({
+            'id': member.id,
+            'name': f"{member.last_name} {member.first_name}",
+            'department_id': member.department_id,
+            'grade': member.role.name if member.role else "-",
+            'skills': snapshot.skills,
+            'tasks': {
+                'own': own_tasks,
+                'request': request_tasks,
+                'difficulty': snapshot.difficulty_counts,
+            }
+        })
+
+    overall_stats = {
+        'own': {cat: 0 for cat in DEADLINE_CATEGORIES},
+        'request': {cat: 0 for cat in DEADLINE_CATEGORIES},
+    }
+    for task in overall_tasks.values():
+        cat = get_deadline_category(task['deadline'], today)
+        overall_stats['request' if task['is_request_type'] else 'own'][cat] += 1
+
+    return dashboard_data, overall_stats
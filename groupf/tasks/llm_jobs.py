@@ -0,0 +1,60 @@
+"""
+タスク関連のAIジョブ（llm.jobs に登録される）
+"""
+from django.db import transaction
+
+from llm import client as llm_client
+from llm.jobs import register
+from .models import Task, Tag, detect_difficulty
+
+TAG_GENERATION_PROMPT_TEMPLATE = """
+以下のタスク名から、ハッシュタグ形式で20個以内の関連タグを生成してください。
+タグには必ず #難易度 (高、中、低) のいずれか一つを含めてください。
+
+例: 議事録の製作
+出力: #議事録 #文章作成 #ドキュメント作成 #ビジネス文書 #情報整理 #効率化 #会議 #記録 #難易度中
+
+タスク名: {task_title}
+出力:
+"""
+
+
+def generate_tags_with_gemini(task_title):
+    """
+    タスク名からハッシュタグ文字列を生成する（APIエラー時は例外を送出）
+    """
+    if not llm_client.is_available():
+        return ""
+    prompt = TAG_GENERATION_PROMPT_TEMPLATE.format(task_title=task_title)
+    # 同じタスク名はキャッシュ済みの結果を使う
+    return llm_client.chat([
+        {"role": "system", "content": "You are a helpful assistant that generates hashtags."},
+        {"role": "user", "content": prompt}
+    ])
+
+
+def parse_tag_names(generated_tags_str):
+    return [name.strip().lstrip('#') for name in (generated_tags_str or '').split() if name.strip().startswith('#')]
+
+
+@register('tasks.generate_tags')
+def generate_task_tags(payload):
+    """
+    タスク登録時のタグ自動生成: Task.tags と Task.difficulty に書き戻す
+    """
+    task = Task.objects.filter(pk=payload['task_id']).first()
+    if task is None:
+        return {'tags': []}
+
+    # AI の呼び出しはトランザクションの外で行い、結果の保存だけをまとめる
+    tag_names = parse_tag_names(generate_tags_with_gemini(task.title))
+
+    with transaction.atomic():
+        # 難易度タグ（#難易度高/中/低）を Task.difficulty に反映
+        task.difficulty = detect_difficulty(tag_names)
+        task.save(update_fields=['difficulty'])
+
+        tags = [Tag.objects.get_or_create(name=tag_name)[0] for tag_name in tag_names]
+        if tags:
+            task.tags.add(*tags)
+    return {'tags': tag_names}
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from tasks.models import Task, detect_difficulty
+from tasks.dashboard import refresh_member_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Fills Task.difficulty from the #難易度高/中/低 tags of existing tasks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recompute tasks that already have a difficulty.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        tasks = Task.objects.prefetch_related('tags').order_by('pk')
+        if not options['all']:
+            tasks = tasks.filter(difficulty__isnull=True)
+
+        batch_size = options['batch_size']
+        batch = []
+        updated = 0
+
+        for task in tasks.iterator(chunk_size=batch_size):
+            difficulty = detect_difficulty([t.name for t in task.tags.all()])
+            if difficulty != task.difficulty:
+                task.difficulty = difficulty
+                batch.append(task)
+            if len(batch) >= batch_size:
+                Task.objects.bulk_update(batch, ['difficulty'])
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            Task.objects.bulk_update(batch, ['difficulty'])
+            updated += len(batch)
+
+        # bulk_update はシグナルを発火しないため、ダッシュボード集計を作り直す
+        if updated:
+            user_ids = Task.assigned_users.through.objects.values_list('user_id', flat=True).distinct()
+            refresh_member_snapshots(user_ids)
+
+        self.stdout.write(self.style.SUCCESS(f"Updated difficulty of {updated} tasks."))
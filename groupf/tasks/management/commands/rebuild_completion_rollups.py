@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from accounts.models import Department, User
+from tasks.models import MonthlyCompletionRollup, Task
+from tasks.rollups import month_start, refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the MonthlyCompletionRollup table from Task.completed_at.'
+
+    def handle(self, *args, **options):
+        months = {
+            month_start(value)
+            for value in Task.objects.filter(completed_at__isnull=False).values_list('completed_at', flat=True).iterator()
+        }
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        department_ids = list(Department.objects.values_list('pk', flat=True))
+
+        with transaction.atomic():
+            MonthlyCompletionRollup.objects.all().delete()
+            refresh_rollups(months, user_ids, department_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {MonthlyCompletionRollup.objects.count()} rollup rows for {len(months)} months."
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from accounts.models import User
+from tasks.dashboard import refresh_member_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-member team dashboard snapshots used by top_page.'
+
+    def handle(self, *args, **options):
+        count = 0
+        for user in User.objects.filter(is_active=True).iterator():
+            refresh_member_snapshot(user)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} dashboard snapshots."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from accounts.models import User
+from tasks.models import UserSkill
+from tasks.skills import refresh_user_skills
+from tasks.dashboard import refresh_member_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the UserSkill table from completed tasks and their tags.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--skip-snapshots', action='store_true', help='Do not refresh dashboard snapshots afterwards.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+
+        with transaction.atomic():
+            UserSkill.objects.all().delete()
+            for i in range(0, len(user_ids), batch_size):
+                refresh_user_skills(user_ids[i:i + batch_size])
+
+        if not options['skip_snapshots']:
+            refresh_member_snapshots(user_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {UserSkill.objects.count()} skills for {len(user_ids)} users."
+        ))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberDashboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('active_tasks', models.JSONField(default=list, verbose_name='進行中タスク')),
+                ('difficulty_counts', models.JSONField(default=dict, verbose_name='難易度別件数')),
+                ('skills', models.JSONField(default=list, verbose_name='上位スキル')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_snapshot', to=settings.AUTH_USER_MODEL, verbose_name='対象ユーザー')),
+            ],
+            options={
+                'verbose_name': 'ダッシュボード集計',
+                'verbose_name_plural': 'ダッシュボード集計',
+            },
+        ),
+    ]
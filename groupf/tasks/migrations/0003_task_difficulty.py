@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0002_memberdashboardsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='difficulty',
+            field=models.CharField(blank=True, choices=[('high', '高'), ('mid', '中'), ('low', '低')], db_index=True, max_length=10, null=True, verbose_name='難易度'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_task_difficulty'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completion_count', models.PositiveIntegerField(default=0, verbose_name='完了件数')),
+                ('last_completed_at', models.DateTimeField(blank=True, null=True, verbose_name='最終完了日時')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_skills', to='tasks.tag', verbose_name='タグ')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skills', to=settings.AUTH_USER_MODEL, verbose_name='ユーザー')),
+            ],
+            options={
+                'verbose_name': 'ユーザースキル',
+                'verbose_name_plural': 'ユーザースキル',
+                'ordering': ['-completion_count', '-last_completed_at', 'tag__name'],
+                'indexes': [models.Index(fields=['user', '-completion_count', '-last_completed_at'], name='userskill_rank_idx')],
+                'unique_together': {('user', 'tag')},
+            },
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.8 on 2026-10-18 16:17
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_completion(apps, schema_editor):
+    """
+    既存の完了タスクは updated_at を完了日時とみなし、月次完了集計を作る
+    """
+    Task = apps.get_model('tasks', 'Task')
+    Rollup = apps.get_model('tasks', 'MonthlyCompletionRollup')
+    completed = Task.objects.filter(status__code='completed')
+    completed.filter(completed_at__isnull=True).update(completed_at=models.F('updated_at'))
+
+    tasks = {
+        row['id']: row
+        for row in completed.values('id', 'completed_at', 'task_type_id', 'requested_by__department_id')
+    }
+    by_user, by_department = Counter(), Counter()
+    for row in tasks.values():
+        month = timezone.localtime(row['completed_at']).date().replace(day=1)
+        row['month'] = month
+        if row['requested_by__department_id']:
+            by_department[(month, row['requested_by__department_id'], row['task_type_id'])] += 1
+    through = Task.completed_users.through.objects.filter(task_id__in=list(tasks))
+    for task_id, user_id in through.values_list('task_id', 'user_id'):
+        row = tasks[task_id]
+        by_user[(row['month'], user_id, row['task_type_id'])] += 1
+
+    Rollup.objects.bulk_create(
+        [Rollup(month=m, user_id=u, task_type_id=t, completed_count=n) for (m, u, t), n in by_user.items()]
+        + [Rollup(month=m, department_id=d, task_type_id=t, completed_count=n) for (m, d, t), n in by_department.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_userimportjob'),
+        ('tasks', '0004_userskill'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyCompletionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(verbose_name='対象月')),
+                ('completed_count', models.PositiveIntegerField(default=0, verbose_name='完了件数')),
+            ],
+            options={
+                'verbose_name': '月次完了集計',
+                'verbose_name_plural': '月次完了集計',
+            },
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='完了日時'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'completed_at'], name='task_status_completed_idx'),
+        ),
+        migrations.AddField(
+            model_name='monthlycompletionrollup',
+            name='department',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='completion_rollups', to='accounts.department', verbose_name='部署'),
+        ),
+        migrations.AddField(
+            model_name='monthlycompletionrollup',
+            name='task_type',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='tasks.tasktypemaster', verbose_name='タスク種別'),
+        ),
+        migrations.AddField(
+            model_name='monthlycompletionrollup',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='completion_rollups', to=settings.AUTH_USER_MODEL, verbose_name='完了者'),
+        ),
+        migrations.AddIndex(
+            model_name='monthlycompletionrollup',
+            index=models.Index(fields=['user', 'month'], name='rollup_user_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monthlycompletionrollup',
+            index=models.Index(fields=['department', 'month'], name='rollup_dept_month_idx'),
+        ),
+        migrations.RunPython(backfill_completion, migrations.RunPython.noop),
+    ]
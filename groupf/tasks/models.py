@@ -54,10 +54,34 @@ class Tag(models.Model):
         ordering = ['name']
 
 
+def detect_difficulty(tag_names):
+    """
+    タグ名（#難易度高 / #難易度中 / #難易度低）から難易度コードを判定する。
+    判定できない場合は None
+    """
+    difficulty_tags = [t for t in tag_names if '難易度' in t]
+    if any('高' in t for t in difficulty_tags):
+        return 'high'
+    if any('中' in t for t in difficulty_tags):
+        return 'mid'
+    if any('低' in t for t in difficulty_tags):
+        return 'low'
+    return None
+
+
 class Task(models.Model):
+    DIFFICULTY_CHOICES = [
+        ('high', '高'),
+        ('mid', '中'),
+        ('low', '低'),
+    ]
+
     title = models.CharField(max_length=200, verbose_name="タスク名")
     due_date = models.DateTimeField(verbose_name="期限")
     tags = models.ManyToManyField(Tag, blank=True, related_name='tasks', verbose_name="タグ")
+
+    # AI生成タグ（#難易度高/中/低）から設定。未判定の場合は NULL
+    difficulty = models.CharField(max_length=10, choices=DIFFICULTY_CHOICES, null=True, blank=True, db_index=True, verbose_name="難易度")
     
     # ★修正: CHOICESをForeignKeyに変更
     status = models.ForeignKey(TaskStatusMaster, on_delete=models.PROTECT, null=True, verbose_name="タスク状態")
@@ -85,6 +109,15 @@ class Task(models.Model):
     notes = models.TextField(blank=True, verbose_name="タスク備考欄")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="作成日時")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+    # 「完了」になった日時（完了後の編集では変わらない。月次集計は rollups.py）
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name="完了日時")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # 完了日時の変更前の月も集計し直すため、読み込んだ時点の値を控えておく
+        instance._loaded_completed_at = instance.__dict__.get('completed_at')
+        return instance
 
     def __str__(self):
         return self.title
@@ -93,3 +126,80 @@ class Task(models.Model):
         verbose_name = "タスク"
         verbose_name_plural = "タスク"
         ordering = ['due_date', 'status']
+        indexes = [
+            # 月次の完了タスク（status = 完了 AND completed_at が月の範囲内）
+            models.Index(fields=['status', 'completed_at'], name='task_status_completed_idx'),
+            # タスクボードの差分取得（updated_at >= 前回の取得日時）
+            models.Index(fields=['updated_at'], name='task_updated_at_idx'),
+        ]
+
+
+class MemberDashboardSnapshot(models.Model):
+    """
+    チームダッシュボード(top_page)用のメンバー別集計データ
+    Task / Tag の変更時にシグナルで再計算し、表示時は読み出すだけにする
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='dashboard_snapshot', verbose_name="対象ユーザー")
+
+    # 進行中タスクの一覧 [{'id', 'deadline', 'is_request_type', 'is_requested'}]
+    # 期限カテゴリ(0-3日など)は日付とともに変わるため、表示時に deadline から判定する
+    active_tasks = models.JSONField(default=list, verbose_name="進行中タスク")
+    difficulty_counts = models.JSONField(default=dict, verbose_name="難易度別件数")
+    skills = models.JSONField(default=list, verbose_name="上位スキル")
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+
+    def __str__(self):
+        return f"ダッシュボード集計: {self.user}"
+
+    class Meta:
+        verbose_name = "ダッシュボード集計"
+        verbose_name_plural = "ダッシュボード集計"
+
+
+class UserSkill(models.Model):
+    """
+    ユーザー別スキル（完了タスクのタグを集計した非正規化テーブル）
+    Task.completed_users / Task.tags の変更時にシグナルで更新する
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='skills', verbose_name="ユーザー")
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='user_skills', verbose_name="タグ")
+    completion_count = models.PositiveIntegerField(default=0, verbose_name="完了件数")
+    last_completed_at = models.DateTimeField(null=True, blank=True, verbose_name="最終完了日時")
+
+    def __str__(self):
+        return f"{self.user} - {self.tag} ({self.completion_count})"
+
+    class Meta:
+        verbose_name = "ユーザースキル"
+        verbose_name_plural = "ユーザースキル"
+        unique_together = ('user', 'tag')
+        ordering = ['-completion_count', '-last_completed_at', 'tag__name']
+        indexes = [
+            models.Index(fields=['user', '-completion_count', '-last_completed_at'], name='userskill_rank_idx'),
+        ]
+
+
+class MonthlyCompletionRollup(models.Model):
+    """
+    月次の完了タスク件数（completed_at の月・タスク種別ごと）
+    - user: 完了者（Task.completed_users）ごとの件数
+    - department: 依頼者の部署ごとの件数
+    タスクの完了・完了者の変更時にシグナルで該当月を数え直す（rollups.py）
+    """
+    month = models.DateField(verbose_name="対象月")  # 月初日
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name='completion_rollups', verbose_name="完了者")
+    department = models.ForeignKey('accounts.Department', on_delete=models.CASCADE, null=True, blank=True, related_name='completion_rollups', verbose_name="部署")
+    task_type = models.ForeignKey(TaskTypeMaster, on_delete=models.CASCADE, null=True, blank=True, verbose_name="タスク種別")
+    completed_count = models.PositiveIntegerField(default=0, verbose_name="完了件数")
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.user or self.department}: {self.completed_count}"
+
+    class Meta:
+        verbose_name = "月次完了集計"
+        verbose_name_plural = "月次完了集計"
+        indexes = [
+            models.Index(fields=['user', 'month'], name='rollup_user_month_idx'),
+            models.Index(fields=['department', 'month'], name='rollup_dept_month_idx'),
+        ]
@@ -0,0 +1,70 @@
+"""
+タスク割り当て画面(api_recommend_users)の担当者レコメンド
+
+各候補者の「タグ一致数」と「現在の負荷(着手中タスク数)」をサブクエリで集計し、
+並び替え・ページングまでDB側で行う。
+"""
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from accounts.models import User
+from .models import Task, UserSkill
+
+
+def _count_subquery(queryset, group_field, count_field):
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(group_field).annotate(c=Count(count_field, distinct=True)).values('c')[:1],
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def recommend_users(task=None, name_keyword='', department_id=None, offset=0, limit=None):
+    """
+    担当者候補を (-match_count, current_load) の順で返す
+
+    戻り値: (候補者リスト, 総件数)
+    """
+    users = User.objects.filter(is_active=True).select_related('department')
+
+    if name_keyword:
+        users = users.filter(
+            Q(last_name__icontains=name_keyword) |
+            Q(first_name__icontains=name_keyword)
+        )
+    if department_id:
+        users = users.filter(department_id=department_id)
+
+    # 現在の負荷: 着手中タスク数
+    load = _count_subquery(
+        Task.assigned_users.through.objects.filter(user_id=OuterRef('pk'), task__status__code='in_progress'),
+        'user_id', 'task_id',
+    )
+    users = users.annotate(current_load=load)
+
+    # タグ一致数: 対象タスクのタグのうち、完了済みタスクで経験しているタグの数（UserSkill）
+    target_tag_ids = list(task.tags.values_list('id', flat=True)) if task else []
+    if target_tag_ids:
+        match = _count_subquery(
+            UserSkill.objects.filter(user_id=OuterRef('pk'), tag_id__in=target_tag_ids),
+            'user_id', 'tag_id',
+        )
+    else:
+        match = Value(0, output_field=IntegerField())
+    users = users.annotate(match_count=match)
+
+    # 同点の場合は従来通り登録順(ID順)
+    users = users.order_by('-match_count', 'current_load', 'pk')
+
+    total = users.count() if limit is not None else None
+    if limit is not None:
+        users = users[offset:offset + limit]
+    elif offset:
+        users = users[offset:]
+
+    candidates = list(users)
+    if total is None:
+        total = offset + len(candidates)
+    return candidates, total
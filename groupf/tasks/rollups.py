@@ -0,0 +1,103 @@
+"""
+月次の完了タスク集計(MonthlyCompletionRollup)
+
+完了月の判定は Task.completed_at で行う（updated_at は完了後の編集でも変わるため使わない）。
+- month_range(): 月の範囲（ローカル時刻の月初〜翌月初）。(status, completed_at) の索引で範囲検索できる
+- refresh_rollups(): 指定月・ユーザー・部署の件数を数え直す（シグナルから呼ばれる）
+- completed_count(): 月次の件数を集計テーブルから読む（タスク種別ごとの数行を合計するだけ）
+
+部署の件数は依頼者の現在の部署で数える。部署異動を過去の月に反映させる場合は
+rebuild_completion_rollups コマンドで作り直す。
+"""
+import datetime
+
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from accounts import masters
+from .models import MonthlyCompletionRollup, Task, TaskStatusMaster, TaskTypeMaster
+
+
+def month_start(value):
+    """
+    日時（aware）または日付の月初日
+    """
+    if isinstance(value, datetime.datetime):
+        value = timezone.localtime(value).date()
+    return value.replace(day=1)
+
+
+def month_range(year, month):
+    """
+    year 年 month 月の [開始, 終了) を aware な datetime で返す
+    """
+    tz = timezone.get_current_timezone()
+    start = datetime.datetime(year, month, 1, tzinfo=tz)
+    end = datetime.datetime(year + month // 12, month % 12 + 1, 1, tzinfo=tz)
+    return start, end
+
+
+def completed_in_month(year, month):
+    """
+    year 年 month 月に完了したタスク
+    """
+    status_id = masters.get_id(TaskStatusMaster, 'completed')
+    if status_id is None:
+        return Task.objects.none()
+    start, end = month_range(year, month)
+    return Task.objects.filter(status_id=status_id, completed_at__gte=start, completed_at__lt=end)
+
+
+def refresh_rollups(months, user_ids=(), department_ids=()):
+    """
+    months（月初日）ごとに、指定ユーザー・部署の件数を数え直す
+    """
+    user_ids = {pk for pk in user_ids if pk is not None}
+    department_ids = {pk for pk in department_ids if pk is not None}
+    if not user_ids and not department_ids:
+        return
+
+    for month in set(months):
+        completed = completed_in_month(month.year, month.month).order_by()
+        rows = []
+        if user_ids:
+            for row in (
+                completed.filter(completed_users__in=user_ids)
+                .values('completed_users', 'task_type_id')
+                .annotate(n=Count('id', distinct=True))
+            ):
+                rows.append(MonthlyCompletionRollup(
+                    month=month, user_id=row['completed_users'], task_type_id=row['task_type_id'], completed_count=row['n'],
+                ))
+            MonthlyCompletionRollup.objects.filter(month=month, user_id__in=user_ids).delete()
+        if department_ids:
+            for row in (
+                completed.filter(requested_by__department_id__in=department_ids)
+                .values('requested_by__department_id', 'task_type_id')
+                .annotate(n=Count('id'))
+            ):
+                rows.append(MonthlyCompletionRollup(
+                    month=month, department_id=row['requested_by__department_id'], task_type_id=row['task_type_id'],
+                    completed_count=row['n'],
+                ))
+            MonthlyCompletionRollup.objects.filter(month=month, department_id__in=department_ids).delete()
+        MonthlyCompletionRollup.objects.bulk_create(rows)
+
+
+def completed_count(year, month, user=None, department=None, task_type_code=None):
+    """
+    year 年 month 月の完了件数（user または department を指定）
+    """
+    rows = MonthlyCompletionRollup.objects.filter(month=datetime.date(year, month, 1))
+    if user is not None:
+        rows = rows.filter(user=user)
+    elif department is not None:
+        rows = rows.filter(department=department)
+    else:
+        raise ValueError('user か department を指定してください')
+    if task_type_code:
+        type_id = masters.get_id(TaskTypeMaster, task_type_code)
+        if type_id is None:
+            return 0
+        rows = rows.filter(task_type_id=type_id)
+    return rows.aggregate(total=Sum('completed_count'))['total'] or 0
@@ -0,0 +1,190 @@
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from accounts.models import User
+from .models import Task, Tag, detect_difficulty
+from .dashboard import refresh_member_snapshots
+from .rollups import month_start, refresh_rollups
+from .skills import refresh_user_skills
+
+
+def _task_user_ids(task_ids, include_completed=False):
+    """
+    タスクに関わるユーザーID（担当者、必要なら完了者も）を取得
+    """
+    user_ids = set(
+        Task.assigned_users.through.objects.filter(task_id__in=task_ids).values_list('user_id', flat=True)
+    )
+    if include_completed:
+        user_ids |= set(
+            Task.completed_users.through.objects.filter(task_id__in=task_ids).values_list('user_id', flat=True)
+        )
+    return user_ids
+
+
+# --- Task 本体の変更（状態・期限・種別・依頼者） ---
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    refresh_member_snapshots(_task_user_ids([instance.pk]))
+
+
+# --- 完了日時の変更（月次完了集計） ---
+def _requester_department_ids(task):
+    if not task.requested_by_id:
+        return set()
+    return set(User.objects.filter(pk=task.requested_by_id).values_list('department_id', flat=True))
+
+
+@receiver(post_save, sender=Task)
+def task_completion_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_loaded_completed_at', None)
+    if instance.completed_at == previous:
+        return
+    instance._loaded_completed_at = instance.completed_at
+    completed_user_ids = set(instance.completed_users.values_list('id', flat=True))
+    months = {month_start(value) for value in (previous, instance.completed_at) if value}
+    refresh_rollups(months, completed_user_ids, _requester_department_ids(instance))
+    # スキルの最終完了日時も完了日時から集計するため、完了者のスキルを更新する
+    refresh_user_skills(completed_user_ids, instance.tags.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Task)
+def task_pre_delete(sender, instance, **kwargs):
+    # 削除後は中間テーブルが消えるため、先に関係者を控えておく
+    instance._dashboard_user_ids = _task_user_ids([instance.pk], include_completed=True)
+    instance._skill_user_ids = set(instance.completed_users.values_list('id', flat=True))
+    instance._skill_tag_ids = set(instance.tags.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    refresh_user_skills(getattr(instance, '_skill_user_ids', ()), getattr(instance, '_skill_tag_ids', ()))
+    refresh_member_snapshots(getattr(instance, '_dashboard_user_ids', ()))
+    if instance.completed_at:
+        refresh_rollups(
+            [month_start(instance.completed_at)],
+            getattr(instance, '_skill_user_ids', ()),
+            _requester_department_ids(instance),
+        )
+
+
+# --- 担当者・完了者の変更 ---
+def _users_m2m_changed(instance, action, reverse, pk_set, field_name, refresh_skills=False):
+    if action == 'pre_clear':
+        # clear() 後は対象ユーザーが分からないため、先に控えておく
+        if reverse:
+            instance._dashboard_user_ids = {instance.pk}
+        else:
+            instance._dashboard_user_ids = set(getattr(instance, field_name).values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        # user.assigned_tasks.add(...) のような逆方向の操作
+        user_ids = {instance.pk}
+    elif action == 'post_clear':
+        user_ids = getattr(instance, '_dashboard_user_ids', set())
+    else:
+        user_ids = pk_set or set()
+
+    if refresh_skills:
+        # スキル（UserSkill）を先に更新してからダッシュボード集計を作り直す
+        if reverse:
+            refresh_user_skills(user_ids)
+        else:
+            refresh_user_skills(user_ids, instance.tags.values_list('id', flat=True))
+    refresh_member_snapshots(user_ids)
+
+
+@receiver(m2m_changed, sender=Task.assigned_users.through)
+def task_assigned_users_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _users_m2m_changed(instance, action, reverse, pk_set, 'assigned_users')
+
+
+@receiver(m2m_changed, sender=Task.completed_users.through)
+def task_completed_users_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _users_m2m_changed(instance, action, reverse, pk_set, 'completed_users', refresh_skills=True)
+
+    # 完了済みタスクの完了者が変わった場合は、その月の完了者別件数を数え直す
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        months = {
+            month_start(value)
+            for value in Task.objects.filter(pk__in=pk_set or (), completed_at__isnull=False)
+            .values_list('completed_at', flat=True)
+        }
+        refresh_rollups(months, [instance.pk])
+    elif instance.completed_at:
+        user_ids = getattr(instance, '_dashboard_user_ids', set()) if action == 'post_clear' else pk_set or set()
+        refresh_rollups([month_start(instance.completed_at)], user_ids)
+
+
+# --- タグの変更（難易度・スキルに影響） ---
+def _refresh_difficulty(tasks):
+    # #難易度高/中/低 タグから難易度を判定し直す（変わったタスクだけ保存）
+    for task in tasks:
+        difficulty = detect_difficulty(task.tags.values_list('name', flat=True))
+        if task.difficulty != difficulty:
+            task.difficulty = difficulty
+            task.save(update_fields=['difficulty'])
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+def task_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._dashboard_task_ids = set(instance.tasks.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        task_ids = [instance.pk]
+    elif action == 'post_clear':
+        task_ids = getattr(instance, '_dashboard_task_ids', set())
+    else:
+        # tag.tasks.add(...) の場合 pk_set はタスクID
+        task_ids = pk_set or set()
+
+    _refresh_difficulty([instance] if not reverse else Task.objects.filter(pk__in=task_ids))
+
+    # 完了済みユーザーのスキルを更新（対象タグのみ）
+    completed_user_ids = set(
+        Task.completed_users.through.objects.filter(task_id__in=task_ids).values_list('user_id', flat=True)
+    )
+    if reverse:
+        tag_ids = [instance.pk]
+    elif action == 'post_clear':
+        tag_ids = None
+    else:
+        tag_ids = pk_set or set()
+    refresh_user_skills(completed_user_ids, tag_ids)
+
+    refresh_member_snapshots(_task_user_ids(task_ids, include_completed=True))
+
+
+def _tag_user_ids(tag):
+    task_ids = Task.tags.through.objects.filter(tag_id=tag.pk).values_list('task_id', flat=True)
+    return _task_user_ids(list(task_ids), include_completed=True)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    refresh_member_snapshots(_tag_user_ids(instance))
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_pre_delete(sender, instance, **kwargs):
+    instance._dashboard_user_ids = _tag_user_ids(instance)
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    refresh_member_snapshots(getattr(instance, '_dashboard_user_ids', ()))
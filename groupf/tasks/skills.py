@@ -0,0 +1,75 @@
+"""
+ユーザースキル(UserSkill)の集計処理
+
+UserSkill は「完了したタスクに付いているタグ」をユーザー単位で集計したもの。
+User.get_completed_tags() の3テーブル結合を毎回行わずに、1回の索引付きクエリで
+ランキング済みのスキルを読めるようにする。
+"""
+from django.db.models import Count, Max
+
+from .models import Task, UserSkill
+
+
+def aggregate_user_skills(user_ids, tag_ids=None):
+    """
+    中間テーブルから (user_id, tag_id) ごとの完了件数・最終完了日時を集計する
+    """
+    rows = Task.tags.through.objects.filter(task__completed_users__in=user_ids)
+    if tag_ids is not None:
+        rows = rows.filter(tag_id__in=tag_ids)
+
+    return (
+        rows.order_by()
+        .values('task__completed_users', 'tag_id')
+        .annotate(count=Count('task_id', distinct=True), last=Max('task__completed_at'))
+    )
+
+
+def refresh_user_skills(user_ids, tag_ids=None):
+    """
+    指定ユーザー（必要ならタグも限定）の UserSkill を作り直す
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    if tag_ids is not None:
+        tag_ids = set(tag_ids)
+        if not tag_ids:
+            return
+
+    skills = [
+        UserSkill(
+            user_id=row['task__completed_users'],
+            tag_id=row['tag_id'],
+            completion_count=row['count'],
+            last_completed_at=row['last'],
+        )
+        for row in aggregate_user_skills(user_ids, tag_ids)
+    ]
+
+    # 完了実績がなくなったスキルを削除
+    stale = UserSkill.objects.filter(user_id__in=user_ids)
+    if tag_ids is not None:
+        stale = stale.filter(tag_id__in=tag_ids)
+    keep = {(s.user_id, s.tag_id) for s in skills}
+    stale_ids = [pk for pk, u, t in stale.values_list('pk', 'user_id', 'tag_id') if (u, t) not in keep]
+    if stale_ids:
+        UserSkill.objects.filter(pk__in=stale_ids).delete()
+
+    if skills:
+        UserSkill.objects.bulk_create(
+            skills,
+            update_conflicts=True,
+            unique_fields=['user', 'tag'],
+            update_fields=['completion_count', 'last_completed_at'],
+        )
+
+
+def get_skill_names(user, limit=None):
+    """
+    ランキング順（完了件数 → 最終完了日時）のスキル名
+    """
+    names = UserSkill.objects.filter(user=user).values_list('tag__name', flat=True)
+    if limit is not None:
+        names = names[:limit]
+    return list(names)
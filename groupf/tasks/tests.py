@@ -1,3 +1,371 @@
+import json
+from io import StringIO
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from accounts.models import RoleMaster, Department
+from accounts import masters
+from .models import Task, Tag, TaskStatusMaster, TaskTypeMaster, MemberDashboardSnapshot, MonthlyCompletionRollup, UserSkill, detect_difficulty
+from .rollups import completed_count
+from . import board
+
+User = get_user_model()
+
+
+class TopPageDashboardTest(TestCase):
+    def setUp(self):
+        self.manager_role = RoleMaster.objects.create(code='manager', name='マネージャー')
+        self.employee_role = RoleMaster.objects.create(code='employee', name='一般社員')
+        self.department = Department.objects.create(name='開発部')
+
+        self.in_progress = TaskStatusMaster.objects.create(code='in_progress', name='着手中', order=2)
+        self.completed = TaskStatusMaster.objects.create(code='completed', name='完了', order=4)
+        self.type_self = TaskTypeMaster.objects.create(code='self', name='自作')
+        self.type_request = TaskTypeMaster.objects.create(code='request', name='依頼')
+
+        self.manager = User.objects.create_user(
+            employee_number='0001', email='manager@example.com', password='password',
+            last_name='上司', first_name='太郎', role=self.manager_role, department=self.department,
+        )
+        self.client.login(employee_number='0001', password='password')
+
+    def create_member(self, number):
+        return User.objects.create_user(
+            employee_number=f'1{number:03d}', email=f'member{number}@example.com', password='password',
+            last_name='部下', first_name=str(number), role=self.employee_role, department=self.department,
+        )
+
+    def create_task(self, member, tags=(), **kwargs):
+        task = Task.objects.create(
+            title='タスク', due_date=timezone.now() + timedelta(days=1),
+            status=self.in_progress, task_type=self.type_request, requested_by=self.manager,
+            difficulty=detect_difficulty(tags), **kwargs
+        )
+        for name in tags:
+            task.tags.add(Tag.objects.get_or_create(name=name)[0])
+        task.assigned_users.add(member)
+        return task
+
+    def test_snapshot_follows_task_changes(self):
+        member = self.create_member(1)
+        task = self.create_task(member, tags=['難易度高', 'Python'])
+
+        snapshot = MemberDashboardSnapshot.objects.get(user=member)
+        self.assertEqual(snapshot.difficulty_counts, {'high': 1, 'mid': 0, 'low': 0})
+        self.assertEqual(len(snapshot.active_tasks), 1)
+
+        task.completed_users.add(member)
+        task.status = self.completed
+        task.save()
+
+        snapshot.refresh_from_db()
+        self.assertEqual(snapshot.active_tasks, [])
+        self.assertEqual(snapshot.skills, ['Python', '難易度高'])
+
+    def test_top_page_query_count_does_not_grow_with_members(self):
+        def measure():
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(reverse('top_page'))
+            self.assertEqual(response.status_code, 200)
+            return len(ctx.captured_queries), response
+
+        for i in range(3):
+            self.create_task(self.create_member(i), tags=['難易度低'])
+        measure()  # 未読件数などのキャッシュを作る
+        small, _ = measure()
+
+        for i in range(3, 15):
+            self.create_task(self.create_member(i), tags=['難易度低'])
+        large, response = measure()
+
+        self.assertEqual(small, large)
+        members = json.loads(response.context['members_json'])
+        self.assertEqual(len(members), 15)
+        overall = json.loads(response.context['overall_stats_json'])
+        self.assertEqual(overall['request']['0-3日'], 15)
+
+    def test_difficulty_follows_tag_changes(self):
+        member = self.create_member(1)
+        task = self.create_task(member, tags=['難易度低'])
+        high = Tag.objects.create(name='難易度高')
+
+        # 登録後のタグ変更（管理画面・タグ生成の再試行）でも難易度と集計が追従する
+        task.tags.add(high)
+        task.refresh_from_db()
+        self.assertEqual(task.difficulty, 'high')
+        snapshot = MemberDashboardSnapshot.objects.get(user=member)
+        self.assertEqual(snapshot.difficulty_counts, {'high': 1, 'mid': 0, 'low': 0})
+
+        high.tasks.remove(task)
+        task.refresh_from_db()
+        self.assertEqual(task.difficulty, 'low')
+
+        task.tags.clear()
+        task.refresh_from_db()
+        self.assertIsNone(task.difficulty)
+
+    def test_backfill_difficulty_from_tags(self):
+        member = self.create_member(1)
+        task = self.create_task(member, tags=['難易度低'])
+        Task.objects.filter(pk=task.pk).update(difficulty=None)
+
+        call_command('backfill_task_difficulty', stdout=StringIO())
+
+        task.refresh_from_db()
+        self.assertEqual(task.difficulty, 'low')
+        snapshot = MemberDashboardSnapshot.objects.get(user=member)
+        self.assertEqual(snapshot.difficulty_counts['low'], 1)
+
+
+class RecommendUsersTest(TestCase):
+    def setUp(self):
+        self.in_progress = TaskStatusMaster.objects.create(code='in_progress', name='着手中', order=2)
+        self.completed = TaskStatusMaster.objects.create(code='completed', name='完了', order=4)
+        self.department = Department.objects.create(name='開発部')
+        self.python = Tag.objects.create(name='Python')
+        self.sql = Tag.objects.create(name='SQL')
+
+        self.requester = User.objects.create_user(
+            employee_number='0001', email='requester@example.com', password='password',
+            last_name='依頼', first_name='者',
+        )
+        self.client.login(employee_number='0001', password='password')
+
+        self.target = Task.objects.create(title='対象', due_date=timezone.now(), status=self.in_progress)
+        self.target.tags.add(self.python, self.sql)
+
+    def create_user(self, number, skills=(), load=0, department=None):
+        user = User.objects.create_user(
+            employee_number=f'1{number:03d}', email=f'user{number}@example.com', password='password',
+            last_name='候補', first_name=str(number), department=department,
+        )
+        for tag in skills:
+            done = Task.objects.create(title='完了', due_date=timezone.now(), status=self.completed)
+            done.tags.add(tag)
+            done.completed_users.add(user)
+        for _ in range(load):
+            Task.objects.create(title='作業中', due_date=timezone.now(), status=self.in_progress).assigned_users.add(user)
+        return user
+
+    def test_ordering_and_pagination(self):
+        both_busy = self.create_user(1, skills=[self.python, self.sql], load=2)
+        both_free = self.create_user(2, skills=[self.python, self.sql, self.python], load=0)
+        one = self.create_user(3, skills=[self.sql], load=0, department=self.department)
+
+        url = reverse('api_recommend_users')
+        data = self.client.get(url, {'task_id': self.target.id}).json()
+        ranked = [u['id'] for u in data['users']]
+        self.assertEqual(ranked[:3], [both_free.id, both_busy.id, one.id])
+        self.assertEqual(data['users'][0]['match_count'], 2)
+        self.assertEqual(data['users'][1]['current_load'], 2)
+
+        page = self.client.get(url, {'task_id': self.target.id, 'limit': 1, 'offset': 1}).json()
+        self.assertEqual([u['id'] for u in page['users']], [both_busy.id])
+        self.assertTrue(page['has_more'])
+        self.assertEqual(page['total'], 4)
+
+        filtered = self.client.get(url, {'task_id': self.target.id, 'department': self.department.id}).json()
+        self.assertEqual([u['id'] for u in filtered['users']], [one.id])
+
+
+class UserSkillTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            employee_number='0001', email='user@example.com', password='password',
+            last_name='社員', first_name='一郎',
+        )
+        self.python = Tag.objects.create(name='Python')
+        self.excel = Tag.objects.create(name='Excel')
+
+    def complete(self, *tags):
+        task = Task.objects.create(title='完了', due_date=timezone.now())
+        task.tags.add(*tags)
+        task.completed_users.add(self.user)
+        return task
+
+    def test_skills_follow_completions(self):
+        self.complete(self.excel)
+        self.complete(self.python)
+        last = self.complete(self.python)
+        self.assertEqual(self.user.get_skill_names(), ['Python', 'Excel'])
+        self.assertEqual(UserSkill.objects.get(user=self.user, tag=self.python).completion_count, 2)
+
+        last.completed_users.remove(self.user)
+        last.delete()
+        self.assertEqual(UserSkill.objects.get(user=self.user, tag=self.python).completion_count, 1)
+
+        UserSkill.objects.all().delete()
+        call_command('rebuild_user_skills', stdout=StringIO())
+        self.assertEqual(set(self.user.get_skill_names()), {'Python', 'Excel'})
+
+
+class CompletionRollupTest(TestCase):
+    def setUp(self):
+        self.addCleanup(masters.clear)
+        self.department = Department.objects.create(name='開発部')
+        self.in_progress = TaskStatusMaster.objects.create(code='in_progress', name='着手中', order=2)
+        self.completed = TaskStatusMaster.objects.create(code='completed', name='完了', order=4)
+        self.type_self = TaskTypeMaster.objects.create(code='self', name='自作')
+        self.user = User.objects.create_user(
+            employee_number='0001', email='u@example.com', password='password', department=self.department,
+        )
+        self.client.login(employee_number='0001', password='password')
+
+    def _complete_task(self, title):
+        task = Task.objects.create(
+            title=title, due_date=timezone.now(), status=self.in_progress, task_type=self.type_self, requested_by=self.user,
+        )
+        task.assigned_users.add(self.user)
+        self.client.get(reverse('complete_task_by_user', args=[task.pk]))
+        task.refresh_from_db()
+        return task
+
+    def test_completion_month_is_fixed_and_rolled_up(self):
+        task = self._complete_task('月次報告')
+        self.assertEqual(task.status, self.completed)
+        self.assertIsNotNone(task.completed_at)
+        self._complete_task('議事録')
+
+        now = timezone.localtime(task.completed_at)
+        self.assertEqual(completed_count(now.year, now.month, user=self.user), 2)
+        self.assertEqual(completed_count(now.year, now.month, department=self.department, task_type_code='self'), 2)
+        self.assertEqual(completed_count(now.year, now.month, user=self.user, task_type_code='request'), 0)
+
+        # 完了後の編集では完了月は変わらない
+        Task.objects.filter(pk=task.pk).update(updated_at=task.completed_at + timedelta(days=40))
+        task.refresh_from_db()
+        task.notes = '追記'
+        task.save()
+        self.assertEqual(completed_count(now.year, now.month, user=self.user), 2)
+
+        response = self.client.get(reverse('completed_task_list'), {'month': f'{now.year}-{now.month:02d}'})
+        group = response.context['grouped_tasks'][0]
+        self.assertEqual(group['count'], 2)
+        self.assertEqual({t.title for t in group['tasks']}, {'月次報告', '議事録'})
+
+        # 削除すると件数も減る
+        task.delete()
+        self.assertEqual(completed_count(now.year, now.month, user=self.user), 1)
+
+    def test_skill_last_completed_and_manager_dashboard(self):
+        task = Task.objects.create(
+            title='集計スクリプト', due_date=timezone.now(), status=self.in_progress, task_type=self.type_self, requested_by=self.user,
+        )
+        task.tags.add(Tag.objects.create(name='Python'))
+        task.assigned_users.add(self.user)
+        self.client.get(reverse('complete_task_by_user', args=[task.pk]))
+        task.refresh_from_db()
+        # スキルの最終完了日時は、完了後の編集ではなく完了日時
+        self.assertEqual(UserSkill.objects.get(user=self.user).last_completed_at, task.completed_at)
+
+        response = self.client.get(reverse('manager_dashboard'))
+        self.assertEqual(response.context['department_completions']['total'], 1)
+        self.assertEqual(response.context['department_completions']['self'], 1)
+        self.assertContains(response, '1 件')
+
+    def test_rebuild_command(self):
+        task = self._complete_task('月次報告')
+        now = timezone.localtime(task.completed_at)
+        MonthlyCompletionRollup.objects.all().delete()
+        call_command('rebuild_completion_rollups', stdout=StringIO())
+        self.assertEqual(completed_count(now.year, now.month, user=self.user), 1)
+        self.assertEqual(completed_count(now.year, now.month, department=self.department), 1)
+
+
+class TaskBoardTest(TestCase):
+    def setUp(self):
+        self.addCleanup(masters.clear)
+        self.department = Department.objects.create(name='開発部')
+        self.statuses = {
+            code: TaskStatusMaster.objects.create(code=code, name=code, order=i)
+            for i, code in enumerate(['unstarted', 'in_progress', 'pending_review', 'completed'], start=1)
+        }
+        self.type_request = TaskTypeMaster.objects.create(code='request', name='依頼')
+        self.user = User.objects.create_user(
+            employee_number='0001', email='u@example.com', password='password', department=self.department,
+        )
+        self.client.login(employee_number='0001', password='password')
+        with self.captureOnCommitCallbacks(execute=True):
+            masters.get_id(TaskStatusMaster, 'completed')
+
+    def _task(self, title, code='unstarted', days=1):
+        task = Task.objects.create(
+            title=title, due_date=timezone.now() + timedelta(days=days), status=self.statuses[code],
+            task_type=self.type_request, requested_by=self.user,
+            completed_at=timezone.now() if code == 'completed' else None,
+        )
+        task.assigned_users.add(self.user)
+        return task
+
+    def _board_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('task_board_page'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_columns_and_query_count(self):
+        for i in range(3):
+            self._task(f'未着手{i}', 'unstarted')
+        self._task('着手中', 'in_progress')
+        self._task('完了', 'completed')
+        old = self._task('先月の完了', 'completed')
+        Task.objects.filter(pk=old.pk).update(completed_at=timezone.now() - timedelta(days=30))
+
+        queries, response = self._board_queries()
+        columns = {c['code']: [t.title for t in c['tasks']] for c in response.context['columns']}
+        self.assertEqual(columns['unstarted'], ['未着手0', '未着手1', '未着手2'])
+        self.assertEqual(columns['in_progress'], ['着手中'])
+        self.assertEqual(columns['pending_review'], [])
+        self.assertEqual(columns['completed'], ['完了'])
+
+        # タスクが増えても問い合わせ回数は変わらない
+        for i in range(5):
+            self._task(f'確認待ち{i}', 'pending_review')
+        self.assertEqual(self._board_queries()[0], queries)
+
+    def test_load_more_cursor(self):
+        for i in range(5):
+            self._task(f'未着手{i}', 'unstarted', days=i + 1)
+        column = board.build_board(self.user, limit=2)[0]
+        self.assertEqual([t.title for t in column['tasks']], ['未着手0', '未着手1'])
+
+        titles = []
+        cursor = column['next_cursor']
+        while cursor:
+            tasks, cursor = board.column_page(self.user, 'unstarted', cursor, limit=2)
+            titles += [t.title for t in tasks]
+        self.assertEqual(titles, ['未着手2', '未着手3', '未着手4'])
+
+        response = self.client.get(reverse('api_task_board_column'), {'status': 'unstarted', 'cursor': 'invalid!'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_changes(self):
+        moved = self._task('移動')
+        deleted = self._task('削除')
+        since = timezone.now()
+        self._task('新規')
+        moved.status = self.statuses['in_progress']
+        moved.save()
+        deleted_id = deleted.pk
+        deleted.delete()
+
+        response = self.client.get(reverse('api_task_board_changes'), {
+            'since': since.isoformat(), 'known': f'{moved.pk},{deleted_id}',
+        })
+        data = response.json()
+        updated = {item['id']: item['column'] for item in data['updated']}
+        self.assertEqual(updated[moved.pk], 'in_progress')
+        self.assertIn('新規', ''.join(item['html'] for item in data['updated']))
+        self.assertEqual(data['removed'], [deleted_id])
 
-# Create your tests here.
+        url = reverse('api_task_board_changes')
+        for since in ('2026-13-01T00:00:00+09:00', '2026-04-01T00:00:00', 'yesterday'):
+            with self.subTest(since=since):
+                self.assertEqual(self.client.get(url, {'since': since, 'known': ''}).status_code, 400)
@@ -14,6 +14,8 @@ urlpatterns = [
     path('management/', views.management_support_page, name='management_support_page'),
     
     path('task-board/', views.task_board_page, name='task_board_page'),
+    path('api/task-board/column/', views.api_task_board_column, name='api_task_board_column'),
+    path('api/task-board/changes/', views.api_task_board_changes, name='api_task_board_changes'),
     path('task/<int:task_id>/approve/', views.task_approve, name='task_approve'),
     
     path('task/<int:task_id>/assign/', views.assign_task_to_self, name='assign_task_to_self'),
@@ -25,6 +27,8 @@ urlpatterns = [
     path('manager/dashboard/', views.manager_dashboard_view, name='manager_dashboard'),
     path('inbox/', views.my_tasks_page, name='inbox'),
     path('management/csv-import/', views.admin_csv_import_page, name='admin_csv_import_page'),
+    path('management/csv-import/<int:job_id>/status/', views.api_csv_import_status, name='api_csv_import_status'),
+    path('management/csv-import/<int:job_id>/result/', views.admin_csv_import_result, name='admin_csv_import_result'),
     
     path('my-tasks/', views.my_tasks_page, name='my_tasks_page'),
     path('my-tasks/<int:task_id>/transfer/', views.task_transfer_page, name='task_transfer_page'),
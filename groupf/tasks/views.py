@@ -1,52 +1,33 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from django.http import JsonResponse
+from django.http import FileResponse, Http404, JsonResponse
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
 from django.utils import timezone
 from django.contrib import messages
 from django.views.decorators.http import require_POST
 import json
-from datetime import datetime, timedelta
-from openai import OpenAI
+from datetime import datetime
 import os
-from django.conf import settings
 
-from .models import Task, Tag, TaskStatusMaster, TaskTypeMaster
-from accounts.models import User
-from notifications.models import Notification, NotificationTypeMaster
-from manuals.models import Manual
-from consultations.models import Question
+from .models import Task, TaskStatusMaster, TaskTypeMaster
+from accounts import masters
+from accounts.models import User, UserImportJob
+from accounts.user_import import schedule_import
+from notifications.services import notify
 from .forms import TaskRegisterForm, CSVUploadForm
-
+from .dashboard import build_dashboard
+from .recommend import recommend_users
+from .rollups import completed_count as rollup_completed_count, completed_in_month
+from . import board
+from llm.jobs import enqueue, pending_jobs
+from groupf.querybudget import query_budget
+
+@query_budget(queries=15)
 def top_page(request):
     if not request.user.is_authenticated:
         return redirect('login')
-    
-    # --- 統一検索ロジック (省略なしで維持) ---
-    search_query = request.GET.get('q')
-    search_results = None
-    
-    if search_query:
-        # マニュアル検索
-        manual_hits = Manual.objects.filter(
-            Q(title__icontains=search_query) | 
-            Q(description__icontains=search_query),
-            is_deleted=False
-        ).select_related('status', 'visibility')
-        
-        # ナレッジ検索
-        question_hits = Question.objects.filter(
-            Q(title__icontains=search_query) | 
-            Q(problem_summary__icontains=search_query) | 
-            Q(solution_summary__icontains=search_query)
-        )
-        
-        search_results = {
-            'manuals': manual_hits,
-            'questions': question_hits,
-            'count': manual_hits.count() + question_hits.count()
-        }
-    # -----------------------
 
     # ユーザーの権限コードを取得
     role_code = request.user.role.code if request.user.role else None
@@ -98,88 +79,9 @@ def top_page(request):
         members = User.objects.filter(is_active=True).exclude(id=request.user.id)
 
     # --- ダッシュボードデータ構築 (全員共通) ---
-    dashboard_data = []
-    
-    # ★ 全体チャート用の集計変数（修正版）
-    overall_stats = {
-        'own': {'0-3日': 0, '4-7日': 0, '8日以上': 0},
-        'request': {'0-3日': 0, '4-7日': 0, '8日以上': 0}
-    }
-
-    # 期限判定用ヘルパー関数 (JSとロジックを合わせる)
-    def get_deadline_category(deadline_date):
-        if not deadline_date:
-            return '8日以上'
-        # deadline_date is DateTimeField, convert to date
-        diff = (deadline_date.date() - timezone.now().date()).days
-        if diff <= 3: return '0-3日'
-        elif diff <= 7: return '4-7日'
-        else: return '8日以上'
-
-    # --- 修正: 全体集計をメンバー単位ではなくタスク単位（重複排除）で行う ---
-    # まず対象メンバーたちが抱えているタスクを全て取得し、重複を除外
-    active_tasks_unique = Task.objects.filter(assigned_users__in=members).exclude(status__code='completed').distinct()
-
-    for task in active_tasks_unique:
-        cat = get_deadline_category(task.due_date)
-        
-        # タスクタイプで判定 (request=依頼, self=自作)
-        # もしタスクタイプがない場合(NULL)は self 扱いにする等の考慮が必要
-        is_request = False
-        if task.task_type and task.task_type.code == 'request':
-            is_request = True
-        
-        if is_request:
-            overall_stats['request'][cat] += 1
-        else:
-            overall_stats['own'][cat] += 1
-
-    # -----------------------------------------------------------
-
-    for member in members:
-        # スキル: 完了済みタスクのタグ上位3つを取得
-        skills = [tag.name for tag in member.get_completed_tags()][:3]
-        
-        grade = member.role.name if member.role else "-"
-
-        active_tasks = member.assigned_tasks.exclude(status__code='completed')
-        
-        own_tasks = []     
-        request_tasks = [] 
-        difficulty_counts = {'high': 0, 'mid': 0, 'low': 0}
-
-        for task in active_tasks:
-            # メンバー個別はそのまま（その人が抱えているもの）
-            deadline_str = task.due_date.strftime('%Y-%m-%d') if task.due_date else ''
-            
-            if task.requested_by and task.requested_by != member:
-                request_tasks.append({'deadline': deadline_str})
-            else:
-                own_tasks.append({'deadline': deadline_str})
-
-            task_tags = [t.name for t in task.tags.all()]
-            is_high = any('難易度高' in t or '高' in t for t in task_tags if '難易度' in t)
-            is_mid = any('難易度中' in t or '中' in t for t in task_tags if '難易度' in t)
-            is_low = any('難易度低' in t or '低' in t for t in task_tags if '難易度' in t)
-
-            if is_high: difficulty_counts['high'] += 1
-            elif is_mid: difficulty_counts['mid'] += 1
-            elif is_low: difficulty_counts['low'] += 1
-            else:
-                difficulty_counts['mid'] += 1 
-
-        dashboard_data.append({
-            'id': member.id,
-            'name': f"{member.last_name} {member.first_name}",
-            'department_id': member.department.id if member.department else None, # 部署IDを追加
-            'grade': grade,
-            'skills': skills,
-            'tasks': {
-                'own': own_tasks,
-                'request': request_tasks,
-                'difficulty': difficulty_counts
-            }
-        })
+    # メンバーごとの集計は MemberDashboardSnapshot に事前計算済み（tasks/dashboard.py）
+    # 全体集計はタスク単位（重複排除）で行う
+    dashboard_data, overall_stats = build_dashboard(members)
 
     context = {
         'page_title': 'チームダッシュボード' if role_code in ['manager', 'admin', 'employee'] else 'ホーム',
@@ -213,14 +115,14 @@ def task_approve(request, task_id):
 
         if is_self_approval and is_assigned_to_self:
             try:
-                self_type = TaskTypeMaster.objects.get(code='self')
+                self_type = masters.get(TaskTypeMaster, 'self')
                 task.task_type = self_type
             except TaskTypeMaster.DoesNotExist:
                 pass
 
-        completed_status = TaskStatusMaster.objects.get(code='completed')
+        completed_status = masters.get(TaskStatusMaster, 'completed')
         task.status = completed_status
-        task.updated_at = timezone.now()
+        task.completed_at = timezone.now()
         task.save()
         
         messages.success(request, f'タスク「{task.title}」を承認し、完了としました。')
@@ -270,46 +172,56 @@ def api_search_tasks(request):
     return JsonResponse({'tasks': data})
 
 @login_required
+@query_budget(queries=10)
 def api_recommend_users(request):
+    """
+    担当者レコメンド
+    - task_id: 対象タスク（タグ一致数の計算に使用）
+    - user_name: 名前での絞り込み
+    - department: 部署IDでの絞り込み
+    - limit / offset: 上位N件のページング（limit未指定時は全件）
+    """
     task_id = request.GET.get('task_id')
     user_name_keyword = request.GET.get('user_name', '')
-    users = User.objects.filter(is_active=True).prefetch_related('assigned_tasks')
 
-    if user_name_keyword:
-        users = users.filter(
-            Q(last_name__icontains=user_name_keyword) | 
-            Q(first_name__icontains=user_name_keyword)
-        )
-
-    user_data = []
-    target_task_tags = []
+    try:
+        department_id = int(request.GET['department']) if request.GET.get('department') else None
+        limit = int(request.GET['limit']) if request.GET.get('limit') else None
+        offset = int(request.GET.get('offset') or 0)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'パラメータが不正です'}, status=400)
+    if (limit is not None and limit < 1) or offset < 0:
+        return JsonResponse({'status': 'error', 'message': 'limit/offset が不正です'}, status=400)
+
+    task = None
     if task_id:
-        try:
-            task = Task.objects.get(id=task_id)
-            target_task_tags = list(task.tags.all())
-        except Task.DoesNotExist:
-            pass
+        task = Task.objects.filter(id=task_id).first()
+
+    users, total = recommend_users(
+        task=task,
+        name_keyword=user_name_keyword,
+        department_id=department_id,
+        offset=offset,
+        limit=limit,
+    )
 
+    user_data = []
     for user in users:
-        current_load = user.assigned_tasks.filter(status__code='in_progress').count()
-        match_count = 0
-        if target_task_tags:
-            user_skill_tags = user.get_completed_tags()
-            for tag in target_task_tags:
-                if tag in user_skill_tags:
-                    match_count += 1
-        
         user_data.append({
             'id': user.id,
             'name': f"{user.last_name} {user.first_name}",
             'avatar_url': user.avatar.url if user.avatar else None, 
-            'current_load': current_load,
-            'match_count': match_count,
+            'current_load': user.current_load,
+            'match_count': user.match_count,
             'department': user.department.name if user.department else "未所属",
         })
 
-    user_data.sort(key=lambda x: (-x['match_count'], x['current_load']))
-    return JsonResponse({'users': user_data})
+    return JsonResponse({
+        'users': user_data,
+        'total': total,
+        'offset': offset,
+        'has_more': offset + len(user_data) < total,
+    })
 
 @require_POST
 @login_required
@@ -321,7 +233,7 @@ def api_execute_assignment(request):
         new_due_date = data.get('due_date')
         notes = data.get('notes')
 
-        task = Task.objects.get(id=task_id)
+        task = masters.attach(Task.objects.get(id=task_id), 'status')
         user = User.objects.get(id=user_id)
 
         task.assigned_users.add(user)
@@ -337,7 +249,7 @@ def api_execute_assignment(request):
 
         if task.status.code == 'unstarted':
             try:
-                in_progress = TaskStatusMaster.objects.get(code='in_progress')
+                in_progress = masters.get(TaskStatusMaster, 'in_progress')
                 task.status = in_progress
             except:
                 pass
@@ -345,14 +257,13 @@ def api_execute_assignment(request):
         task.save()
 
         try:
-            type_assign = NotificationTypeMaster.objects.get(code='task_assign')
-            Notification.objects.create(
-                recipient=user,
+            notify(
+                user,
                 title="新しいタスクが割り当てられました",
                 message=f"タスク「{task.title}」の担当に指名されました。",
-                notification_type=type_assign,
+                type_code='task_assign',
                 related_object_id=task.id,
-                link_url='/task-board/' 
+                link_url='/task-board/'
             )
         except Exception as e:
             print(f"通知作成エラー: {e}")
@@ -364,61 +275,65 @@ def api_execute_assignment(request):
 
 @login_required
 def task_board_page(request):
-    user = request.user
-    one_week_ago = timezone.now() - timedelta(days=7)
-    
-    tasks = Task.objects.select_related('requested_by', 'status', 'task_type').prefetch_related('assigned_users')
-    
-    tasks = tasks.filter(
-        Q(status__code__in=['unstarted', 'in_progress', 'pending_review']) | 
-        Q(status__code='completed', updated_at__gte=one_week_ago)
-    )
-
-    if user.department:
-        tasks = tasks.filter(requested_by__department=user.department)
-
-    # パターンA: Board shows only requests
-    tasks = tasks.filter(task_type__code='request')
-
+    # 表示対象を1回の問い合わせで取得し、列ごとに振り分ける（board.py）
+    columns = board.build_board(request.user)
     context = {
         'page_title': 'タスクボード',
-        'tasks_unstarted': tasks.filter(status__code='unstarted'),
-        'tasks_in_progress': tasks.filter(status__code='in_progress'),
-        'tasks_pending': tasks.filter(status__code='pending_review'),
-        'tasks_completed': tasks.filter(status__code='completed'),
+        'columns': columns,
+        'board_since': timezone.now().isoformat(),
     }
-    
     return render(request, 'tasks/task_board.html', context)
 
-# OpenAI configuration
-TAG_GENERATION_PROMPT_TEMPLATE = """
-以下のタスク名から、ハッシュタグ形式で20個以内の関連タグを生成してください。
-タグには必ず #難易度 (高、中、低) のいずれか一つを含めてください。
 
-例: 議事録の製作
-出力: #議事録 #文章作成 #ドキュメント作成 #ビジネス文書 #情報整理 #効率化 #会議 #記録 #難易度中
+def _card_html(request, task):
+    return render_to_string('tasks/partials/task_card.html', {'task': task}, request=request)
 
-タスク名: {task_title}
-出力:
-"""
 
-def generate_tags_with_gemini(task_title):
+@login_required
+def api_task_board_column(request):
+    """
+    タスクボードの「もっと見る」: GET status=<状態コード>&cursor=<カーソル>
+    """
     try:
-        if settings.OPENAI_API_KEY:
-            client = OpenAI(api_key=settings.OPENAI_API_KEY)
-            prompt = TAG_GENERATION_PROMPT_TEMPLATE.format(task_title=task_title)
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that generates hashtags."},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return response.choices[0].message.content
-        return ""
-    except Exception as e:
-        # print(f"OpenAI API Error: {e}") 
-        return ""
+        tasks, next_cursor = board.column_page(request.user, request.GET.get('status', ''), request.GET.get('cursor', ''))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'invalid cursor'}, status=400)
+    return JsonResponse({
+        'cards': [_card_html(request, task) for task in tasks],
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+def api_task_board_changes(request):
+    """
+    タスクボードの差分: GET since=<前回の since>&known=<表示中のタスクIDのカンマ区切り>
+    更新されたタスクはカードのHTMLと列を、ボードから消えたタスクはIDを返す
+    """
+    try:
+        # 形式は正しくても存在しない日時（13月など）は ValueError
+        since = parse_datetime(request.GET.get('since', '').replace(' ', '+'))
+    except ValueError:
+        since = None
+    if since is not None and timezone.is_naive(since):
+        # since はサーバーが返したタイムゾーン付きの値のみ受け付ける
+        since = None
+    try:
+        known_ids = [int(v) for v in request.GET.get('known', '').split(',') if v.strip()]
+    except ValueError:
+        known_ids = None
+    if since is None or known_ids is None:
+        return JsonResponse({'status': 'error', 'message': 'invalid parameters'}, status=400)
+
+    updated, removed, now = board.changes(request.user, since, known_ids)
+    return JsonResponse({
+        'updated': [
+            {'id': task.id, 'column': board.column_code(task), 'html': _card_html(request, task)}
+            for task in updated
+        ],
+        'removed': removed,
+        'since': now.isoformat(),
+    })
 
 @login_required
 def task_register_page(request):
@@ -430,12 +345,6 @@ def task_register_page(request):
             task = form.save(commit=False)
             task.requested_by = request.user
             
-            try:
-                generated_tags_str = generate_tags_with_gemini(task.title)
-                tag_names = [name.strip().lstrip('#') for name in generated_tags_str.split() if name.strip().startswith('#')]
-            except Exception:
-                tag_names = []
-
             post_task_type = request.POST.get('task_type', 'self')
             is_manager = (request.user.role and request.user.role.code in ['admin', 'manager'])
             target_type_code = 'self' 
@@ -446,7 +355,7 @@ def task_register_page(request):
                 target_type_code = 'self'
 
             try:
-                type_obj = TaskTypeMaster.objects.get(code=target_type_code)
+                type_obj = masters.get(TaskTypeMaster, target_type_code)
                 task.task_type = type_obj
             except TaskTypeMaster.DoesNotExist:
                 pass
@@ -454,10 +363,10 @@ def task_register_page(request):
             # ★ステータス設定: 自作タスクは「着手中」、ボードタスクは「未着手」
             try:
                 if target_type_code == 'self':
-                    in_progress_status = TaskStatusMaster.objects.get(code='in_progress')
+                    in_progress_status = masters.get(TaskStatusMaster, 'in_progress')
                     task.status = in_progress_status
                 else:
-                    unstarted_status = TaskStatusMaster.objects.get(code='unstarted')
+                    unstarted_status = masters.get(TaskStatusMaster, 'unstarted')
                     task.status = unstarted_status
             except TaskStatusMaster.DoesNotExist:
                 messages.error(request, 'システムエラー: タスク状態マスタが見つかりません。')
@@ -465,9 +374,8 @@ def task_register_page(request):
 
             task.save()
 
-            for tag_name in tag_names:
-                tag, created = Tag.objects.get_or_create(name=tag_name)
-                task.tags.add(tag)
+            # タグ・難易度はAIジョブで生成して後から書き戻す
+            enqueue('tasks.generate_tags', {'task_id': task.id}, user=request.user)
 
             if target_type_code == 'self':
                 task.assigned_users.add(request.user)
@@ -484,17 +392,18 @@ def task_register_page(request):
     context = {
         'page_title': page_title,
         'form': form,
+        'llm_jobs': pending_jobs(request.user, ['tasks.generate_tags']),
     }
     return render(request, 'tasks/task_register.html', context)
 
 @login_required
 def assign_task_to_self(request, task_id):
-    task = get_object_or_404(Task, id=task_id)
+    task = masters.attach(get_object_or_404(Task, id=task_id), 'status')
     task.assigned_users.add(request.user)
     
     if task.status and task.status.code == 'unstarted':
         try:
-            in_progress_status = TaskStatusMaster.objects.get(code='in_progress')
+            in_progress_status = masters.get(TaskStatusMaster, 'in_progress')
             task.status = in_progress_status
         except TaskStatusMaster.DoesNotExist:
             pass
@@ -505,7 +414,7 @@ def assign_task_to_self(request, task_id):
 
 @login_required
 def complete_task_by_user(request, task_id):
-    task = get_object_or_404(Task, id=task_id)
+    task = masters.attach(get_object_or_404(Task, id=task_id), 'task_type')
     
     if request.user not in task.assigned_users.all():
         messages.error(request, "あなたはタスクの担当者ではありません。")
@@ -523,18 +432,18 @@ def complete_task_by_user(request, task_id):
                 is_request_task = True
             
             if is_request_task:
-                pending_status = TaskStatusMaster.objects.get(code='pending_review')
+                pending_status = masters.get(TaskStatusMaster, 'pending_review')
                 task.status = pending_status
                 messages.success(request, f'タスク「{task.title}」の全作業が終了しました。ステータスを「確認待ち」に変更します。')
             
             elif task.requested_by == request.user:
-                completed_status = TaskStatusMaster.objects.get(code='completed')
+                completed_status = masters.get(TaskStatusMaster, 'completed')
                 task.status = completed_status
-                task.updated_at = timezone.now()
+                task.completed_at = timezone.now()
                 messages.success(request, f'タスク「{task.title}」を完了しました！')
             
             else:
-                pending_status = TaskStatusMaster.objects.get(code='pending_review')
+                pending_status = masters.get(TaskStatusMaster, 'pending_review')
                 task.status = pending_status
                 messages.success(request, f'タスク「{task.title}」を確認待ちにしました。')
 
@@ -560,11 +469,8 @@ def dashboard_view(request):
         year = now.year
         month = now.month
 
-    tasks = Task.objects.filter(
-        status__code='completed',
-        updated_at__year=year, # Using updated_at as completed_at roughly
-        updated_at__month=month
-    )
+    # 完了日時の月の範囲で検索（(status, completed_at) の索引を使う）
+    tasks = completed_in_month(year, month)
 
     if user.role.code in ['admin', 'manager']:
         tasks = tasks.filter(requested_by__department=user.department) # Assuming requested_by dept for filtering
@@ -598,118 +504,64 @@ def interview_advice_menu_page(request):
 
 @login_required
 def admin_csv_import_page(request):
-    import csv
-    from io import TextIOWrapper
-    from django.core.mail import send_mail
-    from accounts.models import User, RoleMaster
-    from django.contrib.auth.tokens import default_token_generator
-    from django.utils.http import urlsafe_base64_encode
-    from django.utils.encoding import force_bytes
-    from django.urls import reverse
-
     """
     CSVによるユーザー一括登録
     CSV形式: 社員番号, メール, 姓, 名
+    登録・招待メールの送信はバックグラウンドで行い、画面では進捗と結果ファイルを表示する
     """
     if request.method == 'POST':
         form = CSVUploadForm(request.POST, request.FILES)
         if form.is_valid():
-            csv_file = request.FILES['file']
-            try:
-                # ユーザーの環境によりShift-JISかUTF-8か異なるが、ここではUTF-8CP932(Microsoft Excel標準)を考慮しつつ
-                # 一般的な utf-8-sig (BOM付き対応) を試す、あるいはエラーハンドリングが必要
-                # 今回は utf-8 で実装
-                text_file = TextIOWrapper(csv_file.file, encoding='utf-8-sig')
-                reader = csv.reader(text_file)
-                
-                created_count = 0
-                error_count = 0
-                
-                # デフォルト権限（employee）の取得
-                try:
-                    default_role = RoleMaster.objects.get(code='employee')
-                except RoleMaster.DoesNotExist:
-                    default_role = None
-                
-                print("=== Created User Login URLs ===") 
-
-                for i, row in enumerate(reader):
-                    # ヘッダー行のスキップ判定（簡易的）
-                    if i == 0 and ("社員番号" in row[0] or "employee" in row[0].lower()):
-                        continue
-                    
-                    if len(row) < 4:
-                        error_count += 1
-                        continue
-
-                    emp_num = row[0].strip()
-                    email = row[1].strip()
-                    lname = row[2].strip()
-                    fname = row[3].strip()
-                    
-                    # 必須チェック
-                    if not emp_num or not email:
-                        error_count += 1
-                        continue
-
-                    if User.objects.filter(employee_number=emp_num).exists():
-                        # 既に存在する場合はスキップ
-                        error_count += 1
-                        continue
-
-                    try:
-                        # パスワードは初期値として社員番号を設定
-                        user = User.objects.create_user(
-                            employee_number=emp_num,
-                            email=email,
-                            password=emp_num, 
-                            last_name=lname,
-                            first_name=fname,
-                            role=default_role,
-                            is_initial_setup_completed=False # 初回ログイン誘導のため
-                        )
-                        created_count += 1
-                        
-                        # 初回ログイン用のURL発行 (PasswordResetTokenを利用)
-                        token = default_token_generator.make_token(user)
-                        uid = urlsafe_base64_encode(force_bytes(user.pk))
-                        reset_path = reverse('password_reset_confirm', kwargs={'uidb64': uid, 'token': token})
-                        full_url = request.build_absolute_uri(reset_path)
-                        print(f"[{emp_num}] {lname} {fname}: {full_url}")
-
-                        # メール送信
-                        subject = "アカウント作成のお知らせ"
-                        message = f"""
-{lname} {fname} 様
-
-アカウントが作成されました。
-以下のリンクからパスワードを設定し、初回ログインを行ってください。
-
-{full_url}
-
-※このリンクは一度きり有効です。
-"""
-                        send_mail(subject, message, None, [user.email])
-
-                    except Exception as e:
-                        print(f"Line {i+1} Error: {e}")
-                        error_count += 1
-                
-                print("================================")
-
-                if created_count > 0:
-                    messages.success(request, f"{created_count}件のアカウントを作成し、招待メールを送信しました。")
-                
-                if error_count > 0:
-                    messages.warning(request, f"{error_count}件のデータは登録できませんでした（重複など）。")
-
-            except Exception as e:
-                messages.error(request, f"ファイル読み込みエラー: {e}")
-                
+            job = UserImportJob.objects.create(
+                file=request.FILES['file'],
+                base_url=request.build_absolute_uri('/'),
+                created_by=request.user,
+            )
+            schedule_import(job)
+            messages.success(request, "CSVを受け付けました。登録と招待メールの送信を順次行います。")
             return redirect('admin_csv_import_page')
     else:
         form = CSVUploadForm()
-    return render(request, 'management/csv_import.html', {'form': form})
+
+    import_jobs = UserImportJob.objects.filter(created_by=request.user)[:5]
+    return render(request, 'management/csv_import.html', {'form': form, 'import_jobs': import_jobs})
+
+
+def _import_job_data(job):
+    return {
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'is_pending': job.is_pending,
+        'total_rows': job.total_rows,
+        'processed_rows': job.processed_rows,
+        'progress': job.progress,
+        'created_count': job.created_count,
+        'error_count': job.error_count,
+        'error': job.error,
+        'result_url': reverse('admin_csv_import_result', args=[job.pk]) if job.result_file else None,
+    }
+
+
+@login_required
+def api_csv_import_status(request, job_id):
+    """
+    ユーザー一括登録の進捗
+    """
+    job = get_object_or_404(UserImportJob, pk=job_id, created_by=request.user)
+    return JsonResponse(_import_job_data(job))
+
+
+@login_required
+def admin_csv_import_result(request, job_id):
+    """
+    ユーザー一括登録の行ごとの結果（CSV）
+    """
+    job = get_object_or_404(UserImportJob, pk=job_id, created_by=request.user)
+    if not job.result_file:
+        raise Http404("result not ready")
+    return FileResponse(job.result_file.open('rb'), as_attachment=True, filename=f"user-import-{job.pk}.csv", content_type='text/csv')
+
 
 @login_required
 def my_tasks_page(request):
@@ -782,31 +634,31 @@ def completed_task_list_view(request):
         year = today.year
         month = today.month
         
-    tasks = Task.objects.filter(
-        status__code='completed',
-        completed_users=user
-    ).distinct()
-
-    # 月次フィルター (updated_at で簡易判定)
-    tasks = tasks.filter(updated_at__year=year, updated_at__month=month)
+    # 月次フィルター（完了日時の月の範囲）
+    tasks = completed_in_month(year, month).filter(completed_users=user)
 
     # タイプフィルター
+    task_type_code = None
     if filter_type == 'requested':
-        tasks = tasks.filter(task_type__code='request')
+        task_type_code = 'request'
     elif filter_type == 'self':
-        tasks = tasks.filter(task_type__code='self')
+        task_type_code = 'self'
+    if task_type_code:
+        tasks = tasks.filter(task_type__code=task_type_code)
     
-    tasks = tasks.order_by('-updated_at')
+    tasks = tasks.select_related('requested_by').order_by('-completed_at')
+    # 件数は月次集計から読む（完了タスクを数えない）
+    count = rollup_completed_count(year, month, user=user, task_type_code=task_type_code)
 
     # テンプレート側でループしやすいように構造化（月ごとグループ化はテンプレートでも可能だが、ここではリストのみ渡す形でもOK）
     # しかしテンプレート(completed_task_list.html)を見ると grouped_tasks を期待しているのでそれに合わせる
     
     # 今回はシンプルに、単一月表示なのでグループは1つだけ作る
     grouped_tasks = []
-    if tasks.exists():
+    if count:
         grouped_tasks.append({
             'month': datetime(year, month, 1),
-            'count': tasks.count(),
+            'count': count,
             'tasks': tasks
         })
 
@@ -840,7 +692,7 @@ def task_return_page(request, task_id):
         task.assigned_users.remove(request.user)
         
         try:
-            unstarted_status = TaskStatusMaster.objects.get(code='unstarted')
+            unstarted_status = masters.get(TaskStatusMaster, 'unstarted')
             task.status = unstarted_status
         except TaskStatusMaster.DoesNotExist:
             pass
@@ -850,12 +702,11 @@ def task_return_page(request, task_id):
         # ★通知: タスク投稿者に返却を通知
         if task.requested_by and task.requested_by != request.user:
             try:
-                type_info = NotificationTypeMaster.objects.get(code='info')
-                Notification.objects.create(
-                    recipient=task.requested_by,
+                notify(
+                    task.requested_by,
                     title="タスクがタスクボードに返却されました",
                     message=f"「{task.title}」が{request.user.last_name}さんからタスクボードに返却されました。",
-                    notification_type=type_info,
+                    type_code='info',
                     related_object_id=task.id,
                     link_url='/task-board/'
                 )
@@ -896,12 +747,11 @@ def task_transfer_page(request, task_id):
                 
                 # ★通知: 譲渡先のユーザーに通知
                 try:
-                    type_info = NotificationTypeMaster.objects.get(code='info')
-                    Notification.objects.create(
-                        recipient=new_owner,
+                    notify(
+                        new_owner,
                         title="タスクが譲渡されました",
                         message=f"「{task.title}」が{request.user.last_name}さんからあなたに譲渡されました。",
-                        notification_type=type_info,
+                        type_code='info',
                         related_object_id=task.id,
                         link_url='/my-tasks/'
                     )
@@ -923,9 +773,24 @@ def task_transfer_page(request, task_id):
     }
     return render(request, 'tasks/task_transfer.html', context)
 
+@login_required
 @login_required
 def manager_dashboard_view(request):
-    return render(request, 'tasks/manager_dashboard.html')
+    """
+    マネージャーダッシュボード
+    部署（依頼者の部署）の今月の完了件数を月次集計から表示する
+    """
+    department_completions = None
+    if request.user.department_id:
+        today = timezone.localdate()
+        department_id = request.user.department_id
+        department_completions = {
+            'month': today.replace(day=1),
+            'total': rollup_completed_count(today.year, today.month, department=department_id),
+            'request': rollup_completed_count(today.year, today.month, department=department_id, task_type_code='request'),
+            'self': rollup_completed_count(today.year, today.month, department=department_id, task_type_code='self'),
+        }
+    return render(request, 'tasks/manager_dashboard.html', {'department_completions': department_completions})
 
 def surprise_page(request):
     return render(request, 'tasks/surprise.html')